@@ -0,0 +1,140 @@
+"""Baseline schema (tables as created by init_db.py)
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-19 09:00:00
+
+Databases created earlier with init_db.py already have these tables:
+run `alembic stamp 0001_baseline` once, then `alembic upgrade head`.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001_baseline"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "users",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("phone_number", sa.String(), nullable=False),
+        sa.Column("name", sa.String(), nullable=True),
+        sa.Column("language_preference", sa.String(), nullable=True),
+        sa.Column("region", sa.String(), nullable=True),
+        sa.Column("latitude", sa.String(), nullable=True),
+        sa.Column("longitude", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+    )
+    op.create_index("ix_users_phone_number", "users", ["phone_number"], unique=True)
+
+    op.create_table(
+        "diseases",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False, unique=True),
+        sa.Column("scientific_name", sa.String(), nullable=True),
+        sa.Column("crop_name", sa.String(), nullable=False),
+        sa.Column(
+            "severity",
+            sa.Enum("LOW", "MEDIUM", "HIGH", "CRITICAL", name="diseaseseverity"),
+            nullable=True,
+        ),
+        sa.Column("symptoms", sa.JSON(), nullable=True),
+        sa.Column("causes", sa.JSON(), nullable=True),
+        sa.Column("prevention_tips", sa.JSON(), nullable=True),
+        sa.Column("image_examples", sa.JSON(), nullable=True),
+        sa.Column("class_index", sa.Integer(), nullable=False, unique=True),
+    )
+
+    op.create_table(
+        "treatments",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("disease_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("diseases.id"), nullable=False),
+        sa.Column("region", sa.String(), nullable=True),
+        sa.Column(
+            "crop_stage",
+            sa.Enum("SEEDLING", "VEGETATIVE", "FLOWERING", "FRUITING", "ANY", name="cropstage"),
+            nullable=True,
+        ),
+        sa.Column(
+            "type",
+            sa.Enum("CHEMICAL", "ORGANIC", "CULTURAL", name="treatmenttype"),
+            nullable=False,
+        ),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("dosage", sa.JSON(), nullable=True),
+        sa.Column("instructions", sa.JSON(), nullable=False),
+        sa.Column("effectiveness_score", sa.Float(), nullable=True),
+        sa.Column("precautions", sa.JSON(), nullable=True),
+        sa.Column("cost_estimate", sa.String(), nullable=True),
+    )
+
+    op.create_table(
+        "diagnoses",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column("crop_name", sa.String(), nullable=False),
+        sa.Column("disease_name", sa.String(), nullable=True),
+        sa.Column("confidence_score", sa.Float(), nullable=False),
+        sa.Column("image_url", sa.String(), nullable=False),
+        sa.Column("image_quality_score", sa.Float(), nullable=True),
+        sa.Column("model_version", sa.String(), nullable=False),
+        sa.Column("extra_metadata", sa.JSON(), nullable=True),
+        sa.Column("grid_location", sa.String(), nullable=True),
+        sa.Column(
+            "status",
+            sa.Enum("PENDING", "CONFIRMED", "REJECTED", "REVIEWED", name="diagnosisstatus"),
+            nullable=True,
+        ),
+        sa.Column("needs_retry", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+
+    op.create_table(
+        "crop_history",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("diagnosis_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("diagnoses.id"), nullable=True),
+        sa.Column("crop_name", sa.String(), nullable=False),
+        sa.Column("image_url", sa.String(), nullable=False),
+        sa.Column("health_score", sa.Float(), nullable=False),
+        sa.Column("stage", sa.String(), nullable=True),
+        sa.Column("notes", sa.Text(), nullable=True),
+        sa.Column("recorded_at", sa.DateTime(), nullable=True),
+    )
+
+    op.create_table(
+        "disease_alerts",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("disease_id", postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column("crop_name", sa.String(), nullable=False),
+        sa.Column("grid_location", sa.String(), nullable=False),
+        sa.Column("detection_count", sa.Integer(), nullable=True),
+        sa.Column("severity_level", sa.Integer(), nullable=True),
+        sa.Column("alert_date", sa.Date(), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("last_detected_at", sa.Date(), nullable=True),
+    )
+    op.create_index("ix_disease_alerts_grid_location", "disease_alerts", ["grid_location"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("disease_alerts")
+    op.drop_table("crop_history")
+    op.drop_table("diagnoses")
+    op.drop_table("treatments")
+    op.drop_table("diseases")
+    op.drop_table("users")
+    for enum_name in ("diagnosisstatus", "treatmenttype", "cropstage", "diseaseseverity"):
+        sa.Enum(name=enum_name).drop(op.get_bind(), checkfirst=True)
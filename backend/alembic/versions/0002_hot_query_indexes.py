@@ -0,0 +1,78 @@
+"""Indexes for hot history and alert queries
+
+Revision ID: 0002_hot_query_indexes
+Revises: 0001_baseline
+Create Date: 2026-10-19 09:30:00
+
+- history by user: WHERE user_id = ? ORDER BY created_at DESC
+- history / recent: ORDER BY created_at DESC (id breaks ties)
+- alert upsert lookup: (grid_location, crop_name, alert_date); makes the
+  single-column grid_location index redundant
+- nearby alerts: alert_date range over active alerts only (partial index)
+
+Indexes are built CONCURRENTLY so live tables are not write-locked.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002_hot_query_indexes"
+down_revision: Union[str, Sequence[str], None] = "0001_baseline"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_diagnoses_user_id_created_at",
+            "diagnoses",
+            ["user_id", "created_at", "id"],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_diagnoses_created_at",
+            "diagnoses",
+            ["created_at", "id"],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_disease_alerts_cell_crop_date",
+            "disease_alerts",
+            ["grid_location", "crop_name", "alert_date"],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_disease_alerts_active_alert_date",
+            "disease_alerts",
+            ["alert_date"],
+            postgresql_where=sa.text("is_active"),
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_disease_alerts_grid_location",
+            table_name="disease_alerts",
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_disease_alerts_grid_location",
+            "disease_alerts",
+            ["grid_location"],
+            postgresql_concurrently=True,
+        )
+        for table, name in (
+            ("disease_alerts", "ix_disease_alerts_active_alert_date"),
+            ("disease_alerts", "ix_disease_alerts_cell_crop_date"),
+            ("diagnoses", "ix_diagnoses_created_at"),
+            ("diagnoses", "ix_diagnoses_user_id_created_at"),
+        ):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,74 @@
+"""Unique alert per cell, crop, disease and day
+
+Revision ID: 0003_alert_upsert_constraint
+Revises: 0002_hot_query_indexes
+Create Date: 2026-10-19 10:00:00
+
+Merges duplicate rows left by the old SELECT-then-INSERT race, then adds the
+unique constraint targeted by INSERT ... ON CONFLICT. Its index covers the
+(grid_location, crop_name, alert_date) lookup, so that index is dropped.
+Requires PostgreSQL 15+ for NULLS NOT DISTINCT.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003_alert_upsert_constraint"
+down_revision: Union[str, Sequence[str], None] = "0002_hot_query_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DUPLICATES = """
+    SELECT
+        id,
+        row_number() OVER w AS rn,
+        sum(detection_count) OVER w AS total,
+        max(last_detected_at) OVER w AS last_detected
+    FROM disease_alerts
+    WINDOW w AS (
+        PARTITION BY grid_location, crop_name, disease_id, alert_date
+        ORDER BY id
+        ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+    )
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(f"""
+        UPDATE disease_alerts AS a
+        SET detection_count = d.total,
+            severity_level = LEAST(5, d.total / 3 + 1),
+            last_detected_at = d.last_detected
+        FROM ({DUPLICATES}) AS d
+        WHERE a.id = d.id AND d.rn = 1 AND d.total <> a.detection_count
+    """)
+    op.execute(f"""
+        DELETE FROM disease_alerts AS a
+        USING ({DUPLICATES}) AS d
+        WHERE a.id = d.id AND d.rn > 1
+    """)
+    op.execute("UPDATE disease_alerts SET detection_count = 1 WHERE detection_count IS NULL")
+    op.alter_column("disease_alerts", "detection_count", existing_type=sa.Integer(), nullable=False, server_default="1")
+
+    op.create_unique_constraint(
+        "uq_disease_alerts_cell_crop_disease_date",
+        "disease_alerts",
+        ["grid_location", "crop_name", "disease_id", "alert_date"],
+        postgresql_nulls_not_distinct=True,
+    )
+    op.drop_index("ix_disease_alerts_cell_crop_date", table_name="disease_alerts")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(
+        "ix_disease_alerts_cell_crop_date",
+        "disease_alerts",
+        ["grid_location", "crop_name", "alert_date"],
+    )
+    op.drop_constraint("uq_disease_alerts_cell_crop_disease_date", "disease_alerts", type_="unique")
+    op.alter_column("disease_alerts", "detection_count", existing_type=sa.Integer(), nullable=True, server_default=None)
@@ -0,0 +1,32 @@
+"""Persist inference output on diagnoses
+
+Revision ID: 0004_persist_inference_output
+Revises: 0003_alert_upsert_constraint
+Create Date: 2026-10-19 10:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004_persist_inference_output"
+down_revision: Union[str, Sequence[str], None] = "0003_alert_upsert_constraint"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("diagnoses", sa.Column("heatmap_url", sa.String(), nullable=True))
+    op.add_column("diagnoses", sa.Column("inference_output", sa.JSON(), nullable=True))
+    op.add_column("diagnoses", sa.Column("raw_logits", sa.LargeBinary(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("diagnoses", "raw_logits")
+    op.drop_column("diagnoses", "inference_output")
+    op.drop_column("diagnoses", "heatmap_url")
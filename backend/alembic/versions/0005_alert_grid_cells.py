@@ -0,0 +1,64 @@
+"""Integer grid cell columns for bucketed nearby-alert lookups
+
+Revision ID: 0005_alert_grid_cells
+Revises: 0004_persist_inference_output
+Create Date: 2026-10-19 11:00:00
+
+Backfills (cell_row, cell_col) from the "lat,lon" grid_location strings.
+The grid size is frozen at the 10 km default rather than read from the
+app's settings, so the backfill does not change with later config; a
+deployment running another GRID_SIZE_KM passes it explicitly:
+
+    alembic -x grid_size_km=5 upgrade head
+
+Cells are rounded with floor(x + 0.5), as GeolocationService.grid_cell
+does (SQL round() breaks ties away from zero, Python's round() to even).
+The index is built CONCURRENTLY so the live table is not write-locked.
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005_alert_grid_cells"
+down_revision: Union[str, Sequence[str], None] = "0004_persist_inference_output"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+GRID_SIZE_KM = 10
+KM_PER_DEGREE = 111.0
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    grid_size_km = float(context.get_x_argument(as_dictionary=True).get("grid_size_km", GRID_SIZE_KM))
+    op.add_column("disease_alerts", sa.Column("cell_row", sa.Integer(), nullable=True))
+    op.add_column("disease_alerts", sa.Column("cell_col", sa.Integer(), nullable=True))
+
+    op.execute(
+        sa.text("""
+            UPDATE disease_alerts
+            SET cell_row = floor(split_part(grid_location, ',', 1)::numeric / :grid_degrees + 0.5),
+                cell_col = floor(split_part(grid_location, ',', 2)::numeric / :grid_degrees + 0.5)
+            WHERE cell_row IS NULL
+        """).bindparams(grid_degrees=grid_size_km / KM_PER_DEGREE)
+    )
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_disease_alerts_active_cell",
+            "disease_alerts",
+            ["cell_row", "cell_col", "alert_date"],
+            postgresql_where=sa.text("is_active"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_disease_alerts_active_cell", table_name="disease_alerts", postgresql_concurrently=True)
+    op.drop_column("disease_alerts", "cell_col")
+    op.drop_column("disease_alerts", "cell_row")
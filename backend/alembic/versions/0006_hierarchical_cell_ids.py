@@ -0,0 +1,83 @@
+"""Hierarchical cell ids on diagnoses and disease alerts
+
+Revision ID: 0006_hierarchical_cell_ids
+Revises: 0005_alert_grid_cells
+Create Date: 2026-10-19 14:00:00
+
+Backfills cell_id from grid_location with the same bit interleaving as
+geolocation_service.cell_id, computed once per distinct grid cell. Indexes
+are built CONCURRENTLY so live tables are not write-locked.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006_hierarchical_cell_ids"
+down_revision: Union[str, Sequence[str], None] = "0005_alert_grid_cells"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# geolocation_service.CELL_LEVEL at this revision, frozen so the backfill
+# does not change meaning with the app code
+CELL_LEVEL = 12
+
+
+BACKFILL = """
+WITH bands AS (
+    SELECT
+        grid_location,
+        least(greatest(floor((split_part(grid_location, ',', 2)::float8 + 180) / 360 * :bands), 0), :bands - 1)::bigint AS x,
+        least(greatest(floor((split_part(grid_location, ',', 1)::float8 + 90) / 180 * :bands), 0), :bands - 1)::bigint AS y
+    FROM (SELECT DISTINCT grid_location FROM {table} WHERE grid_location IS NOT NULL AND cell_id IS NULL) AS g
+),
+cells AS (
+    SELECT
+        grid_location,
+        (
+            SELECT sum((((x >> b) & 1) << (2 * b)) | (((y >> b) & 1) << (2 * b + 1)))
+            FROM generate_series(0, :level - 1) AS b
+        )::bigint AS cell_id
+    FROM bands
+)
+UPDATE {table} AS t
+SET cell_id = cells.cell_id
+FROM cells
+WHERE t.grid_location = cells.grid_location AND t.cell_id IS NULL
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("diagnoses", sa.Column("cell_id", sa.BigInteger(), nullable=True))
+    op.add_column("disease_alerts", sa.Column("cell_id", sa.BigInteger(), nullable=True))
+
+    for table in ("diagnoses", "disease_alerts"):
+        op.execute(
+            sa.text(BACKFILL.format(table=table)).bindparams(bands=1 << CELL_LEVEL, level=CELL_LEVEL)
+        )
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_diagnoses_cell_id_created_at",
+            "diagnoses",
+            ["cell_id", "created_at"],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_disease_alerts_cell_id_alert_date",
+            "disease_alerts",
+            ["cell_id", "alert_date"],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_disease_alerts_cell_id_alert_date", table_name="disease_alerts", postgresql_concurrently=True)
+        op.drop_index("ix_diagnoses_cell_id_created_at", table_name="diagnoses", postgresql_concurrently=True)
+    op.drop_column("disease_alerts", "cell_id")
+    op.drop_column("diagnoses", "cell_id")
@@ -0,0 +1,30 @@
+"""Outbreak score on disease alerts
+
+Revision ID: 0007_alert_outbreak_score
+Revises: 0006_hierarchical_cell_ids
+Create Date: 2026-10-19 16:00:00
+
+Nullable column, no backfill; benchmarks/outbreak_replay.py --apply scores
+existing history.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007_alert_outbreak_score"
+down_revision: Union[str, Sequence[str], None] = "0006_hierarchical_cell_ids"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("disease_alerts", sa.Column("outbreak_score", sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("disease_alerts", "outbreak_score")
@@ -0,0 +1,68 @@
+"""Weekly/monthly alert summaries for compacted daily alerts
+
+Revision ID: 0008_alert_summaries
+Revises: 0007_alert_outbreak_score
+Create Date: 2026-10-19 17:00:00
+
+Adds disease_alert_summaries (filled by the alert maintenance job) and an
+alert_date index so maintenance can pick the oldest alerts in batches. The
+index is built CONCURRENTLY so the live table is not write-locked.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008_alert_summaries"
+down_revision: Union[str, Sequence[str], None] = "0007_alert_outbreak_score"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "disease_alert_summaries",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("disease_id", postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column("crop_name", sa.String(), nullable=False),
+        sa.Column("grid_location", sa.String(), nullable=False),
+        sa.Column("cell_row", sa.Integer(), nullable=True),
+        sa.Column("cell_col", sa.Integer(), nullable=True),
+        sa.Column("cell_id", sa.BigInteger(), nullable=True),
+        sa.Column("period", sa.String(), nullable=False),
+        sa.Column("period_start", sa.Date(), nullable=False),
+        sa.Column("detection_count", sa.Integer(), nullable=False),
+        sa.Column("alert_days", sa.Integer(), nullable=False),
+        sa.Column("max_severity", sa.Integer(), nullable=True),
+        sa.Column("max_outbreak_score", sa.Float(), nullable=True),
+        sa.UniqueConstraint(
+            "grid_location", "crop_name", "disease_id", "period", "period_start",
+            name="uq_disease_alert_summaries_cell_crop_disease_period",
+            postgresql_nulls_not_distinct=True,
+        ),
+    )
+    op.create_index(
+        "ix_disease_alert_summaries_cell_id_period_start",
+        "disease_alert_summaries",
+        ["cell_id", "period_start"],
+    )
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_disease_alerts_alert_date",
+            "disease_alerts",
+            ["alert_date"],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_disease_alerts_alert_date", table_name="disease_alerts", postgresql_concurrently=True)
+    op.drop_index("ix_disease_alert_summaries_cell_id_period_start", table_name="disease_alert_summaries")
+    op.drop_table("disease_alert_summaries")
@@ -0,0 +1,48 @@
+"""Store diagnosis timestamps as timestamptz
+
+Revision ID: 0009_diagnosis_timestamptz
+Revises: 0008_alert_summaries
+Create Date: 2026-10-19 18:00:00
+
+created_at / updated_at always held naive UTC. With the session time zone
+set to UTC the conversion keeps every instant and, on PostgreSQL 12+, does
+not rewrite the table. The indexes on created_at are still rebuilt, under
+an exclusive lock: run it in a quiet window on large tables.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0009_diagnosis_timestamptz"
+down_revision: Union[str, Sequence[str], None] = "0008_alert_summaries"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = ("created_at", "updated_at")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("SET LOCAL timezone = 'UTC'")
+    for name in COLUMNS:
+        op.alter_column(
+            "diagnoses", name,
+            type_=sa.DateTime(timezone=True),
+            existing_type=sa.DateTime(),
+            existing_nullable=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("SET LOCAL timezone = 'UTC'")
+    for name in COLUMNS:
+        op.alter_column(
+            "diagnoses", name,
+            type_=sa.DateTime(),
+            existing_type=sa.DateTime(timezone=True),
+            existing_nullable=True,
+        )
@@ -1,11 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.base import get_db
-from app.models.disease_alert import DiseaseAlert
-from app.services.geolocation_service import geolocation_service
-from app.schemas.diagnosis import AlertResponse
-from sqlalchemy import select, and_
-from datetime import datetime, timedelta
+from app.services.geolocation_service import CELL_LEVEL, geolocation_service
+from app.services.alert_service import alert_service
+from app.services.alert_tile_service import alert_tile_service
+from app.services.alert_broker import alert_broker
+from app.core.config import settings
+from app.schemas.diagnosis import AlertResponse, AlertRollupCell, AlertStats
+from app.core.responses import ORJSONResponse
+from app.core.http_cache import etag_matches
+from typing import List, Optional
+import asyncio
+import orjson
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,12 +20,12 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/alerts", tags=["alerts"])
 
 
-@router.get("/nearby")
+@router.get("/nearby", response_model=List[AlertResponse])
 async def get_nearby_alerts(
     latitude: float,
     longitude: float,
-    radius_km: float = 50,
-    days: int = 7,
+    radius_km: float = Query(50, gt=0, le=500),
+    days: int = Query(7, ge=1, le=365),
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -30,79 +37,143 @@ async def get_nearby_alerts(
     - **days**: Look back period (default 7 days)
     """
     try:
-        # Anonymize user location
-        user_grid = geolocation_service.anonymize_location(latitude, longitude)
-
-        # Get all active alerts from recent days
-        cutoff_date = datetime.now().date() - timedelta(days=days)
-        
-        result = await db.execute(
-            select(DiseaseAlert).where(
-                and_(
-                    DiseaseAlert.is_active == True,
-                    DiseaseAlert.alert_date >= cutoff_date
-                )
-            )
+        nearby_alerts = await alert_service.find_nearby(
+            db, latitude, longitude, radius_km, days
         )
-        alerts = result.scalars().all()
-
-        # Filter by distance
-        nearby_alerts = []
-        for alert in alerts:
-            if geolocation_service.is_nearby(user_grid, alert.grid_location, radius_km):
-                # Calculate approximate distance
-                user_lat, user_lon = geolocation_service.parse_grid_location(user_grid)
-                alert_lat, alert_lon = geolocation_service.parse_grid_location(alert.grid_location)
-                distance = geolocation_service.calculate_distance(
-                    user_lat, user_lon, alert_lat, alert_lon
-                )
-
-                nearby_alerts.append(
-                    AlertResponse(
-                        id=str(alert.id),
-                        disease_name="Unknown",  # TODO: Join with disease table
-                        crop_name=alert.crop_name,
-                        detection_count=alert.detection_count,
-                        severity_level=alert.severity_level,
-                        distance_km=round(distance, 1),
-                        alert_date=alert.alert_date.isoformat(),
-                    )
-                )
-
-        # Sort by severity and distance
-        nearby_alerts.sort(key=lambda x: (-x.severity_level, x.distance_km))
 
+        # Anonymized user cell, for logging only
+        user_grid = geolocation_service.anonymize_location(latitude, longitude)
         logger.info(f"Found {len(nearby_alerts)} alerts near {user_grid}")
-        return nearby_alerts
+        return ORJSONResponse(nearby_alerts)
 
     except Exception as e:
         logger.error(f"Get alerts error: {str(e)}")
         raise HTTPException(500, str(e))
 
 
-@router.get("/stats")
-async def get_alert_stats(
+@router.get("/stream")
+async def stream_alerts(
+    latitude: float,
+    longitude: float,
+    radius_km: float = Query(50, gt=0, le=settings.ALERT_PUSH_MAX_RADIUS_KM),
+):
+    """
+    Server-Sent Events stream of alert changes near a location
+
+    - **latitude**: User's latitude (only its anonymized grid cell is kept)
+    - **longitude**: User's longitude
+    - **radius_km**: Search radius (default 50km)
+
+    Events: `ready` once subscribed, `alert` with the updated alert and its
+    distance whenever a nearby alert changes, and `resync` if events were
+    dropped because the client fell behind (refetch /alerts/nearby).
+    """
+    if alert_broker.subscriber_count >= alert_broker.max_subscribers:
+        raise HTTPException(503, "Too many open alert streams", headers={"Retry-After": "30"})
+
+    async def frames():
+        sub = alert_broker.subscribe(latitude, longitude, radius_km)
+        if sub is None:
+            return
+        try:
+            ready = {
+                "grid_location": geolocation_service.anonymize_location(latitude, longitude),
+                "radius_km": sub.radius_km,
+            }
+            yield b"event: ready\ndata: " + orjson.dumps(ready) + b"\n\n"
+            while True:
+                try:
+                    yield await asyncio.wait_for(sub.queue.get(), timeout=settings.ALERT_PUSH_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Keeps proxies and mobile networks from closing an idle stream
+                    yield b": ping\n\n"
+        finally:
+            alert_broker.unsubscribe(sub)
+
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/rollup", response_model=List[AlertRollupCell])
+async def get_alert_rollup(
+    level: int = Query(6, ge=0, le=CELL_LEVEL),
+    parent: Optional[str] = None,
+    days: int = Query(7, ge=1, le=365),
+    crop_name: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
 ):
-    """Get global alert statistics"""
+    """
+    Detections rolled up per hierarchical grid cell
+
+    - **level**: Cell level, 0 (whole world) to 12 (~10km); each level halves the cell size
+    - **parent**: Only cells inside this quadkey (e.g. a state-level cell from a previous call)
+    - **days**: Look back period (default 7 days)
+    - **crop_name**: Only this crop
+    """
+    if parent is not None and len(parent) > level:
+        raise HTTPException(400, "parent must be at a coarser level than level")
     try:
-        # Count active alerts
-        result = await db.execute(
-            select(DiseaseAlert).where(DiseaseAlert.is_active == True)
-        )
-        active_alerts = result.scalars().all()
-
-        # Calculate stats
-        total_alerts = len(active_alerts)
-        total_detections = sum(alert.detection_count for alert in active_alerts)
-        high_severity = len([a for a in active_alerts if a.severity_level >= 4])
-
-        return {
-            "total_active_alerts": total_alerts,
-            "total_detections": total_detections,
-            "high_severity_alerts": high_severity,
-            "last_updated": datetime.now().isoformat(),
+        cells = await alert_service.rollup(db, level, days, parent=parent, crop_name=crop_name)
+        return ORJSONResponse(cells)
+
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    except Exception as e:
+        logger.error(f"Get rollup error: {str(e)}")
+        raise HTTPException(500, str(e))
+
+
+@router.get("/tiles/{z}/{x}/{y}")
+async def get_alert_tile(
+    z: int,
+    x: int,
+    y: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Alert density map tile (GeoJSON)
+
+    - **z**: Zoom level, 0 (whole world) to 8
+    - **x**: Column, counted eastward from longitude -180
+    - **y**: Row, counted northward from latitude -90
+
+    Each tile holds one point per non-empty sub-cell (16 x 16 per tile) with
+    detections, alerts and max severity. Send the ETag back as If-None-Match
+    to get 304 when the tile is unchanged.
+    """
+    if not alert_tile_service.is_valid_tile(z, x, y):
+        raise HTTPException(404, "Tile not found")
+    try:
+        tile = await alert_tile_service.get_tile(db, z, x, y)
+        headers = {
+            "ETag": tile["etag"],
+            "Cache-Control": f"public, max-age={settings.ALERT_TILE_MAX_AGE_SECONDS}",
         }
+        if etag_matches(request.headers.get("if-none-match"), tile["etag"]):
+            return Response(status_code=304, headers=headers)
+        return Response(tile["body"], media_type="application/geo+json", headers=headers)
+
+    except Exception as e:
+        logger.error(f"Get tile error: {str(e)}")
+        raise HTTPException(500, str(e))
+
+
+@router.get("/stats", response_model=AlertStats)
+async def get_alert_stats(
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Get global alert statistics
+
+    Totals over active alerts with per-crop and per-severity breakdowns.
+    Cached briefly and refreshed whenever alert counts change.
+    """
+    try:
+        return ORJSONResponse(await alert_service.get_stats(db))
 
     except Exception as e:
         logger.error(f"Get stats error: {str(e)}")
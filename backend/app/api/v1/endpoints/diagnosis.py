@@ -1,15 +1,38 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
+from fastapi import APIRouter, UploadFile, File, Form, Header, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.base import get_db
+from app.db.base import AsyncSessionLocal, get_db
+from app.core.config import settings
 from app.services.ml.inference import inference_service
 from app.services.ml.explainability import explainability_service
 from app.services.storage_service import storage_service
 from app.services.geolocation_service import geolocation_service
+from app.services.alert_service import alert_service
+from app.services.alert_aggregator import alert_aggregator
+from app.services.alert_events import alerts_changed
+from app.services.reference_catalog import reference_catalog
+from app.services.idempotency import diagnosis_idempotency, IdempotencyConflict, IdempotencyInProgress
+from app.services.diagnosis_jobs import diagnosis_jobs, PENDING_STATUSES, QueueFull
 from app.models.diagnosis import Diagnosis
-from app.models.disease_alert import DiseaseAlert
-from app.schemas.diagnosis import DiagnosisResponse, QualityMetrics, PredictionItem
+from app.models.treatment import CropStage
+from app.core.responses import RawJSONResponse
+from app.schemas.diagnosis import (
+    DiagnosisResponse,
+    QualityMetrics,
+    PredictionItem,
+    PresignedUploadRequest,
+    PresignedUploadResponse,
+    DiagnosisFromObjectRequest,
+    DiagnosisJobResponse,
+    TreatmentResponse,
+)
 from sqlalchemy import select
-from datetime import datetime, date, timezone
+from pydantic import BaseModel
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+import numpy as np
+import asyncio
+import hashlib
 import uuid
 import logging
 
@@ -18,12 +41,76 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/diagnosis", tags=["diagnosis"])
 
 
-@router.post("/upload", response_model=DiagnosisResponse)
+CONTENT_TYPE_EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/jpg": "jpg",
+    "image/png": "png",
+}
+
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+
+def request_fingerprint(image: bytes, *fields) -> str:
+    """Hash of what a diagnosis request asks for, to tell a retry from key reuse"""
+    digest = hashlib.blake2b(image, digest_size=16)
+    digest.update(repr(fields).encode())
+    return digest.hexdigest()
+
+
+async def run_idempotent(
+    idempotency_key: Optional[str],
+    user_id: Optional[str],
+    fingerprint: str,
+    diagnose: Callable[[], Awaitable[BaseModel]],
+    status_code: int = 200,
+):
+    """
+    Run `diagnose` once per Idempotency-Key: retries and concurrent
+    duplicates get the first response (marked Idempotent-Replayed) without
+    another inference, upload or alert update.
+    """
+    if idempotency_key is None:
+        response = await diagnose()
+        if status_code == 200:
+            return response
+        return JSONResponse(response.model_dump(mode="json"), status_code=status_code)
+    if not 0 < len(idempotency_key) <= MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise HTTPException(400, f"Idempotency-Key must be 1-{MAX_IDEMPOTENCY_KEY_LENGTH} characters")
+
+    async def compute():
+        return (await diagnose()).model_dump(mode="json")
+
+    try:
+        body, replayed = await diagnosis_idempotency.run(
+            f"{user_id or '-'}:{idempotency_key}", fingerprint, compute
+        )
+    except IdempotencyConflict:
+        raise HTTPException(422, "Idempotency-Key was already used for a different request")
+    except IdempotencyInProgress:
+        raise HTTPException(
+            409,
+            "A request with this Idempotency-Key is still in progress",
+            headers={"Retry-After": "5"},
+        )
+    return JSONResponse(
+        body,
+        status_code=status_code,
+        headers={"Idempotent-Replayed": "true" if replayed else "false"},
+    )
+
+
+@router.post(
+    "/upload",
+    response_model=DiagnosisResponse,
+    responses={202: {"model": DiagnosisJobResponse, "description": "Queued (Prefer: respond-async)"}},
+)
 async def upload_and_diagnose(
     image: UploadFile = File(..., description="Crop image for diagnosis"),
     latitude: float = Form(None),
     longitude: float = Form(None),
     user_id: str = Form(None),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    prefer: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -33,140 +120,436 @@ async def upload_and_diagnose(
     - **latitude**: Optional GPS latitude
     - **longitude**: Optional GPS longitude
     - **user_id**: Optional user ID
+    - **Idempotency-Key** (header): Optional; a retry with the same key
+      gets the first response instead of a new diagnosis
+    - **Prefer: respond-async** (header): Optional; store the image, queue
+      the diagnosis and answer `202` with a job to poll at
+      `/diagnosis/jobs/{id}` (`429` with Retry-After if the queue is full)
     """
     try:
         # Validate file
-        if image.content_type not in ["image/jpeg", "image/jpg", "image/png"]:
+        if image.content_type not in CONTENT_TYPE_EXTENSIONS:
             raise HTTPException(400, "Invalid file type. Only JPG/PNG allowed")
 
         # Read image bytes
         image_bytes = await image.read()
 
-        # Run inference
-        prediction_result = await inference_service.predict_disease(image_bytes)
+        if prefer and "respond-async" in prefer.lower() and diagnosis_jobs.enabled:
+            return await run_idempotent(
+                idempotency_key,
+                user_id,
+                request_fingerprint(image_bytes, latitude, longitude, "async"),
+                lambda: enqueue_diagnosis(image_bytes, image.content_type, latitude, longitude, user_id),
+                status_code=202,
+            )
+
+        return await run_idempotent(
+            idempotency_key,
+            user_id,
+            request_fingerprint(image_bytes, latitude, longitude),
+            lambda: diagnose_image(
+                db,
+                image_bytes,
+                filename=image.filename,
+                latitude=latitude,
+                longitude=longitude,
+                user_id=user_id,
+            ),
+        )
+
+    except HTTPException:
+        raise
+    except QueueFull as e:
+        raise HTTPException(
+            429,
+            "Too many diagnoses queued, try again later",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except Exception as e:
+        logger.error(f"Upload error: {str(e)}")
+        raise HTTPException(500, f"Error processing image: {str(e)}")
+
+
+@router.post("/upload-url", response_model=PresignedUploadResponse)
+async def create_upload_url(request: PresignedUploadRequest):
+    """
+    Step 1 of the direct upload flow: get a presigned upload target.
+
+    The client sends the image straight to storage using the returned
+    `upload_url`, `method`, `fields` and `headers`, then calls
+    `/diagnosis/from-object` with the `object_key`.
+    """
+    file_ext = CONTENT_TYPE_EXTENSIONS.get(request.content_type)
+    if file_ext is None:
+        raise HTTPException(400, "Invalid file type. Only JPG/PNG allowed")
+
+    try:
+        upload = storage_service.create_presigned_upload(request.content_type, file_ext)
+        return PresignedUploadResponse(**upload)
+    except Exception as e:
+        logger.error(f"Presign error: {str(e)}")
+        raise HTTPException(500, str(e))
+
+
+@router.put("/direct-upload/{object_key:path}", status_code=204)
+async def direct_upload(
+    object_key: str,
+    request: Request,
+    expires: int,
+    signature: str,
+):
+    """Upload target for presigned URLs when STORAGE_BACKEND is "local" """
+    if settings.STORAGE_BACKEND != "local":
+        raise HTTPException(404, "Direct upload is only served by the local storage backend")
+    if not storage_service.verify_local_upload(object_key, expires, signature):
+        raise HTTPException(403, "Invalid or expired upload signature")
+
+    # Refuse oversized uploads before reading them, and stop reading once
+    # the cap is passed when Content-Length is missing or wrong
+    max_bytes = settings.MAX_FILE_SIZE_MB * 1024 * 1024
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise HTTPException(413, "File too large")
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            raise HTTPException(413, "File too large")
+    if not body:
+        raise HTTPException(400, "Empty upload")
+
+    await storage_service.save_local_object(object_key, bytes(body))
+    return Response(status_code=204)
+
+
+@router.post("/from-object", response_model=DiagnosisResponse)
+async def diagnose_uploaded_object(
+    request: DiagnosisFromObjectRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Step 2 of the direct upload flow: diagnose an image already in storage.
+
+    - **object_key**: Key returned by `/diagnosis/upload-url`
+    - **Idempotency-Key** (header): Optional, as for `/diagnosis/upload`
+    """
+    if not storage_service.is_valid_object_key(request.object_key):
+        raise HTTPException(400, "Invalid object key")
+
+    try:
+        image_bytes = await storage_service.download_object(
+            request.object_key,
+            max_bytes=settings.MAX_FILE_SIZE_MB * 1024 * 1024,
+        )
+    except FileNotFoundError:
+        raise HTTPException(404, "Uploaded object not found")
+    except ValueError as e:
+        raise HTTPException(413, str(e))
+
+    try:
+        return await run_idempotent(
+            idempotency_key,
+            request.user_id,
+            request_fingerprint(image_bytes, request.object_key, request.latitude, request.longitude),
+            lambda: diagnose_image(
+                db,
+                image_bytes,
+                filename=request.object_key.rsplit("/", 1)[-1],
+                latitude=request.latitude,
+                longitude=request.longitude,
+                user_id=request.user_id,
+                image_url=storage_service.object_url(request.object_key),
+            ),
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Object diagnosis error: {str(e)}")
+        raise HTTPException(500, f"Error processing image: {str(e)}")
+
+
+async def enqueue_diagnosis(
+    image_bytes: bytes,
+    content_type: str,
+    latitude: Optional[float],
+    longitude: Optional[float],
+    user_id: Optional[str],
+) -> DiagnosisJobResponse:
+    """Store an upload and queue its diagnosis; raises QueueFull at capacity"""
+    # Before storing anything, so a full queue turns requests away cheaply
+    await diagnosis_jobs.check_admission()
+    object_key = storage_service.new_object_key(CONTENT_TYPE_EXTENSIONS[content_type], "diagnoses")
+    await storage_service.store_object(object_key, image_bytes, content_type)
+    job = await diagnosis_jobs.submit({
+        "object_key": object_key,
+        "latitude": latitude,
+        "longitude": longitude,
+        "user_id": user_id,
+    })
+    return DiagnosisJobResponse(**job)
+
+
+async def run_diagnosis_job(payload: Dict) -> Dict:
+    """diagnosis_jobs handler: the direct upload pipeline on a stored upload"""
+    object_key = payload["object_key"]
+    image_bytes = await storage_service.download_object(object_key)
+    async with AsyncSessionLocal() as db:
+        response = await diagnose_image(
+            db,
+            image_bytes,
+            filename=object_key.rsplit("/", 1)[-1],
+            latitude=payload["latitude"],
+            longitude=payload["longitude"],
+            user_id=payload["user_id"],
+            image_url=storage_service.object_url(object_key),
+            require_db=True,
+        )
+    return response.model_dump(mode="json")
+
+
+async def diagnose_image(
+    db: AsyncSession,
+    image_bytes: bytes,
+    filename: Optional[str] = None,
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
+    user_id: Optional[str] = None,
+    image_url: Optional[str] = None,
+    require_db: bool = False,
+) -> DiagnosisResponse:
+    """
+    Run the diagnosis pipeline on image bytes: inference, storage,
+    heatmap, persistence and alert update.
+
+    If `image_url` is given the image is already stored and is not uploaded again.
+    With `require_db` a failed save raises instead of returning an id that
+    was never stored (asynchronous jobs: clients fetch it afterwards).
+    """
+    filename = filename or "image.jpg"
+
+    # Run inference
+    prediction_result = await inference_service.predict_disease(image_bytes)
 
-        # Upload to S3
-        file_ext = image.filename.split(".")[-1] if "." in image.filename else "jpg"
+    # Upload to S3
+    if image_url is None:
+        file_ext = filename.split(".")[-1] if "." in filename else "jpg"
         try:
             image_url = await storage_service.upload_image(image_bytes, file_ext, "diagnoses")
         except Exception as upload_error:
             logger.warning(f"S3 upload failed (continuing without upload): {upload_error}")
 
-        # Generate heatmap (optional)
-        heatmap_bytes = explainability_service.generate_heatmap_simple(
-            image_bytes, 
-            prediction_result["confidence"]
-        )
-        heatmap_url = None
-        try:
-            heatmap_url = await storage_service.upload_image(heatmap_bytes, "jpg", "heatmaps")
-        except Exception as heatmap_error:
-            logger.warning(f"Heatmap upload failed (continuing without upload): {heatmap_error}")
+    # Generate heatmap (optional)
+    heatmap_bytes = await asyncio.to_thread(
+        explainability_service.generate_heatmap_simple,
+        image_bytes,
+        prediction_result["confidence"],
+    )
+    heatmap_url = None
+    try:
+        heatmap_url = await storage_service.upload_image(heatmap_bytes, "jpg", "heatmaps")
+    except Exception as heatmap_error:
+        logger.warning(f"Heatmap upload failed (continuing without upload): {heatmap_error}")
 
-        # Anonymize location if provided
-        grid_location = None
-        if latitude and longitude:
-            grid_location = geolocation_service.anonymize_location(latitude, longitude)
+    # Anonymize location if provided
+    grid_location = cell_id = None
+    if latitude and longitude:
+        grid_location = geolocation_service.anonymize_location(latitude, longitude)
+        # From the anonymized cell centre, never the raw coordinates
+        cell_id = geolocation_service.grid_location_cell_id(grid_location)
 
-        # Try to save to database (optional for development)
-        try:
-            # Save to database
-            diagnosis = Diagnosis(
-                id=uuid.uuid4(),
-                user_id=uuid.UUID(user_id) if user_id else None,
-                crop_name=prediction_result["cropName"],
-                disease_name=prediction_result["diseaseName"],
-                confidence_score=prediction_result["confidence"],
-                image_url=image_url,
-                image_quality_score=prediction_result.get("qualityScore", 85),
-                model_version=prediction_result.get("modelVersion", "1.0"),
-                extra_metadata={
-                    "latitude": latitude,
-                    "longitude": longitude,
-                    "filename": image.filename,
-                },
-                grid_location=grid_location,
-                needs_retry=prediction_result.get("needsRetry"),
+    diagnosis = Diagnosis(
+        id=uuid.uuid4(),
+        user_id=uuid.UUID(user_id) if user_id else None,
+        crop_name=prediction_result["cropName"],
+        disease_name=prediction_result["diseaseName"],
+        confidence_score=prediction_result["confidence"],
+        image_url=image_url,
+        image_quality_score=prediction_result.get("qualityScore", 85),
+        model_version=prediction_result.get("modelVersion", "1.0"),
+        extra_metadata={
+            "latitude": latitude,
+            "longitude": longitude,
+            "filename": filename,
+        },
+        grid_location=grid_location,
+        cell_id=cell_id,
+        needs_retry=prediction_result.get("needsRetry"),
+        heatmap_url=heatmap_url,
+        inference_output=pack_inference_output(prediction_result),
+        raw_logits=pack_logits(prediction_result.get("logits")),
+        created_at=datetime.now(timezone.utc),
+    )
+
+    # Build response compatible with mobile app (same shape GET /diagnosis/{id} rebuilds)
+    response = build_diagnosis_response(diagnosis)
+
+    # Try to save to database (optional for development)
+    saved = False
+    try:
+        db.add(diagnosis)
+
+        # Update disease alert if applicable: buffered and written in bulk,
+        # or upserted in the same transaction as the diagnosis
+        record_alert = grid_location and not prediction_result["isHealthy"]
+        changed_alerts = []
+        disease_id = None
+        if record_alert:
+            disease = reference_catalog.resolve_disease(
+                prediction_result["cropName"],
+                prediction_result["diseaseName"],
+                prediction_result.get("classIndex"),
+            )
+            disease_id = disease.id if disease else None
+        if record_alert and not alert_aggregator.enabled:
+            changed_alerts = await alert_service.record_detection(
+                db,
+                prediction_result["cropName"],
+                grid_location,
+                disease_id=disease_id,
             )
 
-            db.add(diagnosis)
-            await db.commit()
-            await db.refresh(diagnosis)
-
-            # Update disease alert if applicable
-            if grid_location and not prediction_result["isHealthy"]:
-                await update_disease_alert(
-                    db, 
-                    prediction_result["diseaseName"],
-                    prediction_result["cropName"],
-                    grid_location
-                )
-            
-            diagnosis_id = str(diagnosis.id)
-            logger.info(f"Diagnosis saved to database: {diagnosis_id}")
-        except Exception as db_error:
+        await db.commit()
+        saved = True
+
+        if record_alert and alert_aggregator.enabled:
+            alert_aggregator.add(prediction_result["cropName"], grid_location, disease_id=disease_id)
+        await alerts_changed(changed_alerts)
+
+        logger.info(f"Diagnosis saved to database: {diagnosis.id}")
+    except Exception as db_error:
+        if saved:
+            logger.warning(f"Alert update failed after saving diagnosis {diagnosis.id}: {db_error}")
+        else:
+            await db.rollback()
+            if require_db:
+                raise
+            # Respond anyway; the id is not persisted (development without DB)
             logger.warning(f"Database save failed (continuing without DB): {db_error}")
-            diagnosis_id = str(uuid.uuid4())  # Generate temporary ID
-            # Create a mock diagnosis object for response
-            class MockDiagnosis:
-                def __init__(self):
-                    self.id = uuid.UUID(diagnosis_id)
-                    self.created_at = datetime.utcnow()
-                    self.crop_name = prediction_result["cropName"]
-                    self.disease_name = prediction_result["diseaseName"]
-                    self.confidence_score = prediction_result["confidence"]
-                    self.needs_retry = prediction_result.get("needsRetry")
-                    self.image_url = image_url or "mock://no-upload"
-                    self.image_quality_score = prediction_result.get("qualityScore", 85)
-                    self.model_version = prediction_result.get("modelVersion", "1.0")
-            diagnosis = MockDiagnosis()
-
-        # Build response compatible with mobile app
-        response = DiagnosisResponse(
-            id=diagnosis_id,
-            crop_name=diagnosis.crop_name,
-            disease_name=diagnosis.disease_name,
-            confidence=diagnosis.confidence_score,
-            is_healthy=prediction_result["isHealthy"],
-            needs_retry=diagnosis.needs_retry,
-            image_url=diagnosis.image_url,
-            quality_metrics=QualityMetrics(
-                quality_score=prediction_result.get("qualityScore", 85),
-                blur_score=0,
-                brightness=0,
-                is_acceptable=True,
-                issues=[]
-            ),
-            top_3_predictions=[
-    PredictionItem(
-        class_name=pred["diseaseName"],
-        crop_name=pred["cropName"],
-        disease_name=pred["diseaseName"],
-        confidence=pred["confidence"],
-    )
-    for pred in prediction_result.get("top3Predictions", [])
-],
 
-            suggestions=prediction_result.get("suggestions", []),
-            model_version=diagnosis.model_version,
-            heatmap_url=heatmap_url,
-            created_at=diagnosis.created_at,
+    logger.info(f"Diagnosis created: {response.id}")
+    return response
+
+
+def pack_inference_output(prediction_result: dict) -> dict:
+    """
+    Compact form of the inference output stored on the diagnosis:
+    v=format version, h=is_healthy, q=[blur, brightness, acceptable, issues],
+    k=[[class label, confidence], ...] top-k, s=suggestions.
+    """
+    quality = prediction_result.get("qualityMetrics") or {}
+    return {
+        "v": 1,
+        "h": prediction_result["isHealthy"],
+        "q": [
+            round(quality.get("blur_score", 0.0), 2),
+            round(quality.get("brightness", 0.0), 2),
+            quality.get("is_acceptable", True),
+            quality.get("issues", []),
+        ],
+        "k": [
+            [pred["className"], round(pred["confidence"], 4)]
+            for pred in prediction_result.get("top3Predictions", [])
+        ],
+        "s": prediction_result.get("suggestions", []),
+    }
+
+
+def pack_logits(logits) -> Optional[bytes]:
+    if logits is None or not settings.STORE_RAW_LOGITS:
+        return None
+    return np.asarray(logits, dtype=np.float16).tobytes()
+
+
+def diagnosis_is_healthy(diagnosis: Diagnosis) -> bool:
+    is_healthy = (diagnosis.inference_output or {}).get("h")
+    if is_healthy is None:
+        # Rows stored before inference output was persisted
+        is_healthy = "healthy" in (diagnosis.disease_name or "").lower()
+    return is_healthy
+
+
+def diagnosis_disease_id(diagnosis: Diagnosis) -> Optional[uuid.UUID]:
+    """Catalog disease of a diagnosis (None if healthy or unknown)"""
+    if diagnosis_is_healthy(diagnosis):
+        return None
+    disease = reference_catalog.resolve_disease(diagnosis.crop_name, diagnosis.disease_name or "")
+    return disease.id if disease else None
+
+
+def build_diagnosis_response(diagnosis: Diagnosis, language: str = "en") -> DiagnosisResponse:
+    """Full diagnosis response from a single stored row, treatments from the reference catalog"""
+    output = diagnosis.inference_output or {}
+    blur_score, brightness, is_acceptable, issues = output.get("q", [0, 0, True, []])
+
+    top_predictions = []
+    for class_label, confidence in output.get("k", []):
+        crop_name, disease_name = inference_service.parse_class_name(class_label)
+        top_predictions.append(
+            PredictionItem(
+                class_name=disease_name,
+                crop_name=crop_name,
+                disease_name=disease_name,
+                confidence=confidence,
+            )
         )
 
-        logger.info(f"Diagnosis created: {diagnosis.id}")
-        return response
+    return DiagnosisResponse(
+        id=str(diagnosis.id),
+        crop_name=diagnosis.crop_name,
+        disease_name=diagnosis.disease_name,
+        confidence=diagnosis.confidence_score,
+        is_healthy=diagnosis_is_healthy(diagnosis),
+        needs_retry=diagnosis.needs_retry,
+        image_url=diagnosis.image_url or "mock://no-upload",
+        quality_metrics=QualityMetrics(
+            quality_score=diagnosis.image_quality_score or 0,
+            blur_score=blur_score,
+            brightness=brightness,
+            is_acceptable=is_acceptable,
+            issues=issues,
+        ),
+        top_3_predictions=top_predictions,
+        suggestions=output.get("s", []),
+        model_version=diagnosis.model_version,
+        heatmap_url=diagnosis.heatmap_url,
+        created_at=diagnosis.created_at,
+        treatments=reference_catalog.treatment_items(diagnosis_disease_id(diagnosis), language),
+    )
+
 
+@router.get("/jobs/{job_id}", response_model=DiagnosisJobResponse)
+async def get_diagnosis_job(
+    job_id: str,
+    response: Response,
+    wait: float = Query(0, ge=0, le=30),
+):
+    """
+    Status of a queued diagnosis, with the result once it has succeeded
+
+    - **wait**: Seconds to hold the request while the job is still pending
+      (long polling); pending responses carry Retry-After
+    """
+    try:
+        job = await diagnosis_jobs.wait(job_id, wait)
     except Exception as e:
-        logger.error(f"Upload error: {str(e)}")
-        raise HTTPException(500, f"Error processing image: {str(e)}")
+        logger.error(f"Get job error: {str(e)}")
+        raise HTTPException(500, str(e))
+
+    if job is None:
+        raise HTTPException(404, "Job not found or expired")
+    if job["status"] in PENDING_STATUSES:
+        response.headers["Retry-After"] = "1"
+    return job
 
 
 @router.get("/{diagnosis_id}", response_model=DiagnosisResponse)
 async def get_diagnosis(
     diagnosis_id: str,
+    language: str = "en",
     db: AsyncSession = Depends(get_db),
 ):
-    """Get diagnosis by ID"""
+    """Get diagnosis by ID (treatment instructions in `language`)"""
     try:
         result = await db.execute(
             select(Diagnosis).where(Diagnosis.id == uuid.UUID(diagnosis_id))
@@ -176,31 +559,10 @@ async def get_diagnosis(
         if not diagnosis:
             raise HTTPException(404, "Diagnosis not found")
 
-        # Reconstruct response
-        response = DiagnosisResponse(
-            id=str(diagnosis.id),
-            crop_name=diagnosis.crop_name,
-            disease_name=diagnosis.disease_name,
-            confidence=diagnosis.confidence_score,
-            is_healthy="healthy" in diagnosis.disease_name.lower(),
-            needs_retry=diagnosis.needs_retry,
-            image_url=diagnosis.image_url,
-            quality_metrics=QualityMetrics(
-                quality_score=diagnosis.image_quality_score or 0,
-                blur_score=0,
-                brightness=0,
-                is_acceptable=True,
-                issues=[]
-            ),
-            top_3_predictions=[],  # Not stored in DB
-            suggestions=[],
-            model_version=diagnosis.model_version,
-            heatmap_url=None,  # TODO: Store heatmap URL in DB
-            created_at=diagnosis.created_at,
-        )
-
-        return response
+        return build_diagnosis_response(diagnosis, language)
 
+    except HTTPException:
+        raise
     except ValueError:
         raise HTTPException(400, "Invalid diagnosis ID format")
     except Exception as e:
@@ -208,43 +570,41 @@ async def get_diagnosis(
         raise HTTPException(500, str(e))
 
 
-async def update_disease_alert(
-    db: AsyncSession,
-    disease_name: str,
-    crop_name: str,
-    grid_location: str
+@router.get("/{diagnosis_id}/treatments", response_model=List[TreatmentResponse])
+async def get_diagnosis_treatments(
+    diagnosis_id: str,
+    language: str = "en",
+    region: Optional[str] = None,
+    crop_stage: Optional[CropStage] = None,
+    db: AsyncSession = Depends(get_db),
 ):
-    """Update or create disease alert for location"""
+    """
+    Treatments for a diagnosed disease, most effective first
+
+    - **language**: Instructions language (falls back to English)
+    - **region**: Include region-specific treatments as well as global ones
+    - **crop_stage**: Only treatments for this stage (or any stage)
+
+    Served from the in-memory reference catalog, pre-serialized per
+    language, region and stage; the only query is the diagnosis lookup.
+    """
     try:
-        # Check if alert exists for today
         result = await db.execute(
-            select(DiseaseAlert).where(
-                DiseaseAlert.grid_location == grid_location,
-                DiseaseAlert.crop_name == crop_name,
-                DiseaseAlert.alert_date == date.today(),
-            )
+            select(Diagnosis).where(Diagnosis.id == uuid.UUID(diagnosis_id))
         )
-        alert = result.scalars().first()
+        diagnosis = result.scalars().first()
 
-        if alert:
-            # Update existing alert
-            alert.detection_count += 1
-            alert.severity_level = min(5, (alert.detection_count // 3) + 1)
-            alert.last_detected_at = date.today()
-        else:
-            # Create new alert
-            alert = DiseaseAlert(
-                id=uuid.uuid4(),
-                disease_id=None,  # TODO: Link to disease table
-                crop_name=crop_name,
-                grid_location=grid_location,
-                detection_count=1,
-                severity_level=1,
-            )
-            db.add(alert)
+        if not diagnosis:
+            raise HTTPException(404, "Diagnosis not found")
 
-        await db.commit()
-        logger.info(f"Disease alert updated: {grid_location}")
+        return RawJSONResponse(
+            reference_catalog.treatments_json(diagnosis_disease_id(diagnosis), language, region, crop_stage)
+        )
 
+    except HTTPException:
+        raise
+    except ValueError:
+        raise HTTPException(400, "Invalid diagnosis ID format")
     except Exception as e:
-        logger.error(f"Alert update error: {str(e)}")
+        logger.error(f"Get treatments error: {str(e)}")
+        raise HTTPException(500, str(e))
@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.base import get_db
 from app.models.diagnosis import Diagnosis
-from app.schemas.diagnosis import HistoryItem
-from sqlalchemy import select, desc
+from app.schemas.diagnosis import HistoryItem, HistoryPage, RecentItem, RecentPage
+from app.core.pagination import InvalidCursor, build_page, keyset_query
+from app.core.responses import ORJSONResponse
+from sqlalchemy import select
+from typing import List, Optional, Union
 import uuid
 import logging
 
@@ -12,41 +15,77 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/history", tags=["history"])
 
 
-@router.get("/user/{user_id}")
+# Only the columns list views need (no extra_metadata JSON), labelled to
+# match HistoryItem / RecentItem so rows serialize without model validation
+HISTORY_COLUMNS = (
+    Diagnosis.id,
+    Diagnosis.crop_name,
+    Diagnosis.disease_name,
+    Diagnosis.confidence_score.label("confidence"),
+    Diagnosis.image_url,
+    Diagnosis.created_at,
+)
+RECENT_COLUMNS = (
+    Diagnosis.id,
+    Diagnosis.crop_name,
+    Diagnosis.disease_name,
+    Diagnosis.confidence_score.label("confidence"),
+    Diagnosis.created_at,
+)
+
+
+def _page_response(rows, limit: int, forward: bool, first: bool, paginate: bool) -> ORJSONResponse:
+    rows, next_cursor, sync_cursor = build_page(rows, limit, forward, first)
+    if not paginate:
+        # Clients from before pagination get the bare list of the newest rows
+        return ORJSONResponse([row._asdict() for row in rows])
+    return ORJSONResponse({
+        "items": [row._asdict() for row in rows],
+        "next_cursor": next_cursor,
+        "sync_cursor": sync_cursor,
+    })
+
+
+@router.get("/user/{user_id}", response_model=Union[HistoryPage, List[HistoryItem]])
 async def get_user_history(
     user_id: str,
-    limit: int = 20,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    since: Optional[str] = None,
+    paginate: bool = False,
     db: AsyncSession = Depends(get_db),
 ):
     """
     Get user's diagnosis history
-    
+
     - **user_id**: User ID
     - **limit**: Maximum number of results (default 20)
+    - **cursor**: `next_cursor` from a previous page, to page further back
+    - **since**: `sync_cursor` saved from an earlier response; returns only
+      newer diagnoses, oldest first (plus a short overlap; upsert by id)
+    - **paginate**: return `{items, next_cursor, sync_cursor}` (implied by
+      cursor / since); without it, a bare list as before pagination
     """
     try:
-        result = await db.execute(
-            select(Diagnosis)
-            .where(Diagnosis.user_id == uuid.UUID(user_id))
-            .order_by(desc(Diagnosis.created_at))
-            .limit(limit)
+        query = keyset_query(
+            select(*HISTORY_COLUMNS).where(Diagnosis.user_id == uuid.UUID(user_id)),
+            Diagnosis.created_at,
+            Diagnosis.id,
+            limit,
+            cursor=cursor,
+            since=since,
+        )
+        result = await db.execute(query)
+        return _page_response(
+            result.all(),
+            limit,
+            forward=bool(since),
+            first=not cursor,
+            paginate=paginate or bool(cursor or since),
         )
-        diagnoses = result.scalars().all()
-
-        history = [
-            HistoryItem(
-                id=str(d.id),
-                crop_name=d.crop_name,
-                disease_name=d.disease_name,
-                confidence=d.confidence_score,
-                image_url=d.image_url,
-                created_at=d.created_at,
-            )
-            for d in diagnoses
-        ]
-
-        return history
 
+    except InvalidCursor as e:
+        raise HTTPException(400, str(e))
     except ValueError:
         raise HTTPException(400, "Invalid user ID format")
     except Exception as e:
@@ -54,68 +93,77 @@ async def get_user_history(
         raise HTTPException(500, str(e))
 
 
-@router.get("/")
+@router.get("/", response_model=Union[HistoryPage, List[HistoryItem]])
 async def get_all_history(
-    limit: int = 50,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    since: Optional[str] = None,
+    paginate: bool = False,
     db: AsyncSession = Depends(get_db),
 ):
     """
     Get all diagnosis history (for frontend display)
-    
+
     - **limit**: Maximum number of results (default 50)
+    - **cursor**: `next_cursor` from a previous page
+    - **since**: `sync_cursor` from an earlier response, for incremental sync
+    - **paginate**: return `{items, next_cursor, sync_cursor}` (implied by
+      cursor / since); without it, a bare list as before pagination
     """
     try:
-        result = await db.execute(
-            select(Diagnosis)
-            .order_by(desc(Diagnosis.created_at))
-            .limit(limit)
+        query = keyset_query(
+            select(*HISTORY_COLUMNS),
+            Diagnosis.created_at,
+            Diagnosis.id,
+            limit,
+            cursor=cursor,
+            since=since,
+        )
+        result = await db.execute(query)
+        return _page_response(
+            result.all(),
+            limit,
+            forward=bool(since),
+            first=not cursor,
+            paginate=paginate or bool(cursor or since),
         )
-        diagnoses = result.scalars().all()
-
-        history = [
-            HistoryItem(
-                id=str(d.id),
-                crop_name=d.crop_name,
-                disease_name=d.disease_name,
-                confidence=d.confidence_score,
-                image_url=d.image_url,
-                created_at=d.created_at,
-            )
-            for d in diagnoses
-        ]
-
-        return history
 
+    except InvalidCursor as e:
+        raise HTTPException(400, str(e))
     except Exception as e:
         logger.error(f"Get all history error: {str(e)}")
         raise HTTPException(500, str(e))
 
 
-@router.get("/recent")
+@router.get("/recent", response_model=Union[RecentPage, List[RecentItem]])
 async def get_recent_diagnoses(
-    limit: int = 10,
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    since: Optional[str] = None,
+    paginate: bool = False,
     db: AsyncSession = Depends(get_db),
 ):
     """Get recent diagnoses (for admin/stats)"""
     try:
-        result = await db.execute(
-            select(Diagnosis)
-            .order_by(desc(Diagnosis.created_at))
-            .limit(limit)
+        query = keyset_query(
+            select(*RECENT_COLUMNS),
+            Diagnosis.created_at,
+            Diagnosis.id,
+            limit,
+            cursor=cursor,
+            since=since,
+        )
+        result = await db.execute(query)
+        return _page_response(
+            result.all(),
+            limit,
+            forward=bool(since),
+            first=not cursor,
+            paginate=paginate or bool(cursor or since),
         )
-        diagnoses = result.scalars().all()
-
-        return [
-            {
-                "id": str(d.id),
-                "crop_name": d.crop_name,
-                "disease_name": d.disease_name,
-                "confidence": d.confidence_score,
-                "created_at": d.created_at.isoformat(),
-            }
-            for d in diagnoses
-        ]
 
+    except InvalidCursor as e:
+        raise HTTPException(400, str(e))
     except Exception as e:
         logger.error(f"Get recent error: {str(e)}")
         raise HTTPException(500, str(e))
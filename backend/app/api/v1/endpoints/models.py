@@ -1,44 +1,114 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.services.ml.model_manager import model_manager
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from app.services.ml.inference import inference_service
+from app.services.ml.model_distribution import model_distribution, FILE_NAME_PATTERN, PATCH_NAME_PATTERN
 from app.schemas.diagnosis import ModelInfo
+from app.core.http_cache import etag_matches
 from app.core.config import settings
+from app.core import metrics
+from pathlib import Path
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/models", tags=["models"])
 
+# Content-addressed: a URL always returns the same bytes
+IMMUTABLE = "public, max-age=31536000, immutable"
+
 
 @router.get("/latest", response_model=ModelInfo)
 async def get_latest_model():
     """
     Get latest model information for offline sync
-    
-    Returns model version and download URL
+
+    A device whose model's SHA-256 equals `sha256` is up to date. Otherwise
+    it downloads the patch listed for its current hash if there is one,
+    else one of `downloads`, resuming with Range requests if interrupted,
+    and checks the result against `sha256` before using it. Until a release
+    is published, `sha256` and `download_url` are null and `downloads` is
+    empty: keep the current model.
     """
     try:
-        model_info = model_manager.get_model_info()
-
-        # In production, host model file on S3 or CDN
-        download_url = f"https://your-cdn.com/models/plant_disease_{model_info['version']}.tflite"
-
-        return ModelInfo(
-            version=model_info["version"],
-            download_url=download_url,
-            size_mb=5.2,  # Approximate size
-            last_updated="2026-01-27",
-        )
-
+        release = model_distribution.describe()
     except Exception as e:
         logger.error(f"Get model info error: {str(e)}")
         raise HTTPException(500, str(e))
+    if release is None:
+        # Nothing downloadable yet (first start, or publishing failed):
+        # devices keep the model they have and check again later
+        model = inference_service.model
+        return ModelInfo(
+            version=model.version if model else settings.MODEL_VERSION,
+            download_url=None,
+            size_mb=None,
+            last_updated=None,
+        )
+
+    return ModelInfo(
+        version=release["version"],
+        download_url=release["downloads"][0]["url"],
+        size_mb=round(release["size"] / (1024 * 1024), 2),
+        last_updated=release["published_at"],
+        sha256=release["sha256"],
+        size_bytes=release["size"],
+        downloads=release["downloads"],
+        patches=release["patches"],
+    )
+
+
+def serve_artifact(request: Request, path: Path, etag: str, kind: str, media_type: str):
+    """An immutable release file: 304 on a matching If-None-Match, Range and If-Range otherwise"""
+    if not path.exists():
+        raise HTTPException(404, "Not found")
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        metrics.MODEL_DOWNLOADS_TOTAL.labels(kind, "not_modified").inc()
+        return Response(status_code=304, headers=headers)
+    ranged = "range" in request.headers and request.headers.get("if-range", etag) == etag
+    metrics.MODEL_DOWNLOADS_TOTAL.labels(kind, "partial" if ranged else "full").inc()
+    return FileResponse(path, media_type=media_type, headers=headers, filename=path.name)
+
+
+@router.api_route("/files/{name}", methods=["GET", "HEAD"])
+async def download_model_file(name: str, request: Request):
+    """Model file by SHA-256: `<sha256>.onnx`, or `<sha256>.onnx.gz` compressed"""
+    match = FILE_NAME_PATTERN.match(name)
+    if not match:
+        raise HTTPException(404, "Not found")
+    compressed = match.group(2) is not None
+    return serve_artifact(
+        request,
+        model_distribution.file_path(match.group(1), compressed=compressed),
+        f'"{name}"',
+        "gzip" if compressed else "model",
+        "application/gzip" if compressed else "application/octet-stream",
+    )
+
+
+@router.api_route("/patches/{name}", methods=["GET", "HEAD"])
+async def download_model_patch(name: str, request: Request):
+    """Patch `<from sha256>-<to sha256>.patch` (format in app/services/ml/model_patch.py)"""
+    match = PATCH_NAME_PATTERN.match(name)
+    if not match:
+        raise HTTPException(404, "Not found")
+    return serve_artifact(
+        request,
+        model_distribution.patch_path(match.group(1), match.group(2)),
+        f'"{name}"',
+        "patch",
+        "application/octet-stream",
+    )
 
 
 @router.get("/info")
 async def get_model_details():
     """Get detailed model information"""
     try:
-        return model_manager.get_model_info()
+        info = inference_service.model_info()
+        latest = model_distribution.latest
+        info["distributed_sha256"] = latest["sha256"] if latest else None
+        return info
     except Exception as e:
         logger.error(f"Get model details error: {str(e)}")
         raise HTTPException(500, str(e))
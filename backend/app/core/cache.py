@@ -0,0 +1,175 @@
+from app.core.config import settings
+from app.core import metrics
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import time
+import orjson
+import redis.asyncio as aioredis
+import logging
+
+logger = logging.getLogger(__name__)
+
+_redis = None
+_redis_retry_at = 0.0
+REDIS_RETRY_SECONDS = 30.0
+
+
+def get_redis():
+    """
+    Shared async Redis client, or None if caching in Redis is disabled or
+    Redis recently failed (retried after REDIS_RETRY_SECONDS).
+    """
+    global _redis
+    if not settings.CACHE_REDIS_ENABLED or time.monotonic() < _redis_retry_at:
+        return None
+    if _redis is None:
+        _redis = aioredis.from_url(
+            settings.REDIS_URL,
+            socket_timeout=settings.CACHE_REDIS_TIMEOUT_SECONDS,
+            socket_connect_timeout=settings.CACHE_REDIS_TIMEOUT_SECONDS,
+        )
+    return _redis
+
+
+def _redis_failed(e: Exception):
+    global _redis_retry_at
+    now = time.monotonic()
+    if now >= _redis_retry_at:
+        # Log once per outage, not once per concurrent caller
+        logger.warning(f"Redis cache unavailable, using in-process cache only: {str(e)}")
+    _redis_retry_at = now + REDIS_RETRY_SECONDS
+
+
+async def close_redis():
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
+
+
+class TTLCache:
+    """
+    Short-TTL cache for JSON-serializable values: a per-process dict in front
+    of Redis (shared by all workers). Local copies live at most local_ttl so
+    an invalidation in another process is seen within that bound; Redis
+    errors degrade to the local layer only. With max_entries the local layer
+    drops its oldest entries beyond that size.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        ttl: float,
+        local_ttl: Optional[float] = None,
+        max_entries: Optional[int] = None,
+    ):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.local_ttl = min(ttl, local_ttl) if local_ttl is not None else ttl
+        self.max_entries = max_entries
+        self._local: Dict[str, Tuple[float, Any]] = {}
+        # Per key, only while a compute is running or waited on: lock and its users
+        self._locks: Dict[str, List] = {}
+        self._generations: Dict[str, int] = {}  # Invalidations during a compute
+        self.epoch = 0  # Bumped by clear()
+
+    def _redis_key(self, key: str) -> str:
+        return f"cache:{self.namespace}:{key}"
+
+    def _store_local(self, key: str, value: Any):
+        self._local.pop(key, None)
+        self._local[key] = (time.monotonic() + self.local_ttl, value)
+        if self.max_entries is not None and len(self._local) > self.max_entries:
+            # Dicts keep insertion order: the first key is the oldest write
+            del self._local[next(iter(self._local))]
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._local.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            metrics.CACHE_REQUESTS_TOTAL.labels(self.namespace, "local_hit").inc()
+            return entry[1]
+
+        redis = get_redis()
+        if redis is not None:
+            try:
+                raw = await redis.get(self._redis_key(key))
+            except Exception as e:
+                _redis_failed(e)
+            else:
+                if raw is not None:
+                    value = orjson.loads(raw)
+                    self._store_local(key, value)
+                    metrics.CACHE_REQUESTS_TOTAL.labels(self.namespace, "redis_hit").inc()
+                    return value
+
+        metrics.CACHE_REQUESTS_TOTAL.labels(self.namespace, "miss").inc()
+        return None
+
+    async def set(self, key: str, value: Any):
+        self._store_local(key, value)
+        redis = get_redis()
+        if redis is not None:
+            try:
+                await redis.set(self._redis_key(key), orjson.dumps(value), px=int(self.ttl * 1000))
+            except Exception as e:
+                _redis_failed(e)
+
+    async def delete(self, key: str):
+        await self.delete_many([key])
+
+    async def delete_many(self, keys: Iterable[str]):
+        keys = list(keys)
+        if not keys:
+            return
+        for key in keys:
+            self._local.pop(key, None)
+            if key in self._locks:
+                self._generations[key] = self._generations.get(key, 0) + 1
+        redis = get_redis()
+        if redis is not None:
+            try:
+                await redis.delete(*[self._redis_key(key) for key in keys])
+            except Exception as e:
+                _redis_failed(e)
+
+    async def clear(self):
+        """Drop every entry of this namespace, here and in Redis"""
+        self._local.clear()
+        self.epoch += 1
+        redis = get_redis()
+        if redis is not None:
+            try:
+                keys = [key async for key in redis.scan_iter(match=self._redis_key("*"), count=500)]
+                if keys:
+                    await redis.delete(*keys)
+            except Exception as e:
+                _redis_failed(e)
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Cached value, computing it on a miss (once per process, however many callers wait)"""
+        value = await self.get(key)
+        if value is not None:
+            return value
+
+        holder = self._locks.get(key)
+        if holder is None:
+            holder = self._locks[key] = [asyncio.Lock(), 0]
+        holder[1] += 1
+        try:
+            async with holder[0]:
+                # Another caller may have filled it while we waited
+                entry = self._local.get(key)
+                if entry is not None and entry[0] > time.monotonic():
+                    return entry[1]
+                generation, epoch = self._generations.get(key, 0), self.epoch
+                value = await compute()
+                # Don't cache a result computed across an invalidation
+                if self._generations.get(key, 0) == generation and self.epoch == epoch:
+                    await self.set(key, value)
+                return value
+        finally:
+            holder[1] -= 1
+            if not holder[1]:
+                # Last caller for the key: keep no per-key state between misses
+                del self._locks[key]
+                self._generations.pop(key, None)
@@ -9,12 +9,27 @@ class Settings(BaseSettings):
     # Database
     DATABASE_URL: str
     REDIS_URL: str
+    DB_ECHO: bool = False  # Log every SQL statement (independent of ENVIRONMENT)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 10.0  # Seconds to wait for a pooled connection
+    DB_POOL_RECYCLE: int = 1800  # Seconds before a connection is replaced
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100  # asyncpg prepared statements per connection (0 behind pgbouncer)
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 100  # SQLAlchemy asyncpg adapter cache
 
     # AWS Configuration
     AWS_ACCESS_KEY_ID: str
     AWS_SECRET_ACCESS_KEY: str
     AWS_REGION: str = "us-east-1"
     S3_BUCKET_NAME: str
+    S3_MAX_POOL_CONNECTIONS: int = 50
+
+    # Storage
+    STORAGE_BACKEND: str = "s3"  # "s3" or "local"
+    LOCAL_STORAGE_DIR: str = "uploads"
+    PUBLIC_BASE_URL: str = "http://localhost:8000"
+    PRESIGNED_UPLOAD_EXPIRE_SECONDS: int = 900
 
     # API Configuration
     API_V1_PREFIX: str = "/api/v1"
@@ -22,11 +37,18 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
+    # History pagination (cursor / since)
+    HISTORY_SYNC_OVERLAP_SECONDS: float = 60.0  # `since` re-sends rows up to this much older than its cursor (late commits)
+
     # ML Configuration
     MODEL_PATH: str = "./models/plant_disease_model.onnx"  # Changed from .tflite to .onnx
     MODEL_VERSION: str = "v1.0"
+    MODEL_SHARED_WEIGHTS: Optional[bool] = None  # Share memory-mapped external weights between workers (no prepacking, basic optimizations); unset: only for external-weight models with WEB_CONCURRENCY > 1
+    WEB_CONCURRENCY: int = 1  # gunicorn worker processes (read by gunicorn.conf.py)
+    MODEL_INTRA_OP_THREADS: int = 0  # Threads per inference; 0 = all cores (set ~cores/workers with several workers)
     CONFIDENCE_THRESHOLD: float = 0.70
     IMAGE_SIZE: int = 224
+    STORE_RAW_LOGITS: bool = False  # Keep float16 logits on each diagnosis
 
     # Twilio
     TWILIO_ACCOUNT_SID: Optional[str] = None
@@ -38,6 +60,85 @@ class Settings(BaseSettings):
     GRID_SIZE_KM: int = 10
     ALERT_RADIUS_KM: int = 50
 
+    # Alert write-behind buffer (0 interval disables it: upsert per request)
+    ALERT_FLUSH_INTERVAL_SECONDS: float = 2.0  # Max staleness of alert counts
+    ALERT_FLUSH_MAX_EVENTS: int = 500  # Flush early once this many detections are buffered
+
+    # Caching (in-process, in front of Redis at REDIS_URL)
+    CACHE_REDIS_ENABLED: bool = True
+    CACHE_REDIS_TIMEOUT_SECONDS: float = 0.25  # Give up on Redis quickly and use the local layer
+    ALERT_STATS_CACHE_TTL_SECONDS: float = 30.0
+    ALERT_STATS_LOCAL_CACHE_TTL_SECONDS: float = 5.0  # Max staleness after another worker invalidates
+    ALERT_TILE_DAYS: int = 7  # Detections shown on map tiles
+    ALERT_TILE_CACHE_TTL_SECONDS: float = 600.0  # Tiles are also dropped as soon as their cells change
+    ALERT_TILE_LOCAL_CACHE_TTL_SECONDS: float = 10.0
+    ALERT_TILE_MAX_AGE_SECONDS: int = 30  # Client Cache-Control; revalidated with the ETag afterwards
+
+    # Real-time alert push (GET /alerts/stream)
+    ALERT_PUSH_REDIS_ENABLED: bool = False  # Fan out through Redis pub/sub (needed with several workers)
+    ALERT_PUSH_MAX_RADIUS_KM: float = 100.0
+    ALERT_PUSH_MAX_SUBSCRIBERS: int = 50000  # Per process
+    ALERT_PUSH_QUEUE_SIZE: int = 32  # Undelivered events per subscriber before it is told to resync
+    ALERT_PUSH_HEARTBEAT_SECONDS: float = 25.0
+
+    # HTTP caching (ETag / Cache-Control / 304 on read endpoints)
+    HTTP_CACHE_ENABLED: bool = True
+    HTTP_RESPONSE_CACHE_ENABLED: bool = True  # Also keep hot GET responses server-side
+    HTTP_RESPONSE_CACHE_MAX_ENTRIES: int = 2048  # Per route, per process
+
+    # Idempotency-Key on diagnosis requests (Redis, or per process without it)
+    IDEMPOTENCY_TTL_SECONDS: float = 86400.0  # How long a finished request's response is replayed
+    IDEMPOTENCY_LOCK_SECONDS: float = 120.0  # Claim on an in-flight key; expires if its worker dies
+    IDEMPOTENCY_WAIT_SECONDS: float = 30.0  # Duplicates wait this long for the first request, then 409
+
+    # Asynchronous diagnosis jobs (Prefer: respond-async on /diagnosis/upload)
+    DIAGNOSIS_JOB_BACKEND: str = "local"  # "local" (this process) or "redis" (shared, for `python -m app.worker`)
+    DIAGNOSIS_JOB_WORKERS: int = 2  # Jobs run at once by this process; 0 only enqueues
+    DIAGNOSIS_JOB_MAX_QUEUED: int = 100  # Waiting jobs before new ones get 429
+    DIAGNOSIS_JOB_TIMEOUT_SECONDS: float = 120.0
+    DIAGNOSIS_JOB_RESULT_TTL_SECONDS: float = 3600.0  # How long job status and results can be fetched
+
+    # Load shedding and per-client rate limits (per process; 429/503 with Retry-After)
+    LOAD_SHEDDING_ENABLED: bool = True
+    LOAD_INFERENCE_CONCURRENCY: int = 4  # Synchronous diagnoses in flight
+    LOAD_UPLOAD_CONCURRENCY: int = 32  # Queued (async) uploads and direct-upload steps in flight
+    LOAD_READ_CONCURRENCY: int = 256  # GET requests in flight
+    LOAD_DOWNLOAD_CONCURRENCY: int = 64  # Model downloads in flight (long-lived on slow networks)
+    LOAD_QUEUE_TIMEOUT_SECONDS: float = 5.0  # Longest wait for a slot before 503
+    LOAD_SHED_LATENCY_SECONDS: float = 0.5  # Loop lag / inference queue delay above which inference is shed
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_INFERENCE_PER_MINUTE: float = 30.0  # Per client address
+    RATE_LIMIT_INFERENCE_BURST: int = 10
+    RATE_LIMIT_READ_PER_MINUTE: float = 600.0
+    RATE_LIMIT_READ_BURST: int = 120
+    RATE_LIMIT_MAX_CLIENTS: int = 100000  # Buckets kept per route class
+
+    # Versioned model registry (python -m app.services.ml.model_registry; swapped in without restarts)
+    MODEL_REGISTRY_DIR: str = "./models/registry"  # Until a version is activated, MODEL_PATH is served as MODEL_VERSION
+    MODEL_REGISTRY_POLL_SECONDS: float = 10.0  # How often each worker checks the active version; 0 disables hot-swap
+    MODEL_REGISTRY_VERIFY: bool = True  # Check files against the manifest hashes before serving a version
+
+    # Model distribution to devices (GET /models/latest, /models/files, /models/patches)
+    MODEL_DISTRIBUTION_PATH: Optional[str] = None  # File for devices with MODEL_PATH (unset: MODEL_PATH, external weights inlined); registry versions name theirs
+    MODEL_DISTRIBUTION_DIR: str = "./models/releases"  # Published releases, gzip copies and patches
+    MODEL_DISTRIBUTION_KEEP_RELEASES: int = 3  # Releases kept, the latest included; older ones patch to it
+
+    # Reference data (diseases, treatments) cached in each process
+    REFERENCE_CATALOG_REFRESH_SECONDS: float = 60.0  # Change check interval; 0 loads once at startup
+
+    # Alert maintenance (0 interval disables the in-process job)
+    ALERT_MAINTENANCE_INTERVAL_SECONDS: float = 3600.0
+    ALERT_MAINTENANCE_BATCH_SIZE: int = 5000  # Rows per transaction
+    ALERT_ACTIVE_DAYS: int = 30  # Alerts older than this stop being active (nearby, stats)
+    ALERT_COMPACT_AFTER_DAYS: int = 90  # Daily alerts older than this are merged into summaries
+    ALERT_COMPACTION_PERIOD: str = "week"  # "week" or "month"
+
+    # Outbreak detection (neighbourhood scan over recent daily alert counts)
+    OUTBREAK_DETECTION_ENABLED: bool = True
+    OUTBREAK_WINDOW_DAYS: int = 7  # Recent window compared against the rest of the baseline
+    OUTBREAK_BASELINE_DAYS: int = 28  # History read per cell, window included; at most ALERT_ACTIVE_DAYS
+    OUTBREAK_MIN_CASES: int = 5  # Neighbourhood detections in the window before escalating
+
     # File Upload
     MAX_FILE_SIZE_MB: int = 10
     ALLOWED_EXTENSIONS: Optional[list] = None
@@ -0,0 +1,168 @@
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core import metrics
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import re
+
+
+class CachePolicy:
+    """
+    HTTP caching for the GET routes matching `pattern` (relative to the API
+    prefix): Cache-Control value and, if server_ttl, how long whole
+    responses are kept server-side. Only public responses may be kept: the
+    server-side cache is keyed by URL alone.
+    """
+
+    def __init__(self, name: str, pattern: str, cache_control: str, server_ttl: float = 0):
+        if server_ttl and cache_control.startswith("private"):
+            raise ValueError(f"Cache policy {name}: private responses cannot be cached server-side")
+        self.name = name
+        self.pattern = re.compile(f"^{re.escape(settings.API_V1_PREFIX)}{pattern}$")
+        self.cache_control = cache_control
+        self.cache: Optional[TTLCache] = None
+        if server_ttl and settings.HTTP_RESPONSE_CACHE_ENABLED:
+            self.cache = TTLCache(
+                f"http:{name}",
+                ttl=server_ttl,
+                max_entries=settings.HTTP_RESPONSE_CACHE_MAX_ENTRIES,
+            )
+
+
+# Routes not listed here (uploads, tiles with their own ETags, the alert
+# stream) pass through untouched
+CACHE_POLICIES = [
+    # Stored diagnoses never change; embedded treatments follow reseeds
+    CachePolicy("diagnosis", r"/diagnosis/[^/]+", "private, max-age=3600"),
+    CachePolicy("treatments", r"/diagnosis/[^/]+/treatments", "private, max-age=3600"),
+    # New diagnoses appear on the first page: always revalidate
+    CachePolicy("history", r"/history/.*", "private, no-cache"),
+    # Changes when a model version is swapped in: cheap to build, so not kept server-side
+    CachePolicy("models", r"/models/(latest|info)", "public, max-age=60"),
+    # Kept server-side until alerts change (invalidate_responses)
+    CachePolicy("alert_stats", r"/alerts/stats", "public, max-age=5", server_ttl=5),
+    # Keyed on the caller's raw coordinates: shared caches must not keep it
+    CachePolicy("alerts_nearby", r"/alerts/nearby", "private, max-age=30"),
+    CachePolicy("alert_rollup", r"/alerts/rollup", "public, max-age=30"),
+]
+
+
+async def invalidate_responses(name: str):
+    """Drop the server-side responses of a policy; call after committing what they show"""
+    for policy in CACHE_POLICIES:
+        if policy.name == name and policy.cache is not None:
+            await policy.cache.clear()
+
+
+def strong_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak, as RFC 9110 requires for it)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
+
+
+class HTTPCacheMiddleware:
+    """
+    ETag / Cache-Control / 304 handling for GET routes with a CachePolicy.
+
+    The handler's 200 response is buffered, given a strong ETag (hash of
+    the body) and the route's Cache-Control; a matching If-None-Match gets
+    a bodiless 304 instead. Routes with a server-side cache answer repeat
+    requests (including 304s) from it without running the handler.
+    Responses that already carry an ETag are left as they are.
+    """
+
+    def __init__(self, app, policies: List[CachePolicy] = None):
+        self.app = app
+        self.policies = CACHE_POLICIES if policies is None else policies
+
+    def _policy(self, path: str) -> Optional[CachePolicy]:
+        for policy in self.policies:
+            if policy.pattern.match(path):
+                return policy
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return await self.app(scope, receive, send)
+        policy = self._policy(scope["path"])
+        if policy is None:
+            return await self.app(scope, receive, send)
+
+        request_headers = dict(scope["headers"])
+        if_none_match = request_headers.get(b"if-none-match", b"").decode("latin-1")
+        key = scope["path"]
+        if scope.get("query_string"):
+            key += "?" + scope["query_string"].decode("latin-1")
+
+        if policy.cache is not None:
+            cached = await policy.cache.get(key)
+            if cached is not None:
+                await self._respond(send, policy, cached["etag"], cached["headers"], cached["body"].encode(), if_none_match)
+                return
+
+        epoch = policy.cache.epoch if policy.cache is not None else 0
+        start: Dict = {}
+        chunks: List[bytes] = []
+        passthrough = False
+
+        async def capture(message):
+            nonlocal passthrough
+            if message["type"] == "http.response.start":
+                headers = dict(message.get("headers", []))
+                if message["status"] != 200 or b"etag" in headers:
+                    passthrough = True
+                    await send(message)
+                    return
+                start.update(message)
+            elif passthrough:
+                await send(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, capture)
+        if passthrough or not start:
+            return
+
+        body = b"".join(chunks)
+        etag = strong_etag(body)
+        headers = [
+            (name.decode("latin-1"), value.decode("latin-1"))
+            for name, value in start.get("headers", [])
+            if name.lower() not in (b"content-length", b"cache-control", b"etag")
+        ]
+        # Not if the cache was invalidated while the handler ran
+        if policy.cache is not None and policy.cache.epoch == epoch:
+            await policy.cache.set(key, {"etag": etag, "headers": headers, "body": body.decode()})
+        await self._respond(send, policy, etag, headers, body, if_none_match)
+
+    @staticmethod
+    async def _respond(send, policy: CachePolicy, etag: str, headers: List[Tuple[str, str]], body: bytes, if_none_match: str):
+        cache_headers = [
+            (b"etag", etag.encode("latin-1")),
+            (b"cache-control", policy.cache_control.encode("latin-1")),
+        ]
+        if etag_matches(if_none_match, etag):
+            metrics.HTTP_CACHE_RESPONSES_TOTAL.labels(policy.name, "not_modified").inc()
+            await send({"type": "http.response.start", "status": 304, "headers": cache_headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        metrics.HTTP_CACHE_RESPONSES_TOTAL.labels(policy.name, "full").inc()
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+            + cache_headers
+            + [(b"content-length", str(len(body)).encode("latin-1"))],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,330 @@
+from app.core.config import settings
+from app.core import metrics
+from collections import OrderedDict, deque
+from typing import Deque, List, Optional, Tuple
+import asyncio
+import math
+import re
+import time
+import orjson
+import logging
+
+logger = logging.getLogger(__name__)
+
+DELAY_SMOOTHING = 0.2  # Weight of the newest sample in the queue delay average
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class RateLimiter:
+    """
+    Token buckets per client: `per_minute` sustained with bursts of up to
+    `burst`. Kept per process for the most recently seen max_clients.
+    """
+
+    def __init__(self, per_minute: float, burst: int, max_clients: int = None):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.max_clients = max_clients or settings.RATE_LIMIT_MAX_CLIENTS
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def take(self, client: str, now: float = None) -> float:
+        """0 if the request may go ahead, else seconds until it would"""
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(self.burst, now)
+            if len(self._buckets) > self.max_clients:
+                # A client forgotten early just starts again with a full bucket
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            return 0.0
+        return (1 - bucket.tokens) / self.rate if self.rate > 0 else math.inf
+
+
+class ConcurrencyLimiter:
+    """
+    At most `limit` requests of a route class in flight; the rest wait in
+    FIFO order for up to `max_wait` seconds. The smoothed wait of admitted
+    requests is the class's queue delay, which drives shedding.
+    """
+
+    def __init__(self, name: str, limit: int, max_wait: float):
+        self.name = name
+        self.limit = limit
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self.delay = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def full(self) -> bool:
+        return self.in_flight >= self.limit
+
+    def _admitted(self, waited: float):
+        self.delay += DELAY_SMOOTHING * (waited - self.delay)
+        metrics.LOAD_QUEUE_SECONDS.labels(self.name).observe(waited)
+        metrics.LOAD_IN_FLIGHT.labels(self.name).set(self.in_flight)
+
+    async def acquire(self) -> bool:
+        """Take a slot, waiting if needed; False if none freed up within max_wait"""
+        if not self.full and not self._waiters:
+            self.in_flight += 1
+            self._admitted(0.0)
+            return True
+
+        start = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_wait)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                self._waiters.remove(waiter)
+                return False
+        except asyncio.CancelledError:
+            if waiter.done():
+                # The slot was handed over just as the client went away
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+        # release() handed its slot over: in_flight already counts this request
+        self._admitted(time.monotonic() - start)
+        return True
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+        metrics.LOAD_IN_FLIGHT.labels(self.name).set(self.in_flight)
+
+
+class RouteClass:
+    """
+    Requests matching `pattern` (relative to the API prefix) and `methods`:
+    a concurrency budget, a per-client rate limit and whether the class is
+    shed under load. Classes are matched in order.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        pattern: str,
+        methods: Tuple[str, ...],
+        limit: int,
+        max_wait: float,
+        rate_limit: Optional[RateLimiter] = None,
+        sheddable: bool = False,
+        header: Optional[Tuple[bytes, bytes]] = None,
+    ):
+        self.name = name
+        self.pattern = re.compile(f"^{re.escape(settings.API_V1_PREFIX)}{pattern}$")
+        self.methods = methods
+        self.limiter = ConcurrencyLimiter(name, limit, max_wait)
+        self.rate_limit = rate_limit if settings.RATE_LIMIT_ENABLED else None
+        self.sheddable = sheddable
+        self.header = header  # (name, substring) the request must carry to match
+
+    def matches(self, method: str, path: str, headers: dict) -> bool:
+        if method not in self.methods or not self.pattern.match(path):
+            return False
+        if self.header is not None:
+            name, value = self.header
+            return value in headers.get(name, b"").lower()
+        return True
+
+
+def default_route_classes() -> List[RouteClass]:
+    # Health checks, metrics and the alert stream (capped by its own
+    # subscriber limit) match no class and are never limited
+    upload = r"/diagnosis/(upload|from-object)"
+    # One budget per client whether diagnoses are queued or run in the request
+    diagnosis_rate = RateLimiter(settings.RATE_LIMIT_INFERENCE_PER_MINUTE, settings.RATE_LIMIT_INFERENCE_BURST)
+    return [
+        # Queued uploads only store the image; the worker queue has its own admission limit
+        RouteClass(
+            "upload_async",
+            upload,
+            ("POST",),
+            limit=settings.LOAD_UPLOAD_CONCURRENCY,
+            max_wait=settings.LOAD_QUEUE_TIMEOUT_SECONDS,
+            rate_limit=diagnosis_rate,
+            header=(b"prefer", b"respond-async"),
+        ),
+        # Inference in the request: the expensive path, shed first
+        RouteClass(
+            "inference",
+            upload,
+            ("POST",),
+            limit=settings.LOAD_INFERENCE_CONCURRENCY,
+            max_wait=settings.LOAD_QUEUE_TIMEOUT_SECONDS,
+            rate_limit=diagnosis_rate,
+            sheddable=True,
+        ),
+        RouteClass(
+            "upload",
+            r"/diagnosis/(upload-url|direct-upload/.*)",
+            ("POST", "PUT"),
+            limit=settings.LOAD_UPLOAD_CONCURRENCY,
+            max_wait=settings.LOAD_QUEUE_TIMEOUT_SECONDS,
+            rate_limit=RateLimiter(settings.RATE_LIMIT_INFERENCE_PER_MINUTE, settings.RATE_LIMIT_INFERENCE_BURST),
+        ),
+        # Downloads can last minutes on mobile networks: kept out of the read budget
+        RouteClass(
+            "download",
+            r"/models/(files|patches)/[^/]+",
+            ("GET", "HEAD"),
+            limit=settings.LOAD_DOWNLOAD_CONCURRENCY,
+            max_wait=settings.LOAD_QUEUE_TIMEOUT_SECONDS,
+            rate_limit=RateLimiter(settings.RATE_LIMIT_READ_PER_MINUTE, settings.RATE_LIMIT_READ_BURST),
+        ),
+        RouteClass(
+            "read",
+            r"/(?!alerts/stream$).*",
+            ("GET", "HEAD"),
+            limit=settings.LOAD_READ_CONCURRENCY,
+            max_wait=settings.LOAD_QUEUE_TIMEOUT_SECONDS,
+            rate_limit=RateLimiter(settings.RATE_LIMIT_READ_PER_MINUTE, settings.RATE_LIMIT_READ_BURST),
+        ),
+    ]
+
+
+class LoopLagMonitor:
+    """
+    Event loop lag: how late a short periodic sleep wakes up. Inference and
+    other blocking work on the loop delay every request in the process, so
+    this is the latency all queued work sees.
+    """
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(time.monotonic() - start - self.interval, 0.0)
+            self.lag += DELAY_SMOOTHING * (lag - self.lag)
+            metrics.EVENT_LOOP_LAG_SECONDS.set(self.lag)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+loop_lag_monitor = LoopLagMonitor()
+
+
+class LoadSheddingMiddleware:
+    """
+    Admission control in front of the API.
+
+    Each request is matched to a route class. It is rejected with 429 once
+    its client address has used up the class's
+    token bucket. It then waits for one of the class's concurrency slots,
+    and gets 503 if none frees up within LOAD_QUEUE_TIMEOUT_SECONDS. A
+    request that does not get a slot never has its body read, so a burst of
+    uploads cannot fill memory or the DB pool.
+
+    Shedding adapts to observed latency. Sheddable requests (synchronous
+    inference) get an immediate 503 in two cases: event loop lag is above
+    LOAD_SHED_LATENCY_SECONDS, or the class's smoothed slot wait is above it
+    and no slot is free. Cheap reads keep being served. Both error
+    responses carry Retry-After.
+    """
+
+    def __init__(self, app, route_classes: List[RouteClass] = None, monitor: LoopLagMonitor = None):
+        self.app = app
+        self.route_classes = default_route_classes() if route_classes is None else route_classes
+        self.monitor = loop_lag_monitor if monitor is None else monitor
+        self.shed_latency = settings.LOAD_SHED_LATENCY_SECONDS
+
+    def _route_class(self, scope, headers: dict) -> Optional[RouteClass]:
+        for route_class in self.route_classes:
+            if route_class.matches(scope["method"], scope["path"], headers):
+                return route_class
+        return None
+
+    @staticmethod
+    def _client(scope) -> str:
+        # Not a client-chosen header such as X-Device-Id: a client could
+        # rotate it to get fresh buckets. Behind a proxy the server takes
+        # the address from X-Forwarded-For, for FORWARDED_ALLOW_IPS only
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    def _shed(self, route_class: RouteClass) -> bool:
+        if not route_class.sheddable:
+            return False
+        if self.monitor.lag > self.shed_latency:
+            return True
+        # The slot wait only moves as requests are admitted, so only shed
+        # while there is a queue (free slots bring the average back down)
+        return route_class.limiter.full and route_class.limiter.delay > self.shed_latency
+
+    @staticmethod
+    async def _reject(send, status: int, detail: str, retry_after: float):
+        body = orjson.dumps({"detail": detail})
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"retry-after", str(max(math.ceil(retry_after), 1)).encode("latin-1")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        route_class = self._route_class(scope, headers)
+        if route_class is None:
+            return await self.app(scope, receive, send)
+
+        if route_class.rate_limit is not None:
+            wait = route_class.rate_limit.take(self._client(scope))
+            if wait:
+                metrics.LOAD_REJECTED_TOTAL.labels(route_class.name, "rate_limited").inc()
+                return await self._reject(send, 429, "Rate limit exceeded", wait)
+
+        limiter = route_class.limiter
+        if self._shed(route_class):
+            metrics.LOAD_REJECTED_TOTAL.labels(route_class.name, "shed").inc()
+            return await self._reject(send, 503, "Server busy, try again shortly", limiter.delay + self.monitor.lag)
+
+        if not await limiter.acquire():
+            metrics.LOAD_REJECTED_TOTAL.labels(route_class.name, "queue_timeout").inc()
+            return await self._reject(send, 503, "Server busy, try again shortly", limiter.max_wait)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
@@ -0,0 +1,169 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+# Database connection pool
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds",
+    "Time spent waiting to check a connection out of the pool",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections",
+    "Connections currently checked out of the pool",
+)
+DB_POOL_SIZE = Gauge(
+    "db_pool_connections",
+    "Connections currently held by the pool (idle and checked out)",
+)
+DB_POOL_OVERFLOW_TOTAL = Counter(
+    "db_pool_overflow_connections_total",
+    "Connections opened beyond pool_size",
+)
+DB_POOL_TIMEOUTS_TOTAL = Counter(
+    "db_pool_checkout_timeouts_total",
+    "Checkouts that gave up after DB_POOL_TIMEOUT",
+)
+
+# Alert write-behind buffer
+ALERT_BUFFER_PENDING = Gauge(
+    "alert_buffer_pending_detections",
+    "Detections buffered in memory and not yet written",
+)
+ALERT_BUFFER_FLUSH_SECONDS = Histogram(
+    "alert_buffer_flush_seconds",
+    "Time taken by one bulk alert upsert",
+)
+ALERT_BUFFER_FLUSHED_ROWS_TOTAL = Counter(
+    "alert_buffer_flushed_rows_total",
+    "Alert rows upserted by buffer flushes",
+)
+ALERT_BUFFER_FLUSH_ERRORS_TOTAL = Counter(
+    "alert_buffer_flush_errors_total",
+    "Buffer flushes that failed and were retried",
+)
+
+# Alert maintenance
+ALERT_MAINTENANCE_ROWS_TOTAL = Counter(
+    "alert_maintenance_rows_total",
+    "Alert rows processed by maintenance",
+    ["action"],  # deactivated, compacted
+)
+ALERT_MAINTENANCE_SECONDS = Histogram(
+    "alert_maintenance_seconds",
+    "Time taken by one full maintenance run",
+)
+
+# Load shedding
+LOAD_IN_FLIGHT = Gauge(
+    "load_in_flight_requests",
+    "Requests holding a concurrency slot",
+    ["route_class"],
+)
+LOAD_QUEUE_SECONDS = Histogram(
+    "load_queue_seconds",
+    "Time admitted requests waited for a concurrency slot",
+    ["route_class"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+LOAD_REJECTED_TOTAL = Counter(
+    "load_rejected_requests_total",
+    "Requests turned away by admission control",
+    ["route_class", "reason"],  # rate_limited, shed, queue_timeout
+)
+EVENT_LOOP_LAG_SECONDS = Gauge(
+    "event_loop_lag_seconds",
+    "Smoothed event loop lag",
+)
+
+# Diagnosis jobs
+DIAGNOSIS_JOBS_QUEUED = Gauge(
+    "diagnosis_jobs_queued",
+    "Diagnosis jobs waiting for a worker",
+)
+DIAGNOSIS_JOBS_TOTAL = Counter(
+    "diagnosis_jobs_total",
+    "Diagnosis jobs by outcome",
+    ["status"],  # queued, rejected, succeeded, failed
+)
+DIAGNOSIS_JOB_SECONDS = Histogram(
+    "diagnosis_job_seconds",
+    "Time diagnosis jobs spent queued and running",
+    ["phase"],  # wait, run
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+
+# Idempotency keys
+IDEMPOTENCY_REQUESTS_TOTAL = Counter(
+    "idempotency_requests_total",
+    "Requests carrying an Idempotency-Key",
+    ["endpoint", "result"],  # new, replayed, waited, conflict
+)
+
+# Model registry
+MODEL_ACTIVE = Gauge(
+    "model_active",
+    "1 for the model version this process serves",
+    ["version"],
+)
+MODEL_SWAPS_TOTAL = Counter(
+    "model_swaps_total",
+    "Hot swaps to a new active model version",
+    ["result"],  # succeeded, failed
+)
+MODEL_LOAD_SECONDS = Histogram(
+    "model_load_seconds",
+    "Time taken to verify, load and warm up a swapped-in model version",
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+# Model distribution
+MODEL_DOWNLOADS_TOTAL = Counter(
+    "model_downloads_total",
+    "Model file and patch requests",
+    ["kind", "result"],  # kind: model, gzip, patch; result: full, partial, not_modified
+)
+MODEL_ARTIFACT_BUILD_SECONDS = Histogram(
+    "model_artifact_build_seconds",
+    "Time taken to build a release's gzip copy or a patch",
+    ["kind"],  # gzip, patch
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+
+# Caches
+HTTP_CACHE_RESPONSES_TOTAL = Counter(
+    "http_cache_responses_total",
+    "Responses from routes with an HTTP cache policy",
+    ["route", "result"],  # full, not_modified
+)
+CACHE_REQUESTS_TOTAL = Counter(
+    "cache_requests_total",
+    "Cache lookups by cache and outcome (local_hit, redis_hit, miss)",
+    ["cache", "result"],
+)
+
+# Alert map tiles
+ALERT_TILES_RENDERED_TOTAL = Counter(
+    "alert_tiles_rendered_total",
+    "Alert map tiles computed from the database",
+)
+ALERT_TILES_INVALIDATED_TOTAL = Counter(
+    "alert_tiles_invalidated_total",
+    "Alert map tiles dropped from the cache because their cells changed",
+)
+
+# Real-time alert push
+ALERT_PUSH_SUBSCRIBERS = Gauge(
+    "alert_push_subscribers",
+    "Open alert stream connections in this process",
+)
+ALERT_PUSH_EVENTS_TOTAL = Counter(
+    "alert_push_events_total",
+    "Alert change events fanned out by this process",
+)
+ALERT_PUSH_DELIVERIES_TOTAL = Counter(
+    "alert_push_deliveries_total",
+    "Alert events queued for a nearby subscriber",
+)
+ALERT_PUSH_RESYNCS_TOTAL = Counter(
+    "alert_push_resyncs_total",
+    "Subscribers whose queue overflowed and were told to refetch",
+)
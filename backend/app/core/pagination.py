@@ -0,0 +1,108 @@
+from app.core.config import settings
+from sqlalchemy import asc, desc, tuple_
+from sqlalchemy.sql import Select
+from datetime import datetime, timedelta, timezone
+from typing import Any, List, Optional, Sequence, Tuple
+import base64
+import json
+import uuid
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at: datetime, row_id: uuid.UUID, sync: bool = False) -> str:
+    """
+    Opaque cursor for a (created_at, id) keyset position. A `sync` cursor
+    is a resume point for a later `since` request, not a page continuation.
+    """
+    payload = [created_at.isoformat(), str(row_id)] + ([1] if sync else [])
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID, bool]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id, *flags = json.loads(base64.urlsafe_b64decode(padded))
+        created_at = datetime.fromisoformat(created_at)
+        if created_at.tzinfo is None:
+            # Cursors issued before timestamps were stored with a time zone (UTC)
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        return created_at, uuid.UUID(row_id), bool(flags and flags[0])
+    except Exception:
+        raise InvalidCursor("Invalid cursor")
+
+
+def keyset_query(
+    query: Select,
+    created_at_column,
+    id_column,
+    limit: int,
+    cursor: Optional[str] = None,
+    since: Optional[str] = None,
+) -> Select:
+    """
+    Apply keyset pagination on (created_at, id).
+
+    - `cursor`: page backwards (newest first) from a previous `next_cursor`
+    - `since`: page forwards (oldest first) over rows newer than the position
+
+    created_at is set by the app before the row commits, so a row can become
+    visible after newer ones were already synced. A `since` sync cursor
+    therefore starts HISTORY_SYNC_OVERLAP_SECONDS before its position and
+    clients upsert by id; `next_cursor` continuations within a sync do not
+    overlap.
+
+    One extra row is fetched so `build_page` can tell whether more exist.
+    """
+    if cursor and since:
+        raise InvalidCursor("Use either cursor or since, not both")
+
+    key = tuple_(created_at_column, id_column)
+    if since:
+        created_at, row_id, sync = decode_cursor(since)
+        if sync:
+            query = query.where(created_at_column > created_at - timedelta(seconds=settings.HISTORY_SYNC_OVERLAP_SECONDS))
+        else:
+            query = query.where(key > tuple_(created_at, row_id))
+        query = query.order_by(asc(created_at_column), asc(id_column))
+    else:
+        if cursor:
+            created_at, row_id, _ = decode_cursor(cursor)
+            query = query.where(key < tuple_(created_at, row_id))
+        query = query.order_by(desc(created_at_column), desc(id_column))
+
+    return query.limit(limit + 1)
+
+
+def build_page(
+    rows: Sequence[Any],
+    limit: int,
+    forward: bool,
+    first: bool = True,
+) -> Tuple[List[Any], Optional[str], Optional[str]]:
+    """
+    Split a keyset result into (rows, next_cursor, sync_cursor).
+
+    `next_cursor` continues in the same direction (pass it back as `cursor`,
+    or as `since` when paging forwards). `sync_cursor` marks the newest row
+    synced so far, for later incremental `since` requests: the last row of
+    a forward page, or the first row of the first (`first`) backward page.
+    Later backward pages hold only older rows, so they return none.
+    """
+    rows = list(rows)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+
+    sync_cursor = None
+    if rows and (forward or first):
+        newest = rows[-1] if forward else rows[0]
+        sync_cursor = encode_cursor(newest.created_at, newest.id, sync=True)
+
+    return rows, next_cursor, sync_cursor
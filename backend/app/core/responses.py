@@ -0,0 +1,30 @@
+from fastapi.responses import JSONResponse, Response
+from typing import Any
+import orjson
+import uuid
+
+
+def _default(value: Any) -> Any:
+    # orjson only serializes exact uuid.UUID; asyncpg returns a subclass
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson.
+
+    Returning this from an endpoint skips response_model validation, so use
+    it only for payloads built from trusted rows (UUID, datetime and date
+    values are serialized natively).
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+class RawJSONResponse(Response):
+    """Response for a body that is already serialized JSON (bytes)"""
+
+    media_type = "application/json"
@@ -1,12 +1,53 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from app.core.config import settings
 from app.api.v1.router import api_router
+from app.services.alert_aggregator import alert_aggregator
+from app.services.alert_broker import alert_broker
+from app.services.alert_maintenance import alert_maintenance
+from app.services.reference_catalog import reference_catalog
+from app.services.diagnosis_jobs import diagnosis_jobs
+from app.services.ml.inference import inference_service
+from app.services.ml.model_distribution import model_distribution
+from app.api.v1.endpoints.diagnosis import run_diagnosis_job
+from app.core.cache import close_redis
+from app.core.http_cache import HTTPCacheMiddleware
+from app.core.load_shedding import LoadSheddingMiddleware, loop_lag_monitor
+from contextlib import asynccontextmanager
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 import os
 
-# Create uploads directory if it doesn't exist
-os.makedirs("uploads", exist_ok=True)
+# Create the local storage directory if it doesn't exist
+if settings.STORAGE_BACKEND == "local":
+    os.makedirs(settings.LOCAL_STORAGE_DIR, exist_ok=True)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loop_lag_monitor.start()
+    # Per worker: with gunicorn --preload this runs after the fork
+    inference_service.load()
+    # Follows the registry's active version; devices are offered each version served
+    inference_service.start(on_activate=model_distribution.release)
+    await reference_catalog.refresh()
+    reference_catalog.start()
+    alert_aggregator.start()
+    alert_broker.start()
+    alert_maintenance.start()
+    diagnosis_jobs.start(run_diagnosis_job)
+    yield
+    # Stop taking jobs, then write buffered alert counts before the process exits
+    await diagnosis_jobs.stop()
+    await alert_aggregator.stop()
+    await alert_broker.stop()
+    await alert_maintenance.stop()
+    await reference_catalog.stop()
+    await inference_service.stop()
+    await model_distribution.stop()
+    await loop_lag_monitor.stop()
+    await close_redis()
+
 
 app = FastAPI(
     title="Crop Disease Detection API",
@@ -14,8 +55,17 @@ app = FastAPI(
     version="1.0.0",
     docs_url=f"{settings.API_V1_PREFIX}/docs",
     redoc_url=f"{settings.API_V1_PREFIX}/redoc",
+    lifespan=lifespan,
 )
 
+# ETags, Cache-Control and 304s for read endpoints (inside CORS, so 304s get CORS headers)
+if settings.HTTP_CACHE_ENABLED:
+    app.add_middleware(HTTPCacheMiddleware)
+
+# Rate limits, concurrency budgets and shedding (inside CORS, outside the HTTP cache)
+if settings.LOAD_SHEDDING_ENABLED:
+    app.add_middleware(LoadSheddingMiddleware)
+
 # CORS middleware for React Native
 app.add_middleware(
     CORSMiddleware,
@@ -25,8 +75,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount static files for uploaded images
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# Serve stored images when they are kept on local disk (StorageService.object_url)
+if settings.STORAGE_BACKEND == "local":
+    app.mount("/uploads", StaticFiles(directory=settings.LOCAL_STORAGE_DIR), name="uploads")
 
 # Include API router
 app.include_router(api_router, prefix=settings.API_V1_PREFIX)
@@ -46,6 +97,11 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 if __name__ == "__main__":
     import uvicorn
 
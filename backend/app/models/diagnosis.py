@@ -1,11 +1,15 @@
 import uuid
-from sqlalchemy import Column, String, Float, DateTime, Enum, JSON
+from sqlalchemy import Column, String, Float, DateTime, Enum, JSON, Index, LargeBinary, BigInteger
 from sqlalchemy.dialects.postgresql import UUID
 from datetime import datetime, timezone
 import enum
 from app.db.base import Base
 
 
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
 class DiagnosisStatus(str, enum.Enum):
     PENDING = "pending"
     CONFIRMED = "confirmed"
@@ -15,6 +19,14 @@ class DiagnosisStatus(str, enum.Enum):
 
 class Diagnosis(Base):
     __tablename__ = "diagnoses"
+    __table_args__ = (
+        # History by user, newest first
+        Index("ix_diagnoses_user_id_created_at", "user_id", "created_at", "id"),
+        # Global history / recent, newest first
+        Index("ix_diagnoses_created_at", "created_at", "id"),
+        # Regional rollups: cell id prefix ranges
+        Index("ix_diagnoses_cell_id_created_at", "cell_id", "created_at"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), nullable=True)  # TODO: Add foreign key when users table exists
@@ -28,12 +40,18 @@ class Diagnosis(Base):
     # Additional Information
     extra_metadata = Column(JSON, nullable=True)  # GPS, timestamp, device info
     grid_location = Column(String, nullable=True)  # Anonymized grid cell
+    cell_id = Column(BigInteger, nullable=True)  # Hierarchical id of grid_location's cell
+
+    # Inference output, so the diagnosis can be served without re-running the model
+    heatmap_url = Column(String, nullable=True)
+    inference_output = Column(JSON, nullable=True)  # Compact: quality, top-k, suggestions
+    raw_logits = Column(LargeBinary, nullable=True)  # float16 bytes, if STORE_RAW_LOGITS
     
     status = Column(Enum(DiagnosisStatus), default=DiagnosisStatus.PENDING)
     needs_retry = Column(String, nullable=True)  # "low_confidence", "poor_quality", null
     
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), default=utc_now)
+    updated_at = Column(DateTime(timezone=True), default=utc_now, onupdate=utc_now)
 
     def __repr__(self):
         return f"<Diagnosis {self.crop_name} - {self.disease_name}>"
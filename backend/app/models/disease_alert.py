@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, Integer, Date, Boolean
+from sqlalchemy import Column, String, Integer, BigInteger, Float, Date, Boolean, Index, UniqueConstraint, text
 from sqlalchemy.dialects.postgresql import UUID
 from datetime import datetime
 from app.db.base import Base
@@ -7,17 +7,42 @@ from app.db.base import Base
 
 class DiseaseAlert(Base):
     __tablename__ = "disease_alerts"
+    __table_args__ = (
+        # One row per cell, crop, disease and day; target of the alert upsert.
+        # NULL disease_id values count as equal (PostgreSQL 15+).
+        UniqueConstraint(
+            "grid_location", "crop_name", "disease_id", "alert_date",
+            name="uq_disease_alerts_cell_crop_disease_date",
+            postgresql_nulls_not_distinct=True,
+        ),
+        # Active alerts by date
+        Index("ix_disease_alerts_active_alert_date", "alert_date", postgresql_where=text("is_active")),
+        # Nearby alerts: active alerts in a set of grid cells
+        Index(
+            "ix_disease_alerts_active_cell",
+            "cell_row", "cell_col", "alert_date",
+            postgresql_where=text("is_active"),
+        ),
+        # Regional rollups: cell id prefix ranges
+        Index("ix_disease_alerts_cell_id_alert_date", "cell_id", "alert_date"),
+        # Maintenance: oldest alerts first, active or not
+        Index("ix_disease_alerts_alert_date", "alert_date"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     disease_id = Column(UUID(as_uuid=True), nullable=True)  # TODO: Add foreign key when diseases table exists
     crop_name = Column(String, nullable=False)
     
     # Anonymized location (grid cell)
-    grid_location = Column(String, nullable=False, index=True)  # "lat,lon" rounded
+    grid_location = Column(String, nullable=False)  # "lat,lon" rounded
+    cell_row = Column(Integer, nullable=True)  # floor(lat / grid degrees + 0.5)
+    cell_col = Column(Integer, nullable=True)  # floor(lon / grid degrees + 0.5)
+    cell_id = Column(BigInteger, nullable=True)  # Hierarchical id, see geolocation_service.cell_id
     
     # Alert metrics
-    detection_count = Column(Integer, default=1)
-    severity_level = Column(Integer, default=1)  # 1-5 based on detection count
+    detection_count = Column(Integer, default=1, server_default="1", nullable=False)
+    severity_level = Column(Integer, default=1)  # 1-5 based on detection count, raised by outbreak detection
+    outbreak_score = Column(Float, nullable=True)  # Neighbourhood scan score, if part of an outbreak
     
     # Alert status
     alert_date = Column(Date, default=datetime.utcnow)
@@ -28,3 +53,39 @@ class DiseaseAlert(Base):
 
     def __repr__(self):
         return f"<DiseaseAlert {self.crop_name} at {self.grid_location}>"
+
+
+class DiseaseAlertSummary(Base):
+    """Daily alerts older than ALERT_COMPACT_AFTER_DAYS, merged per week or month"""
+
+    __tablename__ = "disease_alert_summaries"
+    __table_args__ = (
+        # Target of the compaction upsert
+        UniqueConstraint(
+            "grid_location", "crop_name", "disease_id", "period", "period_start",
+            name="uq_disease_alert_summaries_cell_crop_disease_period",
+            postgresql_nulls_not_distinct=True,
+        ),
+        # Long-range rollups: cell id prefix ranges
+        Index("ix_disease_alert_summaries_cell_id_period_start", "cell_id", "period_start"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    disease_id = Column(UUID(as_uuid=True), nullable=True)
+    crop_name = Column(String, nullable=False)
+
+    grid_location = Column(String, nullable=False)
+    cell_row = Column(Integer, nullable=True)
+    cell_col = Column(Integer, nullable=True)
+    cell_id = Column(BigInteger, nullable=True)
+
+    period = Column(String, nullable=False)  # "week" or "month"
+    period_start = Column(Date, nullable=False)
+
+    detection_count = Column(Integer, nullable=False)
+    alert_days = Column(Integer, nullable=False)  # Daily alert rows merged in
+    max_severity = Column(Integer, nullable=True)
+    max_outbreak_score = Column(Float, nullable=True)
+
+    def __repr__(self):
+        return f"<DiseaseAlertSummary {self.crop_name} at {self.grid_location} {self.period} of {self.period_start}>"
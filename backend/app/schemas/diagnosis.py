@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 
 
@@ -10,6 +10,27 @@ class DiagnosisCreate(BaseModel):
     user_id: Optional[str] = None
 
 
+class PresignedUploadRequest(BaseModel):
+    content_type: str = "image/jpeg"
+
+
+class PresignedUploadResponse(BaseModel):
+    object_key: str
+    upload_url: str
+    method: str  # "POST" (S3 form upload) or "PUT" (local backend)
+    fields: Dict[str, str]
+    headers: Dict[str, str]
+    max_bytes: int
+    expires_at: datetime
+
+
+class DiagnosisFromObjectRequest(BaseModel):
+    object_key: str
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    user_id: Optional[str] = None
+
+
 class QualityMetrics(BaseModel):
     quality_score: float
     blur_score: float
@@ -25,6 +46,19 @@ class PredictionItem(BaseModel):
     disease_name: str
 
 
+class TreatmentResponse(BaseModel):
+    id: str
+    type: str
+    name: str
+    dosage: Optional[dict]
+    instructions: dict  # {language: text}, in the requested language (or English)
+    effectiveness_score: Optional[float]
+    precautions: Optional[List[str]]
+    cost_estimate: Optional[str]
+    region: Optional[str] = None  # None = applies everywhere
+    crop_stage: Optional[str] = None
+
+
 class DiagnosisResponse(BaseModel):
     id: str
     crop_name: str
@@ -39,17 +73,15 @@ class DiagnosisResponse(BaseModel):
     model_version: str
     heatmap_url: Optional[str] = None
     created_at: datetime
+    treatments: List[TreatmentResponse] = []  # Most effective first
 
 
-class TreatmentResponse(BaseModel):
+class DiagnosisJobResponse(BaseModel):
     id: str
-    type: str
-    name: str
-    dosage: Optional[dict]
-    instructions: dict
-    effectiveness_score: Optional[float]
-    precautions: Optional[List[str]]
-    cost_estimate: Optional[str]
+    status: str  # queued, running, succeeded, failed
+    created_at: datetime
+    result: Optional[DiagnosisResponse] = None  # Once succeeded
+    error: Optional[str] = None  # Once failed
 
 
 class AlertResponse(BaseModel):
@@ -62,6 +94,42 @@ class AlertResponse(BaseModel):
     alert_date: str
 
 
+class AlertRollupCell(BaseModel):
+    cell: str  # quadkey; its length is the level
+    level: int
+    bounds: List[float]  # south, west, north, east
+    detection_count: int
+    alert_count: int
+    max_severity: int
+
+
+class CropAlertStats(BaseModel):
+    crop_name: str
+    alerts: int
+    detections: int
+
+
+class SeverityAlertStats(BaseModel):
+    severity_level: Optional[int]
+    alerts: int
+    detections: int
+
+
+class AlertStats(BaseModel):
+    total_active_alerts: int
+    total_detections: int
+    high_severity_alerts: int
+    by_crop: List[CropAlertStats]
+    by_severity: List[SeverityAlertStats]
+    last_updated: str
+
+
+SYNC_CURSOR_DESCRIPTION = (
+    "Pass as `since` to fetch newer diagnoses. Syncs start a short overlap "
+    "(HISTORY_SYNC_OVERLAP_SECONDS) before it, so items can repeat: upsert them by id."
+)
+
+
 class HistoryItem(BaseModel):
     id: str
     crop_name: str
@@ -71,6 +139,26 @@ class HistoryItem(BaseModel):
     created_at: datetime
 
 
+class HistoryPage(BaseModel):
+    items: List[HistoryItem]
+    next_cursor: Optional[str] = None
+    sync_cursor: Optional[str] = Field(None, description=SYNC_CURSOR_DESCRIPTION)
+
+
+class RecentItem(BaseModel):
+    id: str
+    crop_name: str
+    disease_name: str
+    confidence: float
+    created_at: datetime
+
+
+class RecentPage(BaseModel):
+    items: List[RecentItem]
+    next_cursor: Optional[str] = None
+    sync_cursor: Optional[str] = Field(None, description=SYNC_CURSOR_DESCRIPTION)
+
+
 class ProgressItem(BaseModel):
     id: str
     crop_name: str
@@ -81,8 +169,25 @@ class ProgressItem(BaseModel):
     recorded_at: datetime
 
 
+class ModelDownload(BaseModel):
+    encoding: str  # identity, or gzip: gunzip to get the model file
+    url: str
+    size_bytes: int
+
+
+class ModelPatch(BaseModel):
+    from_version: str
+    from_sha256: str
+    url: str
+    size_bytes: int
+
+
 class ModelInfo(BaseModel):
     version: str
     download_url: Optional[str]
     size_mb: Optional[float]
     last_updated: Optional[str]
+    sha256: Optional[str] = None
+    size_bytes: Optional[int] = None
+    downloads: List[ModelDownload] = []
+    patches: List[ModelPatch] = []  # Smaller than any download for devices holding from_sha256
@@ -0,0 +1,145 @@
+from app.core.config import settings
+from app.core import metrics
+from app.db.base import AsyncSessionLocal
+from app.services.alert_service import AlertIncrement, alert_service
+from app.services.alert_events import alerts_changed
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Optional, Tuple
+import asyncio
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+AlertKey = Tuple[str, str, Optional[uuid.UUID], date]
+
+
+class AlertAggregator:
+    """
+    In-process write-behind buffer for disease alert counters.
+
+    Detections are summed in memory per (grid cell, crop, disease, day) and
+    written as one bulk upsert every ALERT_FLUSH_INTERVAL_SECONDS, or sooner
+    once ALERT_FLUSH_MAX_EVENTS detections are pending. Alert counts therefore
+    lag by at most one interval (plus flush time). The buffer is flushed on
+    shutdown; failed flushes are merged back and retried.
+    """
+
+    def __init__(self, interval: float = None, max_events: int = None):
+        self.interval = settings.ALERT_FLUSH_INTERVAL_SECONDS if interval is None else interval
+        self.max_events = max_events or settings.ALERT_FLUSH_MAX_EVENTS
+        self._pending: Dict[AlertKey, int] = defaultdict(int)
+        self._pending_events = 0
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def add(
+        self,
+        crop_name: str,
+        grid_location: str,
+        disease_id: Optional[uuid.UUID] = None,
+        count: int = 1,
+        detected_on: Optional[date] = None,
+    ):
+        """Buffer detections; never touches the database"""
+        key = (grid_location, crop_name, disease_id, detected_on or date.today())
+        self._pending[key] += count
+        self._pending_events += count
+        metrics.ALERT_BUFFER_PENDING.set(self._pending_events)
+        if self._pending_events >= self.max_events:
+            self._wakeup.set()
+
+    def _restore(self, batch: Dict[AlertKey, int], events: int):
+        for key, count in batch.items():
+            self._pending[key] += count
+        self._pending_events += events
+        metrics.ALERT_BUFFER_PENDING.set(self._pending_events)
+
+    async def flush(self) -> int:
+        """Write all buffered increments; returns the number of rows upserted"""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+
+            batch, events = self._pending, self._pending_events
+            self._pending, self._pending_events = defaultdict(int), 0
+            metrics.ALERT_BUFFER_PENDING.set(0)
+
+            increments = [AlertIncrement(*key, count) for key, count in batch.items()]
+            start = time.perf_counter()
+            committed = False
+            try:
+                async with AsyncSessionLocal() as db:
+                    changed = await alert_service.record_detections(db, increments)
+                    await db.commit()
+                    committed = True
+            except asyncio.CancelledError:
+                # Cancelled mid-flush (stop()): keep the counts unless they
+                # were already written, so the final flush can write them
+                if not committed:
+                    self._restore(batch, events)
+                raise
+            except Exception as e:
+                if committed:
+                    # Only closing the session failed; the counts are stored
+                    logger.warning(f"Alert flush committed, closing its session failed: {str(e)}")
+                else:
+                    # Put the counts back so the next flush retries them
+                    self._restore(batch, events)
+                    metrics.ALERT_BUFFER_FLUSH_ERRORS_TOTAL.inc()
+                    logger.error(f"Alert flush failed, {events} detections kept for retry: {str(e)}")
+                    raise
+
+            metrics.ALERT_BUFFER_FLUSH_SECONDS.observe(time.perf_counter() - start)
+            metrics.ALERT_BUFFER_FLUSHED_ROWS_TOTAL.inc(len(increments))
+            await alerts_changed(changed, refresh_tiles=True)
+            logger.info(f"Flushed {events} detections into {len(increments)} alert rows")
+            return len(increments)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                # Already logged; back off for one interval before retrying
+                await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.enabled and not self.running:
+            self._task = asyncio.create_task(self._run())
+            logger.info(
+                f"Alert aggregator started (interval={self.interval}s, max_events={self.max_events})"
+            )
+
+    async def stop(self):
+        """Stop the flush loop and write whatever is still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception:
+            logger.error(f"Dropping {self._pending_events} buffered detections at shutdown")
+
+
+alert_aggregator = AlertAggregator()
@@ -0,0 +1,198 @@
+from app.core.config import settings
+from app.core import metrics
+from app.services.geolocation_service import geolocation_service
+from app.services.reference_catalog import reference_catalog
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import asyncio
+import numpy as np
+import orjson
+import redis.asyncio as aioredis
+import logging
+
+logger = logging.getLogger(__name__)
+
+REDIS_CHANNEL = "alerts:events"
+RESYNC_FRAME = b"event: resync\ndata: {}\n\n"
+
+
+class Subscription:
+    """One open alert stream: an anonymized cell, a radius and a frame queue"""
+
+    __slots__ = ("cell", "lat", "lon", "radius_km", "queue")
+
+    def __init__(self, cell: Tuple[int, int], radius_km: float, queue_size: int):
+        self.cell = cell
+        self.lat, self.lon = geolocation_service.cell_center(*cell)
+        self.radius_km = radius_km
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+
+class AlertBroker:
+    """
+    Fans alert changes out to open streams near the changed cell.
+
+    Subscribers are indexed by their own grid cell, so an idle connection
+    costs one set entry and a small queue. Publishing an event looks up only
+    the cells within ALERT_PUSH_MAX_RADIUS_KM of it and filters those
+    subscribers by their own radius. Frames are queued per subscriber; a
+    subscriber that falls ALERT_PUSH_QUEUE_SIZE events behind gets a single
+    "resync" event instead (refetch /alerts/nearby).
+
+    Events reach only this process unless ALERT_PUSH_REDIS_ENABLED, in which
+    case they go through Redis pub/sub and every process delivers them to
+    its own subscribers.
+    """
+
+    def __init__(self):
+        self.max_radius_km = settings.ALERT_PUSH_MAX_RADIUS_KM
+        self.max_subscribers = settings.ALERT_PUSH_MAX_SUBSCRIBERS
+        self.queue_size = settings.ALERT_PUSH_QUEUE_SIZE
+        self.use_redis = settings.ALERT_PUSH_REDIS_ENABLED
+        self._by_cell: Dict[Tuple[int, int], Set[Subscription]] = defaultdict(set)
+        self._count = 0
+        self._publisher = None
+        self._listener: Optional[asyncio.Task] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return self._count
+
+    def subscribe(self, latitude: float, longitude: float, radius_km: float) -> Optional[Subscription]:
+        """Register a stream; None if this process is at ALERT_PUSH_MAX_SUBSCRIBERS"""
+        if self._count >= self.max_subscribers:
+            return None
+        # Only the anonymized cell is kept, never the coordinates
+        sub = Subscription(
+            geolocation_service.grid_cell(latitude, longitude),
+            min(radius_km, self.max_radius_km),
+            self.queue_size,
+        )
+        self._by_cell[sub.cell].add(sub)
+        self._count += 1
+        metrics.ALERT_PUSH_SUBSCRIBERS.set(self._count)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        subs = self._by_cell.get(sub.cell)
+        if subs is None or sub not in subs:
+            return
+        subs.discard(sub)
+        if not subs:
+            del self._by_cell[sub.cell]
+        self._count -= 1
+        metrics.ALERT_PUSH_SUBSCRIBERS.set(self._count)
+
+    @staticmethod
+    def event_from_row(row) -> Dict:
+        """Event payload for an updated alert row (alert_service.ALERT_EVENT_COLUMNS)"""
+        return {
+            "cell": [row.cell_row, row.cell_col],
+            "alert": {
+                "id": str(row.id),
+                "disease_name": reference_catalog.disease_name(row.disease_id),
+                "crop_name": row.crop_name,
+                "grid_location": row.grid_location,
+                "detection_count": row.detection_count,
+                "severity_level": row.severity_level,
+                "alert_date": row.alert_date.isoformat(),
+            },
+        }
+
+    async def publish(self, events: List[Dict]):
+        """Send events to every process (Redis) or just this one"""
+        if not events:
+            return
+        if self.use_redis:
+            try:
+                if self._publisher is None:
+                    self._publisher = aioredis.from_url(settings.REDIS_URL)
+                await self._publisher.publish(REDIS_CHANNEL, orjson.dumps(events))
+                return
+            except Exception as e:
+                logger.warning(f"Alert event publish to Redis failed, delivering locally: {str(e)}")
+        self.deliver(events)
+
+    def _subscribers_near(self, cell: Tuple[int, int]) -> List[Subscription]:
+        candidates = []
+        for row, first_col, last_col in geolocation_service.cells_within_radius(*cell, self.max_radius_km):
+            for col in range(first_col, last_col + 1):
+                subs = self._by_cell.get((row, col))
+                if subs:
+                    candidates.extend(subs)
+        return candidates
+
+    def deliver(self, events: Iterable[Dict]) -> int:
+        """Queue events for nearby subscribers in this process; returns deliveries"""
+        delivered = 0
+        for event in events:
+            metrics.ALERT_PUSH_EVENTS_TOTAL.inc()
+            candidates = self._subscribers_near(tuple(event["cell"]))
+            if not candidates:
+                continue
+
+            event_lat, event_lon = geolocation_service.cell_center(*event["cell"])
+            distances = geolocation_service.distances_from(
+                event_lat,
+                event_lon,
+                np.fromiter((s.lat for s in candidates), dtype=np.float64, count=len(candidates)),
+                np.fromiter((s.lon for s in candidates), dtype=np.float64, count=len(candidates)),
+            )
+            for sub, distance in zip(candidates, distances.tolist()):
+                if distance > sub.radius_km:
+                    continue
+                payload = dict(event["alert"], distance_km=round(distance, 1))
+                self._offer(sub, b"event: alert\ndata: " + orjson.dumps(payload) + b"\n\n")
+                delivered += 1
+
+        metrics.ALERT_PUSH_DELIVERIES_TOTAL.inc(delivered)
+        return delivered
+
+    @staticmethod
+    def _offer(sub: Subscription, frame: bytes):
+        try:
+            sub.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            # Too far behind: replace the backlog with one resync marker
+            while not sub.queue.empty():
+                sub.queue.get_nowait()
+            sub.queue.put_nowait(RESYNC_FRAME)
+            metrics.ALERT_PUSH_RESYNCS_TOTAL.inc()
+
+    async def _listen(self):
+        while True:
+            client = aioredis.from_url(settings.REDIS_URL)
+            pubsub = client.pubsub()
+            try:
+                await pubsub.subscribe(REDIS_CHANNEL)
+                logger.info(f"Listening for alert events on Redis channel {REDIS_CHANNEL}")
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.deliver(orjson.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Alert event listener error, reconnecting: {str(e)}")
+                await asyncio.sleep(5)
+            finally:
+                await pubsub.aclose()
+                await client.aclose()
+
+    def start(self):
+        if self.use_redis and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._publisher is not None:
+            await self._publisher.aclose()
+            self._publisher = None
+
+
+alert_broker = AlertBroker()
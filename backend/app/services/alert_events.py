@@ -0,0 +1,22 @@
+from app.core.http_cache import invalidate_responses
+from app.services.alert_broker import alert_broker
+from app.services.alert_service import alert_service
+from app.services.alert_tile_service import alert_tile_service
+from typing import List
+
+
+async def alerts_changed(rows: List, refresh_tiles: bool = False):
+    """
+    Everything that follows committed alert changes: drop cached stats (and
+    their cached responses) and the affected map tiles, and push the updated alerts to nearby streams.
+
+    rows are the upserted alerts (alert_service.ALERT_EVENT_COLUMNS).
+    refresh_tiles re-renders recently served tiles right away; leave it off
+    inside request handling.
+    """
+    if not rows:
+        return
+    await alert_service.invalidate_stats()
+    await invalidate_responses("alert_stats")
+    await alert_tile_service.invalidate({row.grid_location for row in rows}, refresh=refresh_tiles)
+    await alert_broker.publish([alert_broker.event_from_row(row) for row in rows])
@@ -0,0 +1,221 @@
+from app.core.config import settings
+from app.core import metrics
+from app.core.http_cache import invalidate_responses
+from app.db.base import AsyncSessionLocal
+from app.models.disease_alert import DiseaseAlert, DiseaseAlertSummary
+from app.services.alert_service import alert_service
+from datetime import date, timedelta
+from sqlalchemy import Date, delete, func, literal, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import NamedTuple, Optional
+import asyncio
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+COMPACTION_PERIODS = ("week", "month")
+SUMMARY_UNIQUE_CONSTRAINT = "uq_disease_alert_summaries_cell_crop_disease_period"
+
+
+class MaintenanceReport(NamedTuple):
+    deactivated: int  # Alerts past ALERT_ACTIVE_DAYS marked inactive
+    compacted: int  # Daily alerts merged into summaries and deleted
+    summaries: int  # Summary rows inserted or updated
+    batches: int
+    seconds: float
+
+
+class AlertMaintenance:
+    """
+    Periodic alert expiry and compaction.
+
+    Alerts older than ALERT_ACTIVE_DAYS are marked inactive, so the active
+    set that /alerts/nearby and /alerts/stats scan stays bounded. Daily
+    alerts older than ALERT_COMPACT_AFTER_DAYS are merged into per-week (or
+    per-month) rows in disease_alert_summaries and deleted; long-range
+    rollups read the summaries instead.
+
+    Work is done in batches of ALERT_MAINTENANCE_BATCH_SIZE rows, one short
+    transaction each, picking rows with SKIP LOCKED so it never waits on
+    (or blocks) alert writes for long and several workers can run it at once.
+    """
+
+    def __init__(self, interval: float = None, batch_size: int = None):
+        self.interval = settings.ALERT_MAINTENANCE_INTERVAL_SECONDS if interval is None else interval
+        self.batch_size = batch_size or settings.ALERT_MAINTENANCE_BATCH_SIZE
+        self.period = settings.ALERT_COMPACTION_PERIOD
+        if self.period not in COMPACTION_PERIODS:
+            raise ValueError(f"ALERT_COMPACTION_PERIOD must be one of {COMPACTION_PERIODS}")
+        if settings.ALERT_COMPACT_AFTER_DAYS < settings.OUTBREAK_BASELINE_DAYS:
+            # The outbreak detector's baseline and warm-up read daily rows
+            raise ValueError("ALERT_COMPACT_AFTER_DAYS must be at least OUTBREAK_BASELINE_DAYS")
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def deactivate_batch(self, cutoff: date):
+        """Ids of the next batch of active alerts to expire"""
+        return (
+            select(DiseaseAlert.id)
+            .where(DiseaseAlert.is_active == True, DiseaseAlert.alert_date < cutoff)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+
+    def compact_batch(self, cutoff: date):
+        """Ids of the next batch of daily alerts to compact, oldest first"""
+        return (
+            select(DiseaseAlert.id)
+            .where(DiseaseAlert.alert_date < cutoff)
+            .order_by(DiseaseAlert.alert_date)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+
+    def deactivate_statement(self, cutoff: date):
+        batch = self.deactivate_batch(cutoff)
+        return update(DiseaseAlert).where(DiseaseAlert.id.in_(batch.scalar_subquery())).values(is_active=False)
+
+    def compact_statement(self, cutoff: date):
+        """
+        One batch: delete the oldest daily alerts and add them to their
+        summaries in a single statement; returns (rows deleted, summaries).
+        """
+        batch = self.compact_batch(cutoff)
+        compacted = (
+            delete(DiseaseAlert)
+            .where(DiseaseAlert.id.in_(batch.scalar_subquery()))
+            .returning(
+                DiseaseAlert.disease_id,
+                DiseaseAlert.crop_name,
+                DiseaseAlert.grid_location,
+                DiseaseAlert.cell_row,
+                DiseaseAlert.cell_col,
+                DiseaseAlert.cell_id,
+                DiseaseAlert.alert_date,
+                DiseaseAlert.detection_count,
+                DiseaseAlert.severity_level,
+                DiseaseAlert.outbreak_score,
+            )
+            .cte("compacted")
+        )
+
+        period_start = func.date_trunc(self.period, compacted.c.alert_date).cast(Date)
+        merged = select(
+            func.gen_random_uuid(),
+            compacted.c.disease_id,
+            compacted.c.crop_name,
+            compacted.c.grid_location,
+            func.max(compacted.c.cell_row),
+            func.max(compacted.c.cell_col),
+            func.max(compacted.c.cell_id),
+            literal(self.period),
+            period_start,
+            func.sum(compacted.c.detection_count),
+            func.count(),
+            func.max(compacted.c.severity_level),
+            func.max(compacted.c.outbreak_score),
+        ).group_by(
+            compacted.c.disease_id,
+            compacted.c.crop_name,
+            compacted.c.grid_location,
+            period_start,
+        )
+
+        insert = pg_insert(DiseaseAlertSummary).from_select(
+            [
+                "id", "disease_id", "crop_name", "grid_location", "cell_row", "cell_col", "cell_id",
+                "period", "period_start", "detection_count", "alert_days", "max_severity",
+                "max_outbreak_score",
+            ],
+            merged,
+        )
+        # A period can be compacted over several batches (and runs)
+        summarized = insert.on_conflict_do_update(
+            constraint=SUMMARY_UNIQUE_CONSTRAINT,
+            set_={
+                "detection_count": DiseaseAlertSummary.detection_count + insert.excluded.detection_count,
+                "alert_days": DiseaseAlertSummary.alert_days + insert.excluded.alert_days,
+                "max_severity": func.greatest(DiseaseAlertSummary.max_severity, insert.excluded.max_severity),
+                "max_outbreak_score": func.greatest(
+                    DiseaseAlertSummary.max_outbreak_score, insert.excluded.max_outbreak_score
+                ),
+            },
+        ).returning(DiseaseAlertSummary.id).cte("summarized")
+
+        return select(
+            select(func.count()).select_from(compacted).scalar_subquery().label("compacted"),
+            select(func.count()).select_from(summarized).scalar_subquery().label("summaries"),
+        )
+
+    async def run(self) -> MaintenanceReport:
+        """Deactivate and compact until no old rows are left; one transaction per batch"""
+        start = time.perf_counter()
+        active_cutoff = date.today() - timedelta(days=settings.ALERT_ACTIVE_DAYS)
+        compact_cutoff = date.today() - timedelta(days=settings.ALERT_COMPACT_AFTER_DAYS)
+        deactivated = compacted = summaries = batches = 0
+
+        async with AsyncSessionLocal() as db:
+            while True:
+                result = await db.execute(self.deactivate_statement(active_cutoff))
+                await db.commit()
+                batches += 1
+                deactivated += result.rowcount
+                metrics.ALERT_MAINTENANCE_ROWS_TOTAL.labels("deactivated").inc(result.rowcount)
+                if result.rowcount < self.batch_size:
+                    break
+                await asyncio.sleep(0)  # Let request handlers in between batches
+
+            while True:
+                row = (await db.execute(self.compact_statement(compact_cutoff))).one()
+                await db.commit()
+                batches += 1
+                compacted += row.compacted
+                summaries += row.summaries
+                metrics.ALERT_MAINTENANCE_ROWS_TOTAL.labels("compacted").inc(row.compacted)
+                if row.compacted < self.batch_size:
+                    break
+                await asyncio.sleep(0)
+
+        if deactivated:
+            # The active set shrank; compacted rows were already inactive
+            await alert_service.invalidate_stats()
+            await invalidate_responses("alert_stats")
+
+        seconds = time.perf_counter() - start
+        metrics.ALERT_MAINTENANCE_SECONDS.observe(seconds)
+        report = MaintenanceReport(deactivated, compacted, summaries, batches, round(seconds, 3))
+        logger.info(
+            f"Alert maintenance: {deactivated} deactivated, {compacted} compacted into "
+            f"{summaries} summaries, {batches} batches in {seconds:.2f}s"
+        )
+        return report
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run()
+            except Exception as e:
+                # Whatever was committed stays; the rest is retried next interval
+                logger.error(f"Alert maintenance failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Alert maintenance started (interval={self.interval}s, batch={self.batch_size})")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+alert_maintenance = AlertMaintenance()
@@ -0,0 +1,442 @@
+from sqlalchemy import (
+    Date, Float, Integer, String, and_, cast, column, func, literal, or_, select, tuple_, union_all, update, values,
+)
+from sqlalchemy.dialects.postgresql import UUID, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.disease_alert import DiseaseAlert, DiseaseAlertSummary
+from app.services.geolocation_service import CELL_LEVEL, geolocation_service
+from app.services.outbreak_detector import OutbreakEscalation, outbreak_service
+from app.services.reference_catalog import reference_catalog
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional
+import numpy as np
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+ALERT_UNIQUE_CONSTRAINT = "uq_disease_alerts_cell_crop_disease_date"
+UPSERT_BATCH_SIZE = 1000
+HIGH_SEVERITY_LEVEL = 4
+
+# Dashboard stats; dropped whenever alert counts change
+stats_cache = TTLCache(
+    "alert_stats",
+    ttl=settings.ALERT_STATS_CACHE_TTL_SECONDS,
+    local_ttl=settings.ALERT_STATS_LOCAL_CACHE_TTL_SECONDS,
+)
+STATS_CACHE_KEY = "global"
+
+# Returned by the upsert: the alert as it is after the increment
+ALERT_EVENT_COLUMNS = (
+    DiseaseAlert.id,
+    DiseaseAlert.disease_id,
+    DiseaseAlert.crop_name,
+    DiseaseAlert.grid_location,
+    DiseaseAlert.cell_row,
+    DiseaseAlert.cell_col,
+    DiseaseAlert.detection_count,
+    DiseaseAlert.severity_level,
+    DiseaseAlert.alert_date,
+)
+
+
+class AlertIncrement(NamedTuple):
+    grid_location: str
+    crop_name: str
+    disease_id: Optional[uuid.UUID]
+    alert_date: date
+    count: int = 1
+
+
+def severity_for_count(detection_count: int) -> int:
+    """Severity 1-5 from detections in a cell on one day"""
+    return min(5, detection_count // 3 + 1)
+
+
+class AlertService:
+    """Disease alert aggregation per grid cell, crop, disease and day"""
+
+    @staticmethod
+    async def record_detection(
+        db: AsyncSession,
+        crop_name: str,
+        grid_location: str,
+        disease_id: Optional[uuid.UUID] = None,
+        count: int = 1,
+        detected_on: Optional[date] = None,
+    ) -> List:
+        """
+        Add detections to the day's alert for a cell in one statement;
+        returns the updated alert rows (ALERT_EVENT_COLUMNS): the cell's
+        alert, plus any alerts in neighbouring cells that outbreak
+        detection escalated.
+
+        INSERT ... ON CONFLICT DO UPDATE increments the existing row and
+        recomputes its severity atomically, so concurrent uploads from the same
+        cell can neither lose counts nor create duplicate rows. Runs in the
+        caller's transaction; the caller commits.
+        """
+        changed = await AlertService.record_detections(db, [
+            AlertIncrement(grid_location, crop_name, disease_id, detected_on or date.today(), count)
+        ])
+        logger.info(f"Disease alert updated: {grid_location}")
+        return changed
+
+    @staticmethod
+    async def record_detections(db: AsyncSession, increments: Iterable[AlertIncrement]) -> List:
+        """
+        Apply many alert increments as multi-row upserts; returns the
+        updated alert rows (ALERT_EVENT_COLUMNS), including alerts in
+        neighbouring cells that outbreak detection escalated.
+
+        Keys must be unique within a call (ON CONFLICT cannot touch a row
+        twice in one statement); rows are sorted so concurrent flushes lock
+        rows in the same order. With outbreak detection on, call it once per
+        transaction (it locks the cells' neighbourhoods before writing).
+        """
+        increments = sorted(increments, key=lambda i: (i.grid_location, i.crop_name, str(i.disease_id), i.alert_date))
+        changed = []
+
+        if settings.OUTBREAK_DETECTION_ENABLED:
+            await outbreak_service.lock(db, (
+                (i.crop_name, i.disease_id, *geolocation_service.grid_location_cell(i.grid_location))
+                for i in increments
+            ))
+
+        # Stay well under the bind parameter limit per statement
+        for offset in range(0, len(increments), UPSERT_BATCH_SIZE):
+            result = await db.execute(
+                AlertService._upsert_statement(increments[offset:offset + UPSERT_BATCH_SIZE])
+            )
+            changed.extend(result.all())
+
+        if settings.OUTBREAK_DETECTION_ENABLED and changed:
+            escalated = await AlertService.apply_escalations(db, await outbreak_service.detect(db, changed))
+            if escalated:
+                by_id = {row.id: row for row in changed}
+                by_id.update((row.id, row) for row in escalated)
+                changed = list(by_id.values())
+        return changed
+
+    @staticmethod
+    async def apply_escalations(db: AsyncSession, escalations: List[OutbreakEscalation]) -> List:
+        """
+        Raise alert severities to their outbreak level and store the scan
+        score, one UPDATE ... FROM (VALUES ...) per batch. Severity is only
+        ever raised and unchanged alerts are skipped; returns the rows that
+        changed (ALERT_EVENT_COLUMNS).
+        """
+        escalations = sorted(escalations, key=lambda e: (e.grid_location, e.crop_name, str(e.disease_id), e.alert_date))
+        changed = []
+        for offset in range(0, len(escalations), UPSERT_BATCH_SIZE):
+            result = await db.execute(
+                AlertService._escalation_statement(escalations[offset:offset + UPSERT_BATCH_SIZE])
+            )
+            changed.extend(result.all())
+        if changed:
+            logger.info(f"Outbreak detection escalated {len(changed)} alerts")
+        return changed
+
+    @staticmethod
+    def _escalation_statement(escalations: List[OutbreakEscalation]):
+        esc = values(
+            column("grid_location", String),
+            column("crop_name", String),
+            column("disease_id", UUID(as_uuid=True)),
+            column("alert_date", Date),
+            column("severity_level", Integer),
+            column("score", Float),
+            name="escalations",
+        ).data([
+            (e.grid_location, e.crop_name, e.disease_id, e.alert_date, e.severity_level, e.score)
+            for e in escalations
+        ])
+        # VALUES columns that are all NULL (or bare floats) would default to text
+        score = cast(esc.c.score, Float)
+        return (
+            update(DiseaseAlert)
+            .where(
+                DiseaseAlert.grid_location == esc.c.grid_location,
+                DiseaseAlert.crop_name == esc.c.crop_name,
+                DiseaseAlert.disease_id.is_not_distinct_from(cast(esc.c.disease_id, UUID(as_uuid=True))),
+                DiseaseAlert.alert_date == esc.c.alert_date,
+                or_(
+                    DiseaseAlert.severity_level < esc.c.severity_level,
+                    DiseaseAlert.outbreak_score.is_(None),
+                    DiseaseAlert.outbreak_score < score,
+                ),
+            )
+            .values(
+                severity_level=func.greatest(DiseaseAlert.severity_level, esc.c.severity_level),
+                outbreak_score=func.greatest(DiseaseAlert.outbreak_score, score),
+            )
+            .returning(*ALERT_EVENT_COLUMNS)
+        )
+
+    @staticmethod
+    def _upsert_statement(increments: List[AlertIncrement]):
+        rows = []
+        for inc in increments:
+            cell_row, cell_col = geolocation_service.grid_location_cell(inc.grid_location)
+            cell_id = geolocation_service.grid_location_cell_id(inc.grid_location)
+            rows.append({
+                "id": uuid.uuid4(),
+                "disease_id": inc.disease_id,
+                "crop_name": inc.crop_name,
+                "grid_location": inc.grid_location,
+                "cell_row": cell_row,
+                "cell_col": cell_col,
+                "cell_id": cell_id,
+                "detection_count": inc.count,
+                "severity_level": severity_for_count(inc.count),
+                "alert_date": inc.alert_date,
+                "is_active": True,
+                "last_detected_at": inc.alert_date,
+            })
+
+        stmt = pg_insert(DiseaseAlert).values(rows)
+        new_count = DiseaseAlert.detection_count + stmt.excluded.detection_count
+        stmt = stmt.on_conflict_do_update(
+            constraint=ALERT_UNIQUE_CONSTRAINT,
+            set_={
+                "detection_count": new_count,
+                # Never below an outbreak escalation already applied
+                "severity_level": func.greatest(DiseaseAlert.severity_level, func.least(5, new_count // 3 + 1)),
+                "last_detected_at": stmt.excluded.last_detected_at,
+                "is_active": True,
+            },
+        ).returning(*ALERT_EVENT_COLUMNS)
+        return stmt
+
+    @staticmethod
+    def nearby_query(user_row: int, user_col: int, radius_km: float, cutoff_date: date):
+        """Active alerts since cutoff_date in the cells covering radius_km"""
+        buckets = or_(*[
+            and_(DiseaseAlert.cell_row == row, DiseaseAlert.cell_col.between(first_col, last_col))
+            for row, first_col, last_col in geolocation_service.cells_within_radius(user_row, user_col, radius_km)
+        ])
+        return select(
+            DiseaseAlert.id,
+            DiseaseAlert.disease_id,
+            DiseaseAlert.crop_name,
+            DiseaseAlert.cell_row,
+            DiseaseAlert.cell_col,
+            DiseaseAlert.detection_count,
+            DiseaseAlert.severity_level,
+            DiseaseAlert.alert_date,
+        ).where(
+            DiseaseAlert.is_active == True,
+            DiseaseAlert.alert_date >= cutoff_date,
+            buckets,
+        )
+
+    @staticmethod
+    async def find_nearby(
+        db: AsyncSession,
+        latitude: float,
+        longitude: float,
+        radius_km: float,
+        days: int,
+    ) -> List[Dict]:
+        """
+        Active alerts from the last `days` days whose grid cell centre lies
+        within radius_km of the user's (anonymized) cell centre, sorted by
+        severity then distance.
+
+        Only the grid cells covering the radius are fetched (one indexed
+        range per cell row), so cost depends on local density, not on the
+        size of the alerts table. Disease names come from the in-memory
+        reference catalog, not a join.
+        """
+        user_row, user_col = geolocation_service.grid_cell(latitude, longitude)
+        user_lat, user_lon = geolocation_service.cell_center(user_row, user_col)
+        cutoff_date = date.today() - timedelta(days=days)
+
+        result = await db.execute(
+            AlertService.nearby_query(user_row, user_col, radius_km, cutoff_date)
+        )
+
+        candidates = result.all()
+        if not candidates:
+            return []
+
+        alert_lats, alert_lons = geolocation_service.cell_centers(
+            np.fromiter((a.cell_row for a in candidates), dtype=np.int64, count=len(candidates)),
+            np.fromiter((a.cell_col for a in candidates), dtype=np.int64, count=len(candidates)),
+        )
+        distances = geolocation_service.distances_from(user_lat, user_lon, alert_lats, alert_lons)
+
+        nearby_alerts = []
+        for i in np.flatnonzero(distances <= radius_km).tolist():
+            alert = candidates[i]
+            nearby_alerts.append({
+                "id": alert.id,
+                "disease_name": reference_catalog.disease_name(alert.disease_id),
+                "crop_name": alert.crop_name,
+                "detection_count": alert.detection_count,
+                "severity_level": alert.severity_level,
+                "distance_km": round(float(distances[i]), 1),
+                "alert_date": alert.alert_date,
+            })
+
+        # Sort by severity and distance
+        nearby_alerts.sort(key=lambda x: (-x["severity_level"], x["distance_km"]))
+        return nearby_alerts
+
+    @staticmethod
+    def rollup_query(
+        level: int,
+        days: int,
+        parent: Optional[str] = None,
+        crop_name: Optional[str] = None,
+    ):
+        """
+        Detections per hierarchical cell at `level`. Ranges reaching past
+        ALERT_COMPACT_AFTER_DAYS also read the weekly/monthly summaries of
+        compacted alerts (whole periods starting within the range).
+        """
+        shift = 2 * (CELL_LEVEL - level)
+        cutoff = date.today() - timedelta(days=days)
+        cell_range = geolocation_service.cell_id_range(*geolocation_service.parse_quadkey(parent)) if parent else None
+
+        daily = select(
+            DiseaseAlert.cell_id,
+            DiseaseAlert.detection_count,
+            literal(1).label("alerts"),
+            DiseaseAlert.severity_level.label("severity"),
+        ).where(DiseaseAlert.cell_id.isnot(None), DiseaseAlert.alert_date >= cutoff)
+        if cell_range:
+            daily = daily.where(DiseaseAlert.cell_id.between(*cell_range))
+        if crop_name:
+            daily = daily.where(DiseaseAlert.crop_name == crop_name)
+
+        rows = daily
+        if days >= settings.ALERT_COMPACT_AFTER_DAYS:
+            summaries = select(
+                DiseaseAlertSummary.cell_id,
+                DiseaseAlertSummary.detection_count,
+                DiseaseAlertSummary.alert_days,
+                DiseaseAlertSummary.max_severity,
+            ).where(DiseaseAlertSummary.cell_id.isnot(None), DiseaseAlertSummary.period_start >= cutoff)
+            if cell_range:
+                summaries = summaries.where(DiseaseAlertSummary.cell_id.between(*cell_range))
+            if crop_name:
+                summaries = summaries.where(DiseaseAlertSummary.crop_name == crop_name)
+            rows = union_all(daily, summaries)
+        rows = rows.subquery("alert_rows")
+
+        cell = rows.c.cell_id.op(">>")(shift).label("cell")
+        detections = func.sum(rows.c.detection_count).label("detection_count")
+        return (
+            select(
+                cell,
+                detections,
+                func.sum(rows.c.alerts).label("alert_count"),
+                func.max(rows.c.severity).label("max_severity"),
+            )
+            .group_by(cell)
+            .order_by(detections.desc())
+        )
+
+    @staticmethod
+    async def rollup(
+        db: AsyncSession,
+        level: int,
+        days: int,
+        parent: Optional[str] = None,
+        crop_name: Optional[str] = None,
+    ) -> List[Dict]:
+        """
+        Detections summed per hierarchical cell at `level` over the last
+        `days` days, optionally only inside the `parent` quadkey.
+
+        Cells at a coarser level are bit prefixes of the stored cell_id, so
+        this is one index range scan plus a GROUP BY on a shifted integer.
+        """
+        result = await db.execute(AlertService.rollup_query(level, days, parent, crop_name))
+
+        cells = []
+        for row in result.all():
+            south, west, north, east = geolocation_service.cell_bounds(row.cell, level)
+            cells.append({
+                "cell": geolocation_service.quadkey(row.cell, level),
+                "level": level,
+                "bounds": [south, west, north, east],
+                "detection_count": int(row.detection_count),
+                "alert_count": int(row.alert_count),
+                "max_severity": row.max_severity,
+            })
+        return cells
+
+    @staticmethod
+    def stats_query():
+        """Active alert aggregates per crop, per severity and overall (GROUPING SETS)"""
+        crop = DiseaseAlert.crop_name
+        severity = DiseaseAlert.severity_level
+        return (
+            select(
+                crop,
+                severity,
+                func.grouping(crop, severity).label("grouping"),
+                func.count().label("alerts"),
+                func.coalesce(func.sum(DiseaseAlert.detection_count), 0).label("detections"),
+                func.count().filter(severity >= HIGH_SEVERITY_LEVEL).label("high_severity"),
+            )
+            .where(DiseaseAlert.is_active == True)
+            .group_by(func.grouping_sets(tuple_(), tuple_(crop), tuple_(severity)))
+        )
+
+    @staticmethod
+    async def compute_stats(db: AsyncSession) -> Dict:
+        """
+        Active alert totals plus per-crop and per-severity breakdowns, from
+        one aggregate query (GROUPING SETS: a single scan of active alerts).
+        """
+        result = await db.execute(AlertService.stats_query())
+
+        stats = {
+            "total_active_alerts": 0,
+            "total_detections": 0,
+            "high_severity_alerts": 0,
+            "by_crop": [],
+            "by_severity": [],
+        }
+        for row in result.all():
+            # grouping() bits: 2 = crop rolled up, 1 = severity rolled up
+            if row.grouping == 3:
+                stats["total_active_alerts"] = row.alerts
+                stats["total_detections"] = int(row.detections)
+                stats["high_severity_alerts"] = row.high_severity
+            elif row.grouping == 1:
+                stats["by_crop"].append({
+                    "crop_name": row.crop_name,
+                    "alerts": row.alerts,
+                    "detections": int(row.detections),
+                })
+            else:
+                stats["by_severity"].append({
+                    "severity_level": row.severity_level,
+                    "alerts": row.alerts,
+                    "detections": int(row.detections),
+                })
+
+        stats["by_crop"].sort(key=lambda x: -x["detections"])
+        stats["by_severity"].sort(key=lambda x: x["severity_level"] or 0)
+        stats["last_updated"] = datetime.now().isoformat()
+        return stats
+
+    @staticmethod
+    async def get_stats(db: AsyncSession) -> Dict:
+        """compute_stats, cached for ALERT_STATS_CACHE_TTL_SECONDS"""
+        return await stats_cache.get_or_compute(STATS_CACHE_KEY, lambda: AlertService.compute_stats(db))
+
+    @staticmethod
+    async def invalidate_stats():
+        """Call after committing alert changes"""
+        await stats_cache.delete(STATS_CACHE_KEY)
+
+
+alert_service = AlertService()
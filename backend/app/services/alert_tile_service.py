@@ -0,0 +1,152 @@
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core import metrics
+from app.db.base import AsyncSessionLocal
+from app.services.alert_service import alert_service
+from app.services.geolocation_service import CELL_LEVEL, geolocation_service
+from collections import OrderedDict
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Iterable, Set
+import hashlib
+import orjson
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Each tile is split into 2^4 x 2^4 cells (level z + 4), so the deepest tile
+# whose cells are still at stored resolution is CELL_LEVEL - 4
+TILE_DETAIL_LEVELS = 4
+MAX_TILE_ZOOM = CELL_LEVEL - TILE_DETAIL_LEVELS
+
+LOCAL_TILES_MAX = 4096  # Tiles kept in each process
+WARM_TILES_MAX = 1024  # Recently served tiles re-rendered eagerly when they change
+
+
+class AlertTileService:
+    """
+    Alert density map tiles.
+
+    Tile z/x/y is the level-z cell of the hierarchical grid (see
+    geolocation_service.cell_id): x counts eastward from -180, y northward
+    from -90, and each zoom level halves the tile in both directions. A tile
+    is a GeoJSON FeatureCollection with one point per non-empty sub-cell at
+    level z + 4, carrying detections, alerts and max severity over the last
+    ALERT_TILE_DAYS days.
+
+    Tiles are cached (in-process and Redis) with an ETag and dropped only
+    when one of their cells receives detections; tiles this process served
+    recently are re-rendered straight after an alert flush, so panning
+    around an active map keeps hitting the cache.
+    """
+
+    def __init__(self):
+        self.cache = TTLCache(
+            "alert_tiles",
+            ttl=settings.ALERT_TILE_CACHE_TTL_SECONDS,
+            local_ttl=settings.ALERT_TILE_LOCAL_CACHE_TTL_SECONDS,
+            max_entries=LOCAL_TILES_MAX,
+        )
+        self._warm: "OrderedDict[str, None]" = OrderedDict()
+
+    @staticmethod
+    def tile_key(z: int, x: int, y: int) -> str:
+        return f"{z}/{x}/{y}"
+
+    @staticmethod
+    def is_valid_tile(z: int, x: int, y: int) -> bool:
+        return 0 <= z <= MAX_TILE_ZOOM and 0 <= x < (1 << z) and 0 <= y < (1 << z)
+
+    async def render(self, db: AsyncSession, z: int, x: int, y: int) -> Dict:
+        """Compute a tile from the database: {"etag": ..., "body": GeoJSON text}"""
+        tile_cell = geolocation_service.xy_cell(x, y, z)
+        level = z + TILE_DETAIL_LEVELS
+        cells = await alert_service.rollup(
+            db,
+            level,
+            settings.ALERT_TILE_DAYS,
+            parent=geolocation_service.quadkey(tile_cell, z),
+        )
+
+        south, west, north, east = geolocation_service.cell_bounds(tile_cell, z)
+        features = []
+        for cell in cells:
+            cell_south, cell_west, cell_north, cell_east = cell["bounds"]
+            features.append({
+                "type": "Feature",
+                "geometry": {
+                    "type": "Point",
+                    "coordinates": [
+                        round((cell_west + cell_east) / 2, 4),
+                        round((cell_south + cell_north) / 2, 4),
+                    ],
+                },
+                "properties": {
+                    "cell": cell["cell"],
+                    "detections": cell["detection_count"],
+                    "alerts": cell["alert_count"],
+                    "max_severity": cell["max_severity"],
+                },
+            })
+
+        body = orjson.dumps({
+            "type": "FeatureCollection",
+            "tile": [z, x, y],
+            "bbox": [west, south, east, north],
+            "cell_level": level,
+            "days": settings.ALERT_TILE_DAYS,
+            "features": features,
+        })
+        metrics.ALERT_TILES_RENDERED_TOTAL.inc()
+        return {
+            "etag": f'"{hashlib.sha1(body).hexdigest()[:20]}"',
+            "body": body.decode(),
+        }
+
+    def _mark_warm(self, key: str):
+        self._warm.pop(key, None)
+        self._warm[key] = None
+        if len(self._warm) > WARM_TILES_MAX:
+            self._warm.popitem(last=False)
+
+    async def get_tile(self, db: AsyncSession, z: int, x: int, y: int) -> Dict:
+        """Cached tile, rendered on a miss"""
+        key = self.tile_key(z, x, y)
+        self._mark_warm(key)
+        return await self.cache.get_or_compute(key, lambda: self.render(db, z, x, y))
+
+    @staticmethod
+    def tiles_for_grid_locations(grid_locations: Iterable[str]) -> Set[str]:
+        """Keys of every tile, at every zoom, containing one of the cells"""
+        keys = set()
+        for cell_id in {geolocation_service.grid_location_cell_id(g) for g in grid_locations}:
+            for z in range(MAX_TILE_ZOOM + 1):
+                x, y = geolocation_service.cell_xy(geolocation_service.cell_ancestor(cell_id, z), z)
+                keys.add(AlertTileService.tile_key(z, x, y))
+        return keys
+
+    async def invalidate(self, grid_locations: Iterable[str], refresh: bool = False):
+        """
+        Drop the tiles covering changed grid cells. With refresh, tiles this
+        process served recently are rendered again right away; call it
+        outside request handling (e.g. after an alert flush).
+        """
+        keys = self.tiles_for_grid_locations(grid_locations)
+        if not keys:
+            return
+        await self.cache.delete_many(keys)
+        metrics.ALERT_TILES_INVALIDATED_TOTAL.inc(len(keys))
+
+        warm = [key for key in keys if key in self._warm]
+        if not refresh or not warm:
+            return
+        try:
+            async with AsyncSessionLocal() as db:
+                for key in warm:
+                    z, x, y = (int(part) for part in key.split("/"))
+                    await self.cache.get_or_compute(key, lambda: self.render(db, z, x, y))
+        except Exception as e:
+            # The tiles are already dropped; they will render on next request
+            logger.warning(f"Tile refresh failed: {str(e)}")
+
+
+alert_tile_service = AlertTileService()
@@ -0,0 +1,234 @@
+from app.core.config import settings
+from app.core import metrics
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import math
+import time
+import uuid
+import orjson
+import redis.asyncio as aioredis
+import logging
+
+logger = logging.getLogger(__name__)
+
+JOB_BACKENDS = ("local", "redis")
+PENDING_STATUSES = ("queued", "running")
+REDIS_QUEUE_KEY = "diagnosis_jobs:queue"
+POLL_SECONDS = 0.25  # How often wait() re-reads a pending job
+DEFAULT_JOB_SECONDS = 2.0  # Retry-After estimate until jobs have run here
+MAX_RETRY_AFTER = 60
+
+JobHandler = Callable[[Dict], Awaitable[Dict]]
+
+
+class QueueFull(Exception):
+    """Admission refused: DIAGNOSIS_JOB_MAX_QUEUED jobs are already waiting"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Diagnosis job queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class DiagnosisJobQueue:
+    """
+    Bounded queue of diagnosis jobs and the worker pool that runs them.
+
+    A job is a JSON payload for the handler given to start() plus a status
+    record (queued, running, succeeded or failed, with the handler's result
+    or the error) kept for DIAGNOSIS_JOB_RESULT_TTL_SECONDS for clients to
+    poll. At most DIAGNOSIS_JOB_MAX_QUEUED jobs wait; beyond that submit()
+    raises QueueFull with a Retry-After estimate from the recent job time,
+    so a spike is turned away at the door instead of piling up timeouts.
+
+    The "local" backend queues in this process. The "redis" backend keeps
+    the queue and records in Redis, shared by every API process and any
+    `python -m app.worker` processes; jobs picked up by a worker that dies
+    are lost (their record stays "running" until it expires).
+    """
+
+    def __init__(self, backend: str = None, workers: int = None, max_queued: int = None):
+        self.backend = backend or settings.DIAGNOSIS_JOB_BACKEND
+        if self.backend not in JOB_BACKENDS:
+            raise ValueError(f"DIAGNOSIS_JOB_BACKEND must be one of {JOB_BACKENDS}")
+        self.workers = settings.DIAGNOSIS_JOB_WORKERS if workers is None else workers
+        self.max_queued = max_queued or settings.DIAGNOSIS_JOB_MAX_QUEUED
+        self.timeout = settings.DIAGNOSIS_JOB_TIMEOUT_SECONDS
+        self.result_ttl = settings.DIAGNOSIS_JOB_RESULT_TTL_SECONDS
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_queued)
+        # Local job records, least recently updated first (all share one TTL)
+        self._jobs: Dict[str, Tuple[float, Dict]] = {}
+        self._redis = None
+        self._handler: Optional[JobHandler] = None
+        self._tasks: List[asyncio.Task] = []
+        self._job_seconds = DEFAULT_JOB_SECONDS
+
+    @property
+    def enabled(self) -> bool:
+        """Whether submitted jobs will be run (locally queued jobs need workers here)"""
+        return self.backend == "redis" or self.workers > 0
+
+    def _client(self):
+        if self._redis is None:
+            # Own client: blocking pops outlast the cache client's socket timeout
+            self._redis = aioredis.from_url(settings.REDIS_URL)
+        return self._redis
+
+    @staticmethod
+    def _record_key(job_id: str) -> str:
+        return f"diagnosis_jobs:job:{job_id}"
+
+    async def _save(self, job: Dict):
+        if self.backend == "redis":
+            await self._client().set(
+                self._record_key(job["id"]), orjson.dumps(job), px=int(self.result_ttl * 1000)
+            )
+            return
+        now = time.monotonic()
+        while self._jobs:
+            oldest = next(iter(self._jobs))
+            if self._jobs[oldest][0] > now:
+                break
+            del self._jobs[oldest]
+        self._jobs.pop(job["id"], None)
+        self._jobs[job["id"]] = (now + self.result_ttl, job)
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        """Job record, None if unknown or expired"""
+        if self.backend == "redis":
+            raw = await self._client().get(self._record_key(job_id))
+            return orjson.loads(raw) if raw is not None else None
+        entry = self._jobs.get(job_id)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict]:
+        """Job record once it has finished, or as it is after `timeout` seconds"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = await self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job["status"] not in PENDING_STATUSES or remaining <= 0:
+                return job
+            await asyncio.sleep(min(POLL_SECONDS, remaining))
+
+    async def depth(self) -> int:
+        """Jobs waiting for a worker"""
+        if self.backend == "redis":
+            return await self._client().llen(REDIS_QUEUE_KEY)
+        return self._queue.qsize()
+
+    def retry_after(self, depth: int) -> int:
+        """Seconds until a full queue has likely drained enough to take a job"""
+        seconds = depth * self._job_seconds / max(self.workers, 1)
+        return min(max(math.ceil(seconds), 1), MAX_RETRY_AFTER)
+
+    async def check_admission(self):
+        """Raise QueueFull now, before the caller does any work for the job"""
+        depth = await self.depth()
+        if depth >= self.max_queued:
+            metrics.DIAGNOSIS_JOBS_TOTAL.labels("rejected").inc()
+            raise QueueFull(self.retry_after(depth))
+
+    async def submit(self, payload: Dict) -> Dict:
+        """Queue a job; returns its record. Raises QueueFull if the queue is at its limit."""
+        job = {
+            "id": str(uuid.uuid4()),
+            "status": "queued",
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "enqueued_at": time.time(),
+            "payload": payload,
+            "result": None,
+            "error": None,
+        }
+        if self.backend == "redis":
+            await self._save(job)
+            depth = await self._client().rpush(REDIS_QUEUE_KEY, job["id"])
+            if depth > self.max_queued:
+                # Lost the race for the last place
+                await self._client().lrem(REDIS_QUEUE_KEY, 1, job["id"])
+                await self._client().delete(self._record_key(job["id"]))
+                metrics.DIAGNOSIS_JOBS_TOTAL.labels("rejected").inc()
+                raise QueueFull(self.retry_after(depth))
+        else:
+            try:
+                self._queue.put_nowait(job["id"])
+            except asyncio.QueueFull:
+                metrics.DIAGNOSIS_JOBS_TOTAL.labels("rejected").inc()
+                raise QueueFull(self.retry_after(self._queue.qsize()))
+            await self._save(job)
+            depth = self._queue.qsize()
+        metrics.DIAGNOSIS_JOBS_QUEUED.set(depth)
+        metrics.DIAGNOSIS_JOBS_TOTAL.labels("queued").inc()
+        return job
+
+    async def _next(self) -> Optional[str]:
+        if self.backend == "redis":
+            popped = await self._client().blpop([REDIS_QUEUE_KEY], timeout=5)
+            return popped[1].decode() if popped is not None else None
+        job_id = await self._queue.get()
+        metrics.DIAGNOSIS_JOBS_QUEUED.set(self._queue.qsize())
+        return job_id
+
+    async def _run(self, job: Dict):
+        metrics.DIAGNOSIS_JOB_SECONDS.labels("wait").observe(max(time.time() - job["enqueued_at"], 0))
+        job["status"] = "running"
+        await self._save(job)
+
+        start = time.perf_counter()
+        try:
+            job["result"] = await asyncio.wait_for(self._handler(job["payload"]), self.timeout)
+            job["status"] = "succeeded"
+        except asyncio.CancelledError:
+            job["status"], job["error"] = "failed", "Worker shut down"
+            await self._save(job)
+            raise
+        except asyncio.TimeoutError:
+            job["status"], job["error"] = "failed", f"Timed out after {self.timeout:.0f}s"
+        except Exception as e:
+            logger.error(f"Diagnosis job {job['id']} failed: {str(e)}")
+            job["status"], job["error"] = "failed", str(e)
+
+        seconds = time.perf_counter() - start
+        self._job_seconds = 0.8 * self._job_seconds + 0.2 * seconds
+        metrics.DIAGNOSIS_JOB_SECONDS.labels("run").observe(seconds)
+        metrics.DIAGNOSIS_JOBS_TOTAL.labels(job["status"]).inc()
+        await self._save(job)
+
+    async def _work(self):
+        while True:
+            try:
+                job_id = await self._next()
+                if job_id is None:
+                    continue
+                job = await self.get(job_id)
+                if job is None:
+                    # Expired while queued
+                    continue
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Diagnosis job worker error: {str(e)}")
+                await asyncio.sleep(1)
+
+    def start(self, handler: JobHandler):
+        """Run up to DIAGNOSIS_JOB_WORKERS jobs at a time in this process"""
+        self._handler = handler
+        if self._tasks or self.workers <= 0:
+            return
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        logger.info(f"Diagnosis job workers started ({self.workers}, {self.backend} queue)")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+
+diagnosis_jobs = DiagnosisJobQueue()
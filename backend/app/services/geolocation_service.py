@@ -1,14 +1,167 @@
 from app.core.config import settings
 import math
-from typing import Tuple, Optional
+import numpy as np
+from typing import List, Tuple, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.0
+
+# Depth of stored hierarchical cell ids. Level L splits longitude and latitude
+# into 2^L bands each; level 12 cells are ~9.8 km wide (at the equator) and
+# ~4.9 km tall, about the default anonymization grid.
+CELL_LEVEL = 12
+
+
+def _nearest(x: float) -> int:
+    """Nearest integer, halves rounded up: matches floor(x + 0.5) in the SQL backfills"""
+    return math.floor(x + 0.5)
+
+
 class GeolocationService:
     """Privacy-preserving geolocation services"""
 
+    @staticmethod
+    def grid_degrees(grid_size_km: Optional[int] = None) -> float:
+        """Grid cell size in degrees (same for latitude and longitude)"""
+        return (grid_size_km or settings.GRID_SIZE_KM) / KM_PER_DEGREE
+
+    @staticmethod
+    def grid_cell(lat: float, lon: float, grid_size_km: Optional[int] = None) -> Tuple[int, int]:
+        """Integer (row, col) of the grid cell containing a point"""
+        grid_degrees = GeolocationService.grid_degrees(grid_size_km)
+        return _nearest(lat / grid_degrees), _nearest(lon / grid_degrees)
+
+    @staticmethod
+    def cell_center(row: int, col: int, grid_size_km: Optional[int] = None) -> Tuple[float, float]:
+        """Centre of a grid cell, as used in grid_location strings"""
+        grid_degrees = GeolocationService.grid_degrees(grid_size_km)
+        return row * grid_degrees, col * grid_degrees
+
+    @staticmethod
+    def grid_location_cell(grid_location: str, grid_size_km: Optional[int] = None) -> Tuple[int, int]:
+        """(row, col) for a "lat,lon" grid_location string"""
+        lat, lon = GeolocationService.parse_grid_location(grid_location)
+        return GeolocationService.grid_cell(lat, lon, grid_size_km)
+
+    @staticmethod
+    def cells_within_radius(
+        row: int,
+        col: int,
+        radius_km: float,
+        grid_size_km: Optional[int] = None,
+    ) -> List[Tuple[int, int, int]]:
+        """
+        Candidate cells whose centres may lie within radius_km of a cell centre,
+        as (row, first_col, last_col) ranges - one contiguous column span per
+        row. A superset (one column of slack per side); callers still apply
+        the exact distance.
+        """
+        grid_size = grid_size_km or settings.GRID_SIZE_KM
+        grid_degrees = GeolocationService.grid_degrees(grid_size)
+        row_span = math.ceil(radius_km / grid_size)
+
+        ranges = []
+        for r in range(row - row_span, row + row_span + 1):
+            dy_km = abs(r - row) * grid_size
+            if dy_km > radius_km:
+                continue
+            lat = max(-89.0, min(89.0, r * grid_degrees))
+            half_width_km = math.sqrt(radius_km ** 2 - dy_km ** 2)
+            # Longitude degrees shrink with latitude: widen the span accordingly
+            km_per_col = grid_size * max(math.cos(math.radians(lat)), 1e-6)
+            col_span = math.ceil(half_width_km / km_per_col) + 1
+            ranges.append((r, col - col_span, col + col_span))
+        return ranges
+
+    @staticmethod
+    def cell_id(lat: float, lon: float) -> int:
+        """
+        Hierarchical (quadtree / Morton) cell id at CELL_LEVEL.
+
+        Longitude and latitude band indexes are bit-interleaved, so the id of
+        a cell's ancestor at any coarser level is a bit-shift of it and every
+        descendant of a cell falls in one contiguous id range. Only ever
+        called on anonymized grid cell centres, so an id reveals no more than
+        the grid_location it was derived from.
+        """
+        return int(GeolocationService.cell_ids(np.array([lat]), np.array([lon]))[0])
+
+    @staticmethod
+    def cell_ids(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        """Batch cell_id over coordinate arrays"""
+        bands = 1 << CELL_LEVEL
+        x = np.clip(np.floor((np.asarray(lons, dtype=np.float64) + 180.0) / 360.0 * bands), 0, bands - 1).astype(np.int64)
+        y = np.clip(np.floor((np.asarray(lats, dtype=np.float64) + 90.0) / 180.0 * bands), 0, bands - 1).astype(np.int64)
+        ids = np.zeros_like(x)
+        for bit in range(CELL_LEVEL):
+            ids |= ((x >> bit) & 1) << (2 * bit)
+            ids |= ((y >> bit) & 1) << (2 * bit + 1)
+        return ids
+
+    @staticmethod
+    def grid_location_cell_id(grid_location: str) -> int:
+        """cell_id of an anonymized "lat,lon" grid_location"""
+        lat, lon = GeolocationService.parse_grid_location(grid_location)
+        return GeolocationService.cell_id(lat, lon)
+
+    @staticmethod
+    def cell_ancestor(cell_id: int, level: int) -> int:
+        """Id (within its level) of the level-`level` cell containing cell_id"""
+        return cell_id >> (2 * (CELL_LEVEL - level))
+
+    @staticmethod
+    def cell_id_range(cell: int, level: int) -> Tuple[int, int]:
+        """First and last stored cell_id inside a level-`level` cell"""
+        shift = 2 * (CELL_LEVEL - level)
+        return cell << shift, ((cell + 1) << shift) - 1
+
+    @staticmethod
+    def quadkey(cell: int, level: int) -> str:
+        """Base-4 string of a cell: one digit per level, parents are prefixes"""
+        return "".join(str((cell >> (2 * (level - 1 - i))) & 3) for i in range(level))
+
+    @staticmethod
+    def parse_quadkey(quadkey: str) -> Tuple[int, int]:
+        """(cell, level) for a quadkey; raises ValueError if malformed"""
+        if len(quadkey) > CELL_LEVEL or any(digit not in "0123" for digit in quadkey):
+            raise ValueError(f"Invalid quadkey: {quadkey!r}")
+        return (int(quadkey, 4) if quadkey else 0), len(quadkey)
+
+    @staticmethod
+    def cell_xy(cell: int, level: int) -> Tuple[int, int]:
+        """(x, y) band indexes of a cell: x eastward from -180, y northward from -90"""
+        x = y = 0
+        for bit in range(level):
+            x |= ((cell >> (2 * bit)) & 1) << bit
+            y |= ((cell >> (2 * bit + 1)) & 1) << bit
+        return x, y
+
+    @staticmethod
+    def xy_cell(x: int, y: int, level: int) -> int:
+        """Cell at `level` with band indexes (x, y); inverse of cell_xy"""
+        cell = 0
+        for bit in range(level):
+            cell |= ((x >> bit) & 1) << (2 * bit)
+            cell |= ((y >> bit) & 1) << (2 * bit + 1)
+        return cell
+
+    @staticmethod
+    def cell_bounds(cell: int, level: int) -> Tuple[float, float, float, float]:
+        """(south, west, north, east) in degrees of a cell"""
+        x, y = GeolocationService.cell_xy(cell, level)
+        lon_step = 360.0 / (1 << level)
+        lat_step = 180.0 / (1 << level)
+        return (
+            -90.0 + y * lat_step,
+            -180.0 + x * lon_step,
+            -90.0 + (y + 1) * lat_step,
+            -180.0 + (x + 1) * lon_step,
+        )
+
     @staticmethod
     def anonymize_location(lat: float, lon: float, grid_size_km: Optional[int] = None) -> str:
         """
@@ -23,11 +176,73 @@ class GeolocationService:
         grid_degrees = grid_size / 111.0
 
         # Round to nearest grid cell
-        grid_lat = round(lat / grid_degrees) * grid_degrees
-        grid_lon = round(lon / grid_degrees) * grid_degrees
+        grid_lat = _nearest(lat / grid_degrees) * grid_degrees
+        grid_lon = _nearest(lon / grid_degrees) * grid_degrees
 
         return f"{grid_lat:.4f},{grid_lon:.4f}"
 
+    @staticmethod
+    def anonymize_locations(
+        lats: np.ndarray,
+        lons: np.ndarray,
+        grid_size_km: Optional[int] = None,
+    ) -> List[str]:
+        """Batch anonymize_location over coordinate arrays"""
+        grid_degrees = GeolocationService.grid_degrees(grid_size_km)
+        # Halves round up, like _nearest
+        rows = np.floor(np.asarray(lats, dtype=np.float64) / grid_degrees + 0.5).astype(np.int64)
+        cols = np.floor(np.asarray(lons, dtype=np.float64) / grid_degrees + 0.5).astype(np.int64)
+        # Points share few cells: format each distinct cell once
+        _, first, inverse = np.unique((rows << 32) + cols, return_index=True, return_inverse=True)
+        labels = [
+            f"{row * grid_degrees:.4f},{col * grid_degrees:.4f}"
+            for row, col in zip(rows[first].tolist(), cols[first].tolist())
+        ]
+        return [labels[i] for i in inverse.ravel().tolist()]
+
+    @staticmethod
+    def cell_centers(
+        rows: np.ndarray,
+        cols: np.ndarray,
+        grid_size_km: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Batch cell_center: (lats, lons) arrays for grid cell arrays"""
+        grid_degrees = GeolocationService.grid_degrees(grid_size_km)
+        return (
+            np.asarray(rows, dtype=np.float64) * grid_degrees,
+            np.asarray(cols, dtype=np.float64) * grid_degrees,
+        )
+
+    @staticmethod
+    def distances_from(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        """
+        Haversine distances in km from one point to arrays of points.
+        Same formula as calculate_distance, evaluated over whole arrays.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        lats_rad = np.radians(lats)
+        delta_lat = np.radians(lats - lat)
+        delta_lon = np.radians(lons - lon)
+
+        a = (
+            np.sin(delta_lat / 2) ** 2
+            + math.cos(math.radians(lat)) * np.cos(lats_rad) * np.sin(delta_lon / 2) ** 2
+        )
+        return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    @staticmethod
+    def within_radius_mask(
+        lat: float,
+        lon: float,
+        lats: np.ndarray,
+        lons: np.ndarray,
+        radius_km: Optional[float] = None,
+    ) -> np.ndarray:
+        """Boolean mask of the points within radius_km of (lat, lon)"""
+        radius = radius_km or settings.ALERT_RADIUS_KM
+        return GeolocationService.distances_from(lat, lon, lats, lons) <= radius
+
     @staticmethod
     def calculate_distance(
         lat1: float, lon1: float, 
@@ -0,0 +1,170 @@
+from app.core.cache import get_redis, _redis_failed
+from app.core.config import settings
+from app.core import metrics
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import time
+import orjson
+import logging
+
+logger = logging.getLogger(__name__)
+
+POLL_SECONDS = 0.25  # How often a duplicate checks on a request running in another worker
+
+
+class IdempotencyConflict(Exception):
+    """The key was already used for a request with different contents"""
+
+
+class IdempotencyInProgress(Exception):
+    """The first request with the key did not finish within the wait"""
+
+
+class IdempotencyStore:
+    """
+    Results of non-repeatable requests by client-chosen key, so a retried
+    request is answered with the stored result instead of running again.
+
+    The first request with a key claims it in Redis (SET NX, expiring after
+    IDEMPOTENCY_LOCK_SECONDS in case its worker dies) and stores its result
+    for IDEMPOTENCY_TTL_SECONDS. Duplicates arriving meanwhile wait for
+    that result: on an event in the same process, by polling Redis across
+    workers. If the request fails the claim is dropped and the next retry
+    runs it. Without Redis keys are only deduplicated per process.
+    """
+
+    def __init__(self, namespace: str, ttl: float = None, lock_ttl: float = None, wait: float = None):
+        self.namespace = namespace
+        self.ttl = settings.IDEMPOTENCY_TTL_SECONDS if ttl is None else ttl
+        self.lock_ttl = settings.IDEMPOTENCY_LOCK_SECONDS if lock_ttl is None else lock_ttl
+        self.wait = settings.IDEMPOTENCY_WAIT_SECONDS if wait is None else wait
+        # Finished records, oldest first (all share one TTL)
+        self._local: Dict[str, Tuple[float, Dict]] = {}
+        self._inflight: Dict[str, asyncio.Event] = {}
+
+    def _redis_key(self, key: str) -> str:
+        return f"idempotency:{self.namespace}:{key}"
+
+    def _local_record(self, key: str) -> Optional[Dict]:
+        entry = self._local.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    def _store_local(self, key: str, record: Dict):
+        now = time.monotonic()
+        while self._local:
+            oldest = next(iter(self._local))
+            if self._local[oldest][0] > now:
+                break
+            del self._local[oldest]
+        self._local.pop(key, None)
+        self._local[key] = (now + self.ttl, record)
+
+    async def _load(self, key: str) -> Optional[Dict]:
+        record = self._local_record(key)
+        if record is not None:
+            return record
+        redis = get_redis()
+        if redis is not None:
+            try:
+                raw = await redis.get(self._redis_key(key))
+            except Exception as e:
+                _redis_failed(e)
+            else:
+                if raw is not None:
+                    return orjson.loads(raw)
+        return None
+
+    async def _claim(self, key: str, fingerprint: str) -> bool:
+        redis = get_redis()
+        if redis is not None:
+            try:
+                return bool(await redis.set(
+                    self._redis_key(key),
+                    orjson.dumps({"fingerprint": fingerprint, "state": "pending"}),
+                    px=int(self.lock_ttl * 1000),
+                    nx=True,
+                ))
+            except Exception as e:
+                _redis_failed(e)
+        # Per process only: the in-flight event already excludes other callers here
+        return self._local_record(key) is None
+
+    async def _finish(self, key: str, record: Dict):
+        self._store_local(key, record)
+        redis = get_redis()
+        if redis is not None:
+            try:
+                await redis.set(self._redis_key(key), orjson.dumps(record), px=int(self.ttl * 1000))
+            except Exception as e:
+                _redis_failed(e)
+
+    async def _release(self, key: str):
+        redis = get_redis()
+        if redis is not None:
+            try:
+                await redis.delete(self._redis_key(key))
+            except Exception as e:
+                _redis_failed(e)
+
+    async def run(self, key: str, fingerprint: str, compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        compute()'s JSON-serializable result for the first request with
+        `key`, or the stored one for a duplicate; returns (result, replayed).
+
+        `fingerprint` identifies the request contents: reusing a key for a
+        different request raises IdempotencyConflict. A duplicate that has
+        waited IDEMPOTENCY_WAIT_SECONDS for the first request raises
+        IdempotencyInProgress.
+        """
+        deadline = time.monotonic() + self.wait
+        waited = False
+        while True:
+            record = await self._load(key)
+            if record is not None:
+                if record["fingerprint"] != fingerprint:
+                    metrics.IDEMPOTENCY_REQUESTS_TOTAL.labels(self.namespace, "conflict").inc()
+                    raise IdempotencyConflict(key)
+                if record["state"] == "done":
+                    metrics.IDEMPOTENCY_REQUESTS_TOTAL.labels(self.namespace, "waited" if waited else "replayed").inc()
+                    return record["response"], True
+
+            event = self._inflight.get(key)
+            if event is None and record is None:
+                # Registered before the first await, so callers in this process queue behind it
+                event = self._inflight[key] = asyncio.Event()
+                if await self._claim(key, fingerprint):
+                    break
+                del self._inflight[key]
+                event.set()
+                continue
+
+            # Running in this process (event) or in another worker (pending record)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise IdempotencyInProgress(key)
+            waited = True
+            if event is not None:
+                try:
+                    await asyncio.wait_for(event.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await asyncio.sleep(min(POLL_SECONDS, remaining))
+
+        metrics.IDEMPOTENCY_REQUESTS_TOTAL.labels(self.namespace, "new").inc()
+        try:
+            response = await compute()
+        except BaseException:
+            await self._release(key)
+            raise
+        else:
+            await self._finish(key, {"fingerprint": fingerprint, "state": "done", "response": response})
+        finally:
+            del self._inflight[key]
+            event.set()
+        return response, False
+
+
+diagnosis_idempotency = IdempotencyStore("diagnosis")
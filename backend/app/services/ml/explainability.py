@@ -3,7 +3,6 @@ import numpy as np
 from PIL import Image
 from io import BytesIO
 from typing import Tuple
-import tensorflow as tf
 import logging
 
 logger = logging.getLogger(__name__)
@@ -2,19 +2,55 @@ from __future__ import annotations
 import numpy as np
 import onnxruntime as ort
 from app.services.ml.image_processor import ImageProcessor
+from app.services.ml.model_distribution import external_data_files
+from app.services.ml.model_registry import ModelRegistry, model_registry
 from app.core.config import settings
-from typing import Dict, Optional
+from app.core import metrics
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
 from PIL import Image
+import asyncio
+import time
+import orjson
 import logging
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
 
+class LoadedModel:
+    """
+    A model version with its session and labels. Never modified: a swap
+    replaces the whole object, so a prediction uses one version throughout.
+    """
+
+    def __init__(
+        self,
+        version: str,
+        registered: bool,
+        path: Path,
+        session: ort.InferenceSession,
+        class_names: List[str],
+        distribution_path: Path,
+        shared_weights: bool = False,
+    ):
+        self.version = version
+        self.registered = registered  # From the registry, rather than MODEL_PATH
+        self.path = path
+        self.session = session
+        self.class_names = class_names
+        self.distribution_path = distribution_path  # File sent to devices
+        self.shared_weights = shared_weights  # Session uses the mapped external weights in place
+        model_input, model_output = session.get_inputs()[0], session.get_outputs()[0]
+        self.input_name, self.input_shape = model_input.name, model_input.shape
+        self.output_name, self.output_shape = model_output.name, model_output.shape
+        self.loaded_at = datetime.now(timezone.utc).isoformat()
+
+
 class ONNXInferenceService:
     """ONNX Runtime-based crop disease detection"""
     
-    # PlantVillage 38 disease classes (matches trained model)
+    # PlantVillage 38 disease classes (matches trained model; registry versions may bring their own)
     CLASS_NAMES = [
         "Apple___Apple_scab",
         "Apple___Black_rot",
@@ -56,22 +92,185 @@ class ONNXInferenceService:
         "background"
     ]
     
-    def __init__(self, model_path: str = "models/plant_disease_model.onnx"):
-        """Initialize ONNX inference session"""
+    def __init__(self, model_path: str = "models/plant_disease_model.onnx", registry: ModelRegistry = None):
+        """
+        Sessions are created by load(), in each worker process: ONNX Runtime
+        sessions own thread pools, which do not survive a fork.
+
+        The registry's active version is served; until one is activated,
+        `model_path` is, as MODEL_VERSION with the built-in class names.
+        """
         self.model_path = Path(model_path)
-        if not self.model_path.exists():
-            logger.warning(f"Model not found at {model_path}, will fail on first prediction")
-            self.session = None
+        self.registry = registry or model_registry
+        self.model: Optional[LoadedModel] = None
+        self._load_attempted = False
+        self._failed_version: Optional[str] = None
+        self._on_activate: Optional[Callable[[LoadedModel], None]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def shares_weights(path: Path) -> bool:
+        """
+        MODEL_SHARED_WEIGHTS, or if unset: whether the model keeps its
+        weights in external files and several workers would share them.
+        Otherwise sharing only costs the extended optimizations.
+        """
+        if settings.MODEL_SHARED_WEIGHTS is not None:
+            return settings.MODEL_SHARED_WEIGHTS
+        return settings.WEB_CONCURRENCY > 1 and bool(external_data_files(path))
+
+    @staticmethod
+    def session_options(shared_weights: bool = False) -> ort.SessionOptions:
+        options = ort.SessionOptions()
+        if shared_weights:
+            # Weights kept external to the .onnx file are memory-mapped; without
+            # prepacking they are used from that read-only mapping instead of
+            # being copied, so every worker on the node shares the same pages.
+            # Extended optimizations rewrite weights into new private tensors
+            # (NCHWc layouts for Conv), so only basic ones are applied
+            options.add_session_config_entry("session.disable_prepacking", "1")
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_BASIC
+        if settings.MODEL_INTRA_OP_THREADS:
+            options.intra_op_num_threads = settings.MODEL_INTRA_OP_THREADS
+        return options
+
+    def load_version(self, version: Optional[str]) -> LoadedModel:
+        """
+        Create a session for a registry version (None: `model_path`) and run
+        one warm-up prediction, which also checks the outputs match the
+        labels. Blocking; raises if the version cannot be served.
+        """
+        if version is None:
+            path = self.model_path
+            class_names = self.CLASS_NAMES
+            distribution_path = Path(settings.MODEL_DISTRIBUTION_PATH or path)
         else:
+            manifest = self.registry.verify(version) if settings.MODEL_REGISTRY_VERIFY else self.registry.manifest(version)
+            directory = self.registry.version_dir(version)
+            path = directory / manifest["model"]
+            class_names = self.CLASS_NAMES
+            if manifest["labels"]:
+                class_names = orjson.loads((directory / manifest["labels"]).read_bytes())
+            distribution_path = directory / (manifest["mobile"] or manifest["model"])
+        if not path.exists():
+            raise FileNotFoundError(f"Model not found at {path}")
+
+        shared_weights = self.shares_weights(path)
+        session = ort.InferenceSession(str(path), self.session_options(shared_weights), providers=["CPUExecutionProvider"])
+        model = LoadedModel(
+            version or settings.MODEL_VERSION,
+            version is not None,
+            path,
+            session,
+            class_names,
+            distribution_path,
+            shared_weights,
+        )
+        # Fault the weights in now rather than on the first request
+        shape = [dim if isinstance(dim, int) else 1 for dim in model.input_shape]
+        output = session.run([model.output_name], {model.input_name: np.zeros(shape, dtype=np.float32)})[0]
+        if output.shape[-1] != len(class_names):
+            raise ValueError(f"Model {model.version} has {output.shape[-1]} outputs but {len(class_names)} labels")
+        return model
+
+    def _serve(self, model: LoadedModel):
+        previous, self.model = self.model, model
+        if previous is not None:
+            metrics.MODEL_ACTIVE.labels(previous.version).set(0)
+        metrics.MODEL_ACTIVE.labels(model.version).set(1)
+        if self._on_activate is not None:
+            self._on_activate(model)
+
+    def load(self) -> bool:
+        """Load and serve the active version"""
+        self._load_attempted = True
+        try:
+            model = self.load_version(self.registry.active())
+        except FileNotFoundError as e:
+            logger.warning(f"{e}, will fail on first prediction")
+            return False
+        except Exception as e:
+            logger.error(f"Failed to load ONNX model: {e}")
+            return False
+        self._serve(model)
+        logger.info(f"✅ ONNX model {model.version} loaded: {model.path}")
+        return True
+
+    async def activate(self, version: str) -> LoadedModel:
+        """
+        Load `version` next to the current model, then swap. Requests
+        already running keep the model they started with; its session is
+        freed once the last of them finishes.
+        """
+        start = time.perf_counter()
+        try:
+            model = await asyncio.to_thread(self.load_version, version)
+        except Exception:
+            metrics.MODEL_SWAPS_TOTAL.labels("failed").inc()
+            raise
+        previous = self.model.version if self.model else None
+        self._serve(model)
+        metrics.MODEL_SWAPS_TOTAL.labels("succeeded").inc()
+        metrics.MODEL_LOAD_SECONDS.observe(time.perf_counter() - start)
+        logger.info(f"Model swapped: {previous} -> {model.version}")
+        return model
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(settings.MODEL_REGISTRY_POLL_SECONDS)
             try:
-                self.session = ort.InferenceSession(str(self.model_path))
-                self.input_name = self.session.get_inputs()[0].name
-                self.output_name = self.session.get_outputs()[0].name
-                logger.info(f"✅ ONNX model loaded: {model_path}")
+                version = await asyncio.to_thread(self.registry.active)
+                current = self.model
+                if version is None or version == self._failed_version:
+                    continue
+                if current is not None and current.registered and current.version == version:
+                    continue
+                try:
+                    await self.activate(version)
+                    self._failed_version = None
+                except Exception as e:
+                    # Not retried until the active version changes again
+                    self._failed_version = version
+                    logger.error(
+                        f"Could not activate model {version}, still serving "
+                        f"{current.version if current else 'nothing'}: {e}"
+                    )
             except Exception as e:
-                logger.error(f"Failed to load ONNX model: {e}")
-                self.session = None
-    
+                logger.error(f"Model registry check failed: {e}")
+
+    def start(self, on_activate: Callable[[LoadedModel], None] = None):
+        """Follow the registry's active version; on_activate gets each model served, the current one first"""
+        self._on_activate = on_activate
+        if on_activate is not None and self.model is not None:
+            on_activate(self.model)
+        if settings.MODEL_REGISTRY_POLL_SECONDS > 0 and self._task is None:
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def model_info(self) -> Dict:
+        """Metadata of the model this process serves"""
+        model = self.model
+        return {
+            "version": model.version if model else None,
+            "from_registry": model.registered if model else False,
+            "path": str(model.path if model else self.model_path),
+            "runtime": f"onnxruntime {ort.__version__}",
+            "loaded": model is not None,
+            "loaded_at": model.loaded_at if model else None,
+            "input_shape": model.input_shape if model else None,
+            "output_shape": model.output_shape if model else None,
+            "num_classes": len(model.class_names if model else self.CLASS_NAMES),
+            "shared_weights": model.shared_weights if model else None,
+        }
+
     @staticmethod
     def parse_class_name(class_name: str) -> tuple[str, str]:
         """Parse class name into crop and disease"""
@@ -107,9 +306,17 @@ class ONNXInferenceService:
     
     async def predict_disease(self, image_bytes: bytes) -> Dict:
         """Run disease prediction with confidence scoring"""
-        if self.session is None:
+        if self.model is None and not self._load_attempted:
+            self.load()
+        # The model this prediction runs on, even if another is swapped in meanwhile
+        model = self.model
+        if model is None:
             raise RuntimeError("ONNX model not loaded. Check model path.")
-        
+        # Decoding, preprocessing and the session run are CPU-bound: keep
+        # them off the event loop (and within reach of callers' timeouts)
+        return await asyncio.to_thread(self._predict, model, image_bytes)
+
+    def _predict(self, model: LoadedModel, image_bytes: bytes) -> Dict:
         try:
             # 1. Validate image quality
             quality_metrics = ImageProcessor.validate_image(image_bytes)
@@ -121,7 +328,7 @@ class ONNXInferenceService:
             input_tensor = self.preprocess_image(image)
             
             # 4. Run ONNX inference
-            outputs = self.session.run([self.output_name], {self.input_name: input_tensor})
+            outputs = model.session.run([model.output_name], {model.input_name: input_tensor})
             logits = outputs[0][0]
             
             # 5. Apply softmax
@@ -135,15 +342,17 @@ class ONNXInferenceService:
             top3_indices = np.argsort(probabilities)[-3:][::-1]
             top3_predictions = []
             for idx in top3_indices:
-                crop, disease = self.parse_class_name(self.CLASS_NAMES[idx])
+                crop, disease = self.parse_class_name(model.class_names[idx])
                 top3_predictions.append({
+                    "classIndex": int(idx),
+                    "className": model.class_names[idx],
                     "cropName": crop,
                     "diseaseName": disease,
                     "confidence": float(probabilities[idx])
                 })
             
             # 8. Parse main prediction
-            crop_name, disease_name = self.parse_class_name(self.CLASS_NAMES[predicted_idx])
+            crop_name, disease_name = self.parse_class_name(model.class_names[predicted_idx])
             
             # 9. Determine if retry needed
             needs_retry = None
@@ -158,11 +367,14 @@ class ONNXInferenceService:
                 "diseaseName": disease_name,
                 "confidence": round(confidence, 4),
                 "isHealthy": "healthy" in disease_name.lower(),
+                "classIndex": predicted_idx,
                 "qualityScore": quality_metrics["quality_score"],
+                "qualityMetrics": quality_metrics,
                 "needsRetry": needs_retry,
                 "top3Predictions": top3_predictions,
-                "modelVersion": settings.MODEL_VERSION,
-                "suggestions": []
+                "modelVersion": model.version,
+                "suggestions": [],
+                "logits": logits,
             }
             
             # 11. Add helpful suggestions
@@ -185,4 +397,4 @@ class ONNXInferenceService:
 
 
 # Global instance
-inference_service = ONNXInferenceService()
+inference_service = ONNXInferenceService(settings.MODEL_PATH, model_registry)
@@ -0,0 +1,284 @@
+from app.core.config import settings
+from app.core import metrics
+from app.services.ml import model_patch
+from onnx.external_data_helper import uses_external_data
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+import asyncio
+import fcntl
+import gzip
+import hashlib
+import mmap
+import os
+import re
+import shutil
+import time
+import onnx
+import orjson
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Files are named after the SHA-256 of the model they hold (or rebuild)
+FILE_NAME_PATTERN = re.compile(r"^([0-9a-f]{64})\.onnx(\.gz)?$")
+PATCH_NAME_PATTERN = re.compile(r"^([0-9a-f]{64})-([0-9a-f]{64})\.patch$")
+HASH_CHUNK_SIZE = 1024 * 1024
+MAX_INLINE_BYTES = 2 ** 31 - 1  # Protobuf limit for a self-contained model
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def external_data_files(path: Path) -> List[str]:
+    """Files an ONNX model loads its weights from, besides itself (empty if self-contained)"""
+    model = onnx.load(str(path), load_external_data=False)
+    return sorted({
+        entry.value
+        for tensor in model.graph.initializer if uses_external_data(tensor)
+        for entry in tensor.external_data if entry.key == "location"
+    })
+
+
+def inline_external_data(path: Path) -> bytes:
+    """A model with external weights serialized as one self-contained file"""
+    # Loading pulls the external tensors into the model and clears their locations
+    model = onnx.load(str(path))
+    if model.ByteSize() > MAX_INLINE_BYTES:
+        raise ValueError(f"{path} is over 2 GB with its weights inlined; set a self-contained MODEL_DISTRIBUTION_PATH")
+    return model.SerializeToString(deterministic=True)
+
+
+@contextmanager
+def _mapped(path: Path):
+    """Read-only view of a file's bytes without copying them onto the heap"""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+        yield view
+
+
+def _copy_file(source: Path):
+    def write(f):
+        with open(source, "rb") as src:
+            shutil.copyfileobj(src, f, HASH_CHUNK_SIZE)
+    return write
+
+
+@contextmanager
+def locked(directory: Path):
+    """Exclusive lock shared by every process using `directory`"""
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / ".lock", "wb") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def replace_atomically(path: Path, write):
+    """Write through a temporary file so readers never see a partial one"""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+class ModelDistribution:
+    """
+    Model releases for devices to download and keep for offline use.
+
+    Whenever a worker starts serving a model version, release() publishes
+    the file sent to devices for it (see LoadedModel.distribution_path)
+    into MODEL_DISTRIBUTION_DIR under its SHA-256, next to the releases
+    published before it. The latest
+    release also gets a gzip copy, and a patch from each of the previous
+    MODEL_DISTRIBUTION_KEEP_RELEASES - 1 releases (see model_patch).
+    These files never change once written, so they are served with
+    ETags, Range requests and long-lived Cache-Control.
+
+    The directory is shared by the workers of a node (and may be a shared
+    volume): a lock file serializes publishing, and only the first worker
+    builds the compressed copy and patches.
+    """
+
+    def __init__(self, directory: str, keep: int):
+        self.directory = Path(directory)
+        self.keep = max(keep, 1)
+        self.releases: List[Dict] = []  # Oldest first, as in the manifest
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.directory / "releases.json"
+
+    @property
+    def latest(self) -> Optional[Dict]:
+        return self.releases[-1] if self.releases else None
+
+    def file_path(self, sha256: str, compressed: bool = False) -> Path:
+        return self.directory / (f"{sha256}.onnx.gz" if compressed else f"{sha256}.onnx")
+
+    def patch_path(self, base: str, target: str) -> Path:
+        return self.directory / f"{base}-{target}.patch"
+
+    def _read_manifest(self) -> List[Dict]:
+        try:
+            return orjson.loads(self.manifest_path.read_bytes())
+        except FileNotFoundError:
+            return []
+
+    def publish(self, source: Path, version: str) -> Optional[Dict]:
+        """
+        Make `source` the latest release (blocking). Devices get one file,
+        so a model keeping its weights in external files is published as a
+        copy with them inlined, built once per source (`source_sha256`).
+        """
+        if not source.exists():
+            logger.warning(f"Model for distribution not found at {source}")
+            return None
+        external = external_data_files(source)
+        if external:
+            source_sha256 = hashlib.sha256("".join(
+                file_sha256(path) for path in [source] + [source.parent / name for name in external]
+            ).encode()).hexdigest()
+            key = ("source_sha256", source_sha256)
+        else:
+            sha256 = file_sha256(source)
+            key = ("sha256", sha256)
+        with locked(self.directory):
+            releases = self._read_manifest()
+            release = next((r for r in releases if r.get(key[0]) == key[1]), None)
+            if release is None:
+                if external:
+                    data = inline_external_data(source)
+                    sha256, size = hashlib.sha256(data).hexdigest(), len(data)
+                    replace_atomically(self.file_path(sha256), lambda f: f.write(data))
+                else:
+                    size = source.stat().st_size
+                    replace_atomically(self.file_path(sha256), _copy_file(source))
+                release = {
+                    "version": version,
+                    "sha256": sha256,
+                    "size": size,
+                    "published_at": datetime.now(timezone.utc).isoformat(),
+                }
+                if external:
+                    release["source_sha256"] = source_sha256
+                logger.info(f"Published model release {version} ({sha256[:12]})")
+            sha256 = release["sha256"]
+            # A release served again (rollback) becomes the latest once more
+            releases = [r for r in releases if r["sha256"] != sha256] + [release]
+            for old in releases[:-self.keep]:
+                self._remove(old["sha256"])
+            releases = releases[-self.keep:]
+            replace_atomically(self.manifest_path, lambda f: f.write(orjson.dumps(releases, option=orjson.OPT_INDENT_2)))
+        self.releases = releases
+        return release
+
+    def _remove(self, sha256: str):
+        for path in (self.file_path(sha256), self.file_path(sha256, compressed=True)):
+            path.unlink(missing_ok=True)
+        for path in self.directory.glob("*.patch"):
+            if sha256 in path.stem.split("-"):
+                path.unlink(missing_ok=True)
+
+    def prepare(self):
+        """Build the latest release's gzip copy and patches that are missing (blocking)"""
+        latest = self.latest
+        if latest is None:
+            return
+        target = latest["sha256"]
+        with locked(self.directory):
+            compressed = self.file_path(target, compressed=True)
+            if not compressed.exists():
+                start = time.perf_counter()
+
+                def write_gzip(f):
+                    with open(self.file_path(target), "rb") as src, gzip.GzipFile(fileobj=f, mode="wb", mtime=0) as dst:
+                        shutil.copyfileobj(src, dst, HASH_CHUNK_SIZE)
+
+                replace_atomically(compressed, write_gzip)
+                metrics.MODEL_ARTIFACT_BUILD_SECONDS.labels("gzip").observe(time.perf_counter() - start)
+
+            for release in self.releases[:-1]:
+                base = release["sha256"]
+                path = self.patch_path(base, target)
+                if path.exists():
+                    continue
+                start = time.perf_counter()
+                stats = {}
+
+                def write_patch(f):
+                    with _mapped(self.file_path(base)) as base_bytes, _mapped(self.file_path(target)) as target_bytes:
+                        stats.update(model_patch.write_patch(base_bytes, target_bytes, f))
+
+                replace_atomically(path, write_patch)
+                metrics.MODEL_ARTIFACT_BUILD_SECONDS.labels("patch").observe(time.perf_counter() - start)
+                logger.info(
+                    f"Model patch {release['version']} -> {latest['version']}: "
+                    f"{path.stat().st_size} bytes, {stats['copied']} bytes reused"
+                )
+
+    def describe(self) -> Optional[Dict]:
+        """The latest release with the downloads available for it"""
+        latest = self.latest
+        if latest is None:
+            return None
+        base_url = f"{settings.PUBLIC_BASE_URL}{settings.API_V1_PREFIX}/models"
+        target = latest["sha256"]
+        downloads = [{"encoding": "identity", "url": f"{base_url}/files/{target}.onnx", "size_bytes": latest["size"]}]
+        compressed = self.file_path(target, compressed=True)
+        if compressed.exists():
+            downloads.append({
+                "encoding": "gzip",
+                "url": f"{base_url}/files/{compressed.name}",
+                "size_bytes": compressed.stat().st_size,
+            })
+        smallest = min(download["size_bytes"] for download in downloads)
+        patches = []
+        for release in self.releases[:-1]:
+            path = self.patch_path(release["sha256"], target)
+            # Retrained end to end, a model's patch is no smaller than its gzip copy
+            if path.exists() and path.stat().st_size < smallest:
+                patches.append({
+                    "from_version": release["version"],
+                    "from_sha256": release["sha256"],
+                    "url": f"{base_url}/patches/{path.name}",
+                    "size_bytes": path.stat().st_size,
+                })
+        return {**latest, "downloads": downloads, "patches": patches}
+
+    async def _run(self, source: Path, version: str, previous: Optional[asyncio.Task]):
+        if previous is not None:
+            await asyncio.wait([previous])
+        try:
+            await asyncio.to_thread(self.publish, source, version)
+            await asyncio.to_thread(self.prepare)
+        except Exception as e:
+            logger.error(f"Model distribution failed: {e}")
+
+    def release(self, model):
+        """Publish a loaded model's distribution file in the background, after earlier releases"""
+        self._task = asyncio.create_task(self._run(Path(model.distribution_path), model.version, self._task))
+
+    async def stop(self):
+        # A build already running in its thread finishes on its own; its
+        # files appear atomically, so it can be cut off at exit
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+model_distribution = ModelDistribution(
+    settings.MODEL_DISTRIBUTION_DIR,
+    settings.MODEL_DISTRIBUTION_KEEP_RELEASES,
+)
@@ -1,4 +1,3 @@
-import tensorflow as tf
 import numpy as np
 from pathlib import Path
 from app.core.config import settings
@@ -9,14 +8,19 @@ logger = logging.getLogger(__name__)
 
 
 class ModelManager:
-    """Manages TensorFlow Lite model loading and versioning"""
+    """
+    Manages TensorFlow Lite model loading and versioning.
+
+    TensorFlow is imported and the model loaded on first use, not at import:
+    serving goes through ONNX Runtime, and importing TensorFlow in every
+    worker costs hundreds of MB each.
+    """
 
     def __init__(self):
-        self.interpreter: Optional[tf.lite.Interpreter] = None
+        self.interpreter = None
         self.input_details = None
         self.output_details = None
         self.current_version = settings.MODEL_VERSION
-        self.load_model()
 
     def load_model(self, model_path: Optional[str] = None):
         """Load TensorFlow Lite model"""
@@ -27,6 +31,8 @@ class ModelManager:
                 logger.warning(f"Model file not found at {path}")
                 return False
 
+            import tensorflow as tf
+
             # Load TFLite model and allocate tensors
             self.interpreter = tf.lite.Interpreter(model_path=path)
             self.interpreter.allocate_tensors()
@@ -47,7 +53,7 @@ class ModelManager:
 
     def predict(self, image_array: np.ndarray) -> np.ndarray:
         """Run inference on preprocessed image"""
-        if self.interpreter is None:
+        if self.interpreter is None and not self.load_model():
             raise RuntimeError("Model not loaded")
 
         # Ensure correct input shape
@@ -0,0 +1,211 @@
+"""
+Binary patches between two model files, so a device holding release A
+downloads only what changed to reach release B.
+
+Format, the whole stream gzip-compressed (literal bytes compress too):
+
+    b"CDPATCH1"
+    32 bytes   SHA-256 of the base file
+    32 bytes   SHA-256 of the target file
+    uint64     target size
+    then operations until END, rebuilding the target front to back:
+      0x01 COPY  uint64 base offset, uint32 length
+      0x02 DATA  uint32 length, followed by that many bytes
+      0x00 END
+
+All integers are little-endian. A client checks the base hash against
+its file, applies the operations and checks the result against the
+target hash before replacing its model.
+
+Matching works like rsync: the base is cut into aligned blocks and every
+offset of the target is looked up by a rolling weak checksum (computed
+with numpy over the whole file), then confirmed by comparing the bytes.
+Tensors that did not change are found even when they moved, e.g.
+because a layer in front of them changed size.
+"""
+from typing import BinaryIO, Dict, Iterator, Tuple
+import gzip
+import hashlib
+import struct
+import numpy as np
+
+MAGIC = b"CDPATCH1"
+OP_END = 0
+OP_COPY = 1
+OP_DATA = 2
+BLOCK_SIZE = 4096
+CHUNK_SIZE = 2 * 1024 * 1024  # Target bytes checksummed per numpy pass (~60 MB of temporaries)
+MAX_DATA = 1024 * 1024  # Largest single DATA operation
+FILTER_BITS = 24
+
+HEADER = struct.Struct("<8s32s32sQ")
+COPY = struct.Struct("<BQI")
+DATA = struct.Struct("<BI")
+
+
+class PatchError(ValueError):
+    pass
+
+
+def _weak_sums(data: np.ndarray, block: int) -> np.ndarray:
+    """
+    Adler-style checksum of the `block` bytes starting at every offset:
+    (sum of bytes, sum weighted by distance to the window end) in one int64
+    """
+    x = data.astype(np.int64)
+    index = np.arange(len(x), dtype=np.int64)
+    s1 = np.concatenate(([0], np.cumsum(x)))
+    s2 = np.concatenate(([0], np.cumsum(index * x)))
+    starts = np.arange(len(x) - block + 1, dtype=np.int64)
+    a = s1[block:] - s1[:-block]
+    b = (starts + block) * a - (s2[block:] - s2[:-block])
+    return (b << 21) | a
+
+
+def _block_index(base: np.ndarray, block: int) -> Tuple[np.ndarray, Dict[int, int]]:
+    """Weak sums of the base's aligned blocks, and the first offset of each"""
+    count = len(base) // block
+    if not count:
+        return np.empty(0, dtype=np.int64), {}
+    blocks = base[:count * block].reshape(count, block).astype(np.int64)
+    a = blocks.sum(axis=1)
+    b = (blocks * np.arange(block, 0, -1, dtype=np.int64)).sum(axis=1)
+    sums = (b << 21) | a
+    offsets: Dict[int, int] = {}
+    for i, value in enumerate(sums.tolist()):
+        offsets.setdefault(value, i * block)
+    return np.unique(sums), offsets
+
+
+def _buckets(sums: np.ndarray) -> np.ndarray:
+    # Multiplicative hashing: the high bits depend on every bit of the sum
+    return (sums.view(np.uint64) * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(64 - FILTER_BITS)
+
+
+def _candidates(target: np.ndarray, known: np.ndarray, block: int) -> np.ndarray:
+    """Target offsets whose block has the weak sum of some base block"""
+    # A bitmap over hashed sums rules out almost every offset in one lookup;
+    # only the rest are binary searched in the sorted `known`
+    bitmap = np.zeros(1 << FILTER_BITS, dtype=bool)
+    bitmap[_buckets(known)] = True
+    found = []
+    for start in range(0, max(len(target) - block + 1, 0), CHUNK_SIZE):
+        window = target[start:start + CHUNK_SIZE + block - 1]
+        sums = _weak_sums(window, block)
+        offsets = np.flatnonzero(bitmap[_buckets(sums)])
+        sums = sums[offsets]
+        slots = np.minimum(np.searchsorted(known, sums), len(known) - 1)
+        found.append(offsets[known[slots] == sums] + start)
+    return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+
+def _match_length(base: memoryview, base_offset: int, target: memoryview, target_offset: int) -> int:
+    """Length of the common run from the two offsets, a block at a time then bytewise"""
+    limit = min(len(base) - base_offset, len(target) - target_offset)
+    length = 0
+    while length + BLOCK_SIZE <= limit and (
+        base[base_offset + length:base_offset + length + BLOCK_SIZE]
+        == target[target_offset + length:target_offset + length + BLOCK_SIZE]
+    ):
+        length += BLOCK_SIZE
+    tail = min(BLOCK_SIZE, limit - length)
+    if tail > 0:
+        a = np.frombuffer(base[base_offset + length:base_offset + length + tail], dtype=np.uint8)
+        b = np.frombuffer(target[target_offset + length:target_offset + length + tail], dtype=np.uint8)
+        mismatch = np.flatnonzero(a != b)
+        length += int(mismatch[0]) if len(mismatch) else tail
+    return length
+
+
+def diff(base: bytes, target: bytes, block: int = BLOCK_SIZE) -> Iterator[Tuple[int, int, int]]:
+    """
+    Operations rebuilding `target` from `base`: (OP_COPY, offset, length)
+    or (OP_DATA, target offset, length)
+    """
+    base_view, target_view = memoryview(base), memoryview(target)
+    base_array = np.frombuffer(base, dtype=np.uint8)
+    target_array = np.frombuffer(target, dtype=np.uint8)
+    known, offsets = _block_index(base_array, block)
+    candidates = _candidates(target_array, known, block) if len(known) else np.empty(0, dtype=np.int64)
+
+    position = literal = 0
+    i = 0
+    while i < len(candidates):
+        offset = int(candidates[i])
+        if offset < position:
+            # Inside the last match: jump to the first candidate after it
+            i = int(np.searchsorted(candidates, position))
+            continue
+        i += 1
+        key = int(_weak_sums(target_array[offset:offset + block], block)[0])
+        base_offset = offsets.get(key)
+        if base_offset is None or base_view[base_offset:base_offset + block] != target_view[offset:offset + block]:
+            continue
+        length = _match_length(base_view, base_offset, target_view, offset)
+        if offset > literal:
+            yield OP_DATA, literal, offset - literal
+        yield OP_COPY, base_offset, length
+        position = literal = offset + length
+    if len(target) > literal:
+        yield OP_DATA, literal, len(target) - literal
+
+
+def write_patch(base: bytes, target: bytes, out: BinaryIO) -> Dict[str, int]:
+    """Write the patch from `base` to `target` to `out`; byte counts per operation type"""
+    stats = {"copied": 0, "literal": 0}
+    with gzip.GzipFile(fileobj=out, mode="wb", compresslevel=9, mtime=0) as stream:
+        stream.write(HEADER.pack(
+            MAGIC,
+            hashlib.sha256(base).digest(),
+            hashlib.sha256(target).digest(),
+            len(target),
+        ))
+        pending = None  # Adjacent copies are merged
+        for op, offset, length in diff(base, target):
+            if op == OP_COPY:
+                stats["copied"] += length
+                if pending and pending[0] + pending[1] == offset:
+                    pending = (pending[0], pending[1] + length)
+                    continue
+                if pending:
+                    stream.write(COPY.pack(OP_COPY, *pending))
+                pending = (offset, length)
+                continue
+            if pending:
+                stream.write(COPY.pack(OP_COPY, *pending))
+                pending = None
+            stats["literal"] += length
+            for start in range(offset, offset + length, MAX_DATA):
+                chunk = target[start:min(start + MAX_DATA, offset + length)]
+                stream.write(DATA.pack(OP_DATA, len(chunk)))
+                stream.write(chunk)
+        if pending:
+            stream.write(COPY.pack(OP_COPY, *pending))
+        stream.write(bytes([OP_END]))
+    return stats
+
+
+def apply_patch(base: bytes, patch: BinaryIO) -> bytes:
+    """Rebuild the target file (reference implementation of the client side)"""
+    with gzip.GzipFile(fileobj=patch, mode="rb") as stream:
+        magic, base_hash, target_hash, size = HEADER.unpack(stream.read(HEADER.size))
+        if magic != MAGIC:
+            raise PatchError("Not a model patch")
+        if hashlib.sha256(base).digest() != base_hash:
+            raise PatchError("Patch is for a different base file")
+        out = bytearray()
+        while True:
+            op = stream.read(1)
+            if not op or op[0] == OP_END:
+                break
+            if op[0] == OP_COPY:
+                offset, length = struct.unpack("<QI", stream.read(12))
+                out += base[offset:offset + length]
+            elif op[0] == OP_DATA:
+                (length,) = struct.unpack("<I", stream.read(4))
+                out += stream.read(length)
+            else:
+                raise PatchError(f"Unknown operation {op[0]}")
+    if len(out) != size or hashlib.sha256(out).digest() != target_hash:
+        raise PatchError("Patched file does not match the target hash")
+    return bytes(out)
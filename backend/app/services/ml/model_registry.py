@@ -0,0 +1,229 @@
+"""
+Versioned model registry on local disk.
+
+    MODEL_REGISTRY_DIR/
+        registry.json           {"active": "v1.1", "history": ["v1.0"]}
+        v1.1/
+            manifest.json       version, files with SHA-256, model, labels, mobile
+            model.onnx          (+ external weights, e.g. model.onnx.data)
+            labels.json         class names in output order
+            model_mobile.onnx   self-contained file sent to devices; required
+                                when model.onnx has external weights
+
+Versions are immutable once added. registry.json names the version every
+worker should serve; workers poll it and hot-swap (see
+ONNXInferenceService.start). Manage it with:
+
+    python -m app.services.ml.model_registry add v1.1 model.onnx --labels labels.json
+    python -m app.services.ml.model_registry activate v1.1
+    python -m app.services.ml.model_registry rollback
+    python -m app.services.ml.model_registry list
+"""
+from app.core.config import settings
+from app.services.ml.model_distribution import external_data_files, file_sha256, locked, replace_atomically
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+import argparse
+import re
+import shutil
+import sys
+import orjson
+import logging
+
+logger = logging.getLogger(__name__)
+
+VERSION_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$")
+
+
+class RegistryError(Exception):
+    pass
+
+
+class ModelRegistry:
+    """Model versions under `directory` and the pointer to the active one"""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    @property
+    def pointer_path(self) -> Path:
+        return self.directory / "registry.json"
+
+    def version_dir(self, version: str) -> Path:
+        if not VERSION_PATTERN.match(version):
+            raise RegistryError(f"Invalid model version {version!r}")
+        return self.directory / version
+
+    def manifest(self, version: str) -> Dict:
+        try:
+            return orjson.loads((self.version_dir(version) / "manifest.json").read_bytes())
+        except FileNotFoundError:
+            raise RegistryError(f"Model version {version} is not in the registry")
+
+    def versions(self) -> List[Dict]:
+        """Manifests of every version, oldest first"""
+        if not self.directory.exists():
+            return []
+        manifests = [
+            orjson.loads(path.read_bytes())
+            for path in self.directory.glob("*/manifest.json")
+        ]
+        return sorted(manifests, key=lambda m: m["created_at"])
+
+    def _pointer(self) -> Dict:
+        try:
+            return orjson.loads(self.pointer_path.read_bytes())
+        except FileNotFoundError:
+            return {"active": None, "history": []}
+
+    def active(self) -> Optional[str]:
+        """Version workers should serve; None if nothing was ever activated"""
+        return self._pointer()["active"]
+
+    def verify(self, version: str) -> Dict:
+        """The version's manifest, after checking every file against its hash"""
+        manifest = self.manifest(version)
+        for name, sha256 in manifest["files"].items():
+            path = self.version_dir(version) / name
+            if not path.exists() or file_sha256(path) != sha256:
+                raise RegistryError(f"{version}/{name} is missing or does not match its manifest")
+        return manifest
+
+    def add(
+        self,
+        version: str,
+        model_file: str,
+        labels_file: Optional[str] = None,
+        mobile_file: Optional[str] = None,
+        extra_files: List[str] = (),
+    ) -> Dict:
+        """
+        Copy a model into the registry as `version`. Weights stored next to
+        the model as `<model>.data` are copied along; list other external
+        data files in `extra_files` (their names must stay as the model
+        references them). A model with external weights needs a
+        self-contained `mobile_file` for devices.
+        """
+        model = Path(model_file)
+        files = [model] + [Path(f) for f in extra_files]
+        if model.with_name(model.name + ".data").exists() and len(files) == 1:
+            files.append(model.with_name(model.name + ".data"))
+        labels = None
+        if labels_file:
+            labels = orjson.loads(Path(labels_file).read_bytes())
+            if not isinstance(labels, list) or not all(isinstance(label, str) for label in labels):
+                raise RegistryError("Labels file must be a JSON list of class names")
+        if mobile_file:
+            if external_data_files(Path(mobile_file)):
+                raise RegistryError("The mobile file must be self-contained (no external data)")
+            files.append(Path(mobile_file))
+        elif external_data_files(model):
+            raise RegistryError("The model keeps weights in external files: add a self-contained --mobile file for devices")
+        if len({path.name for path in files}) != len(files):
+            raise RegistryError("Model, data and mobile files need distinct names")
+
+        target = self.version_dir(version)
+        with locked(self.directory):
+            if target.exists():
+                raise RegistryError(f"Model version {version} already exists; versions are immutable")
+            staging = self.directory / f".{version}.tmp"
+            shutil.rmtree(staging, ignore_errors=True)
+            staging.mkdir()
+            try:
+                for path in files:
+                    shutil.copyfile(path, staging / path.name)
+                if labels is not None:
+                    (staging / "labels.json").write_bytes(orjson.dumps(labels))
+                manifest = {
+                    "version": version,
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    "model": model.name,
+                    "labels": "labels.json" if labels is not None else None,
+                    "mobile": Path(mobile_file).name if mobile_file else None,
+                    "files": {path.name: file_sha256(path) for path in sorted(staging.iterdir())},
+                }
+                (staging / "manifest.json").write_bytes(orjson.dumps(manifest, option=orjson.OPT_INDENT_2))
+                staging.rename(target)
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+        logger.info(f"Added model version {version}")
+        return manifest
+
+    def _set_pointer(self, pointer: Dict):
+        replace_atomically(self.pointer_path, lambda f: f.write(orjson.dumps(pointer, option=orjson.OPT_INDENT_2)))
+
+    def activate(self, version: str) -> Dict:
+        """Make `version` the one served; the current one can be rolled back to"""
+        self.verify(version)
+        with locked(self.directory):
+            pointer = self._pointer()
+            if pointer["active"] != version:
+                if pointer["active"] is not None:
+                    pointer["history"].append(pointer["active"])
+                pointer["active"] = version
+                pointer["activated_at"] = datetime.now(timezone.utc).isoformat()
+                self._set_pointer(pointer)
+        return pointer
+
+    def rollback(self) -> Dict:
+        """Serve the previously active version again"""
+        with locked(self.directory):
+            pointer = self._pointer()
+            if not pointer["history"]:
+                raise RegistryError("No earlier version to roll back to")
+            pointer["active"] = pointer["history"].pop()
+            pointer["activated_at"] = datetime.now(timezone.utc).isoformat()
+            self._set_pointer(pointer)
+        return pointer
+
+
+model_registry = ModelRegistry(settings.MODEL_REGISTRY_DIR)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="Copy a model into the registry as a new version")
+    add.add_argument("version")
+    add.add_argument("model", help="ONNX model file")
+    add.add_argument("--labels", help="JSON list of class names in output order (default: built-in PlantVillage classes)")
+    add.add_argument("--mobile", help="Self-contained model file for devices (default: the model file; required if it has external data)")
+    add.add_argument("--data", action="append", default=[], help="External data file (repeatable)")
+    add.add_argument("--activate", action="store_true", help="Activate it once added")
+    activate = commands.add_parser("activate", help="Serve a version (checked by loading it first)")
+    activate.add_argument("version")
+    commands.add_parser("rollback", help="Serve the previously active version again")
+    commands.add_parser("list", help="Show versions and the active one")
+    args = parser.parse_args()
+
+    # Imported here: it imports this module
+    from app.services.ml.inference import inference_service
+
+    try:
+        if args.command == "add":
+            model_registry.add(args.version, args.model, args.labels, args.mobile, args.data)
+            print(f"Added {args.version}")
+        if args.command == "activate" or getattr(args, "activate", False):
+            # Refuse a version that will not load before any worker tries it
+            inference_service.load_version(args.version)
+            model_registry.activate(args.version)
+            print(f"Activated {args.version}; workers switch within {settings.MODEL_REGISTRY_POLL_SECONDS:g}s")
+        elif args.command == "rollback":
+            pointer = model_registry.rollback()
+            print(f"Rolled back to {pointer['active']}")
+        elif args.command == "list":
+            active = model_registry.active()
+            for manifest in model_registry.versions():
+                marker = "*" if manifest["version"] == active else " "
+                print(f"{marker} {manifest['version']:<20}{manifest['created_at']}  {manifest['model']}")
+    except Exception as e:
+        # RegistryError, or the model failing to load
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
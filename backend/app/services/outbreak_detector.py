@@ -0,0 +1,405 @@
+from app.core.config import settings
+from app.models.disease_alert import DiseaseAlert
+from datetime import date, timedelta
+from sqlalchemy import Integer, String, and_, cast, column, func, literal_column, select, values
+from sqlalchemy.dialects.postgresql import ARRAY, BIGINT, UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+import hashlib
+import math
+import uuid
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+# A cell's neighbourhood: itself and the 8 cells around it (~30 km square)
+NEIGHBOURHOOD = [(dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1)]
+
+# Log-likelihood ratio thresholds, highest first, and the severity they raise to
+SCORE_SEVERITY = ((10.0, 5), (5.0, 4), (2.0, 3))
+MIN_EXPECTED = 1.0  # Floor for the expected count where there is no history yet
+INITIAL_SLOTS = 1024
+# Cells per side of an advisory lock block; a cell's 5 x 5 reach spans at most 4
+LOCK_BLOCK_CELLS = 5
+QUERY_BATCH_SIZE = 1000
+
+SlotKey = Tuple[str, Optional[uuid.UUID], int, int]  # crop, disease, cell row, cell col
+
+
+class OutbreakEscalation(NamedTuple):
+    grid_location: str
+    crop_name: str
+    disease_id: Optional[uuid.UUID]
+    alert_date: date
+    severity_level: int
+    score: float
+    cases: int  # Detections in the neighbourhood over the window
+
+
+def poisson_score(cases: int, expected: float) -> float:
+    """Poisson log-likelihood ratio of `cases` against `expected` (0 unless elevated)"""
+    if cases <= expected:
+        return 0.0
+    return cases * math.log(cases / expected) - (cases - expected)
+
+
+def severity_for_score(cases: int, score: float) -> int:
+    """Escalated severity for a neighbourhood, 0 if it is not an outbreak"""
+    if cases < settings.OUTBREAK_MIN_CASES:
+        return 0
+    for threshold, severity in SCORE_SEVERITY:
+        if score >= threshold:
+            return severity
+    return 0
+
+
+class OutbreakDetector:
+    """
+    Streaming spatio-temporal outbreak detection.
+
+    Daily detection totals per (crop, disease, grid cell) are kept in ring
+    buffers covering OUTBREAK_BASELINE_DAYS (one row of a 2-D array per
+    cell). When a cell's total changes, each of the 9 neighbourhoods that
+    contain it is re-scored: detections over the last OUTBREAK_WINDOW_DAYS
+    in the 3 x 3 cells around a centre against the rate the same cells had
+    over the rest of the baseline (Poisson log-likelihood ratio); scoring
+    starts once a full window of baseline history has been seen. Cost is
+    O(neighbourhood x baseline days) per update, independent of history.
+
+    Input is the day's running total per alert row (as returned by the
+    alert upsert), so feeding the same totals again is harmless and
+    replaying history day by day ends in the same scores. `first_day` is
+    where the history starts, if earlier than the first total fed.
+    """
+
+    def __init__(
+        self,
+        window_days: int = None,
+        baseline_days: int = None,
+        first_day: Optional[date] = None,
+        slots: int = INITIAL_SLOTS,
+    ):
+        self.window_days = window_days or settings.OUTBREAK_WINDOW_DAYS
+        self.baseline_days = baseline_days or settings.OUTBREAK_BASELINE_DAYS
+        if self.baseline_days <= self.window_days:
+            raise ValueError("OUTBREAK_BASELINE_DAYS must be longer than OUTBREAK_WINDOW_DAYS")
+
+        self._slots: Dict[SlotKey, int] = {}
+        self._keys: List[Optional[SlotKey]] = []
+        self._grid_locations: List[Optional[str]] = []
+        self._counts = np.zeros((max(slots, 1), self.baseline_days), dtype=np.int32)
+        self._last_day = np.zeros(max(slots, 1), dtype=np.int64)
+        self._free: List[int] = []
+        self._first_day: Optional[int] = first_day.toordinal() if first_day else None
+        self._latest_day = 0
+
+    @property
+    def cell_count(self) -> int:
+        return len(self._slots)
+
+    def _allocate(self, key: SlotKey, grid_location: str) -> int:
+        if not self._free and len(self._keys) == len(self._counts):
+            self._reclaim()
+        if self._free:
+            slot = self._free.pop()
+            self._keys[slot] = key
+            self._grid_locations[slot] = grid_location
+        else:
+            slot = len(self._keys)
+            if slot == len(self._counts):
+                self._counts = np.concatenate([self._counts, np.zeros_like(self._counts)])
+                self._last_day = np.concatenate([self._last_day, np.zeros_like(self._last_day)])
+            self._keys.append(key)
+            self._grid_locations.append(grid_location)
+        self._counts[slot] = 0
+        self._last_day[slot] = 0
+        self._slots[key] = slot
+        return slot
+
+    def _reclaim(self):
+        """Free the slots of cells with no detections in the whole baseline"""
+        cutoff = self._latest_day - self.baseline_days
+        for slot, key in enumerate(self._keys):
+            if key is not None and self._last_day[slot] <= cutoff:
+                del self._slots[key]
+                self._keys[slot] = None
+                self._grid_locations[slot] = None
+                self._free.append(slot)
+
+    def _advance(self, slot: int, day: int):
+        """Move a cell's ring buffer forward to `day`, zeroing the days skipped"""
+        last = int(self._last_day[slot])
+        if day <= last:
+            return
+        if day - last >= self.baseline_days:
+            self._counts[slot] = 0
+        else:
+            for skipped in range(last + 1, day + 1):
+                self._counts[slot, skipped % self.baseline_days] = 0
+        self._last_day[slot] = day
+
+    def _window_sums(self, slots: List[int], day: int) -> Tuple[int, int]:
+        """(detections over the window, detections over the rest of the baseline) ending at `day`"""
+        days = day - np.arange(self.baseline_days)
+        last = self._last_day[slots][:, None]
+        # A ring position only holds `days[k]` if that day is within the cell's buffer
+        valid = (days[None, :] <= last) & (days[None, :] > last - self.baseline_days)
+        counts = np.where(valid, self._counts[slots][:, days % self.baseline_days], 0)
+        recent = int(counts[:, :self.window_days].sum())
+        return recent, int(counts[:, self.window_days:].sum())
+
+    def record(
+        self,
+        crop_name: str,
+        disease_id: Optional[uuid.UUID],
+        grid_location: str,
+        cell_row: int,
+        cell_col: int,
+        alert_date: date,
+        total: int,
+    ) -> bool:
+        """Store a cell's detection total for a day without scoring; False if too old to keep"""
+        day = alert_date.toordinal()
+        self._latest_day = max(self._latest_day, day)
+        if self._first_day is None or day < self._first_day:
+            self._first_day = day
+        key = (crop_name, disease_id, cell_row, cell_col)
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._allocate(key, grid_location)
+        if day <= int(self._last_day[slot]) - self.baseline_days:
+            return False
+        self._advance(slot, day)
+        self._counts[slot, day % self.baseline_days] = total
+        return True
+
+    def observe(
+        self,
+        crop_name: str,
+        disease_id: Optional[uuid.UUID],
+        grid_location: str,
+        cell_row: int,
+        cell_col: int,
+        alert_date: date,
+        total: int,
+    ) -> List[OutbreakEscalation]:
+        """
+        Record a cell's detection total for a day and re-score every
+        neighbourhood containing it; returns the neighbourhoods (by centre
+        cell) that are outbreaks.
+        """
+        day = alert_date.toordinal()
+        if not self.record(crop_name, disease_id, grid_location, cell_row, cell_col, alert_date, total):
+            return []
+
+        escalations = []
+        for dr, dc in NEIGHBOURHOOD:
+            centre = self._slots.get((crop_name, disease_id, cell_row + dr, cell_col + dc))
+            if centre is None:
+                continue
+            escalation = self._score(centre, crop_name, disease_id, cell_row + dr, cell_col + dc, day)
+            if escalation is not None:
+                escalations.append(escalation)
+        return escalations
+
+    def _score(
+        self,
+        centre: int,
+        crop_name: str,
+        disease_id: Optional[uuid.UUID],
+        row: int,
+        col: int,
+        day: int,
+    ) -> Optional[OutbreakEscalation]:
+        # Only centres with detections that day have an alert row to raise
+        last = int(self._last_day[centre])
+        if not (last - self.baseline_days < day <= last) or self._counts[centre, day % self.baseline_days] == 0:
+            return None
+
+        # Baseline rate only over days the detector has data for; with less
+        # than a window of history there is nothing to compare against
+        history = min(day - self.window_days - self._first_day + 1, self.baseline_days - self.window_days)
+        if history < self.window_days:
+            return None
+
+        slots = [
+            slot for slot in (
+                self._slots.get((crop_name, disease_id, row + dr, col + dc)) for dr, dc in NEIGHBOURHOOD
+            )
+            if slot is not None
+        ]
+        cases, baseline = self._window_sums(slots, day)
+        expected = max(baseline * self.window_days / history, MIN_EXPECTED)
+        score = poisson_score(cases, expected)
+        severity = severity_for_score(cases, score)
+        if not severity:
+            return None
+        return OutbreakEscalation(
+            self._grid_locations[centre],
+            crop_name,
+            disease_id,
+            date.fromordinal(day),
+            severity,
+            round(score, 3),
+            cases,
+        )
+
+    def observe_rows(self, rows: Iterable) -> List[OutbreakEscalation]:
+        """
+        observe() for updated alert rows (alert_service.ALERT_EVENT_COLUMNS
+        plus disease_id); escalations are merged per alert, keeping the
+        highest score.
+        """
+        merged: Dict[tuple, OutbreakEscalation] = {}
+        for row in rows:
+            for escalation in self.observe(
+                row.crop_name,
+                row.disease_id,
+                row.grid_location,
+                row.cell_row,
+                row.cell_col,
+                row.alert_date,
+                row.detection_count,
+            ):
+                key = escalation[:4]
+                if key not in merged or escalation.score > merged[key].score:
+                    merged[key] = escalation
+        return list(merged.values())
+
+
+def replay(rows: Iterable) -> Dict[tuple, OutbreakEscalation]:
+    """
+    Run a fresh detector over historical daily totals and return the final
+    escalation per (grid_location, crop_name, disease_id, alert_date).
+
+    rows need crop_name, disease_id, grid_location, cell_row, cell_col,
+    alert_date and detection_count (the day's total), in alert_date order.
+    """
+    detector = OutbreakDetector()
+    final: Dict[tuple, OutbreakEscalation] = {}
+    for row in rows:
+        for escalation in detector.observe_rows([row]):
+            key = escalation[:4]
+            if key not in final or escalation.score > final[key].score:
+                final[key] = escalation
+    return final
+
+
+def _lock_key(crop_name: str, disease_id: Optional[uuid.UUID], block_row: int, block_col: int) -> int:
+    # Stable across processes, unlike hash()
+    digest = hashlib.blake2b(f"{crop_name}|{disease_id}|{block_row}|{block_col}".encode(), digest_size=8)
+    return int.from_bytes(digest.digest(), "big", signed=True)
+
+
+class OutbreakService:
+    """
+    Outbreak detection for alert writes, scored from disease_alerts in the
+    writing transaction so every worker process sees the same counts.
+
+    Scoring a cell reads the cells up to 2 away (the neighbourhoods of its
+    neighbours). Writers first take transaction advisory locks on the
+    blocks covering that reach, so writes to nearby cells are serialized
+    and the last one scores with all of their counts: the stored scores
+    are those a replay of the final daily totals gives.
+    """
+
+    def __init__(self):
+        if settings.OUTBREAK_DETECTION_ENABLED and settings.OUTBREAK_BASELINE_DAYS > settings.ALERT_ACTIVE_DAYS:
+            # History is read through the active-alert cell index
+            raise ValueError("OUTBREAK_BASELINE_DAYS must not exceed ALERT_ACTIVE_DAYS")
+
+    @staticmethod
+    def lock_keys(cells: Iterable[SlotKey]) -> List[int]:
+        """Sorted advisory lock keys for (crop, disease, cell row, cell col) writes"""
+        keys = set()
+        for crop_name, disease_id, row, col in cells:
+            for block_row in range((row - 2) // LOCK_BLOCK_CELLS, (row + 2) // LOCK_BLOCK_CELLS + 1):
+                for block_col in range((col - 2) // LOCK_BLOCK_CELLS, (col + 2) // LOCK_BLOCK_CELLS + 1):
+                    keys.add(_lock_key(crop_name, disease_id, block_row, block_col))
+        return sorted(keys)
+
+    async def lock(self, db: AsyncSession, cells: Iterable[SlotKey]):
+        """
+        Lock the neighbourhoods of cells about to be written until the
+        transaction ends. Call before the alert upsert, once per
+        transaction: all locks are taken in one sorted pass so writers
+        cannot deadlock on them.
+        """
+        keys = self.lock_keys(cells)
+        if keys:
+            await db.execute(
+                select(func.count(func.pg_advisory_xact_lock(literal_column("key"))))
+                .select_from(func.unnest(cast(keys, ARRAY(BIGINT))).alias("key"))
+            )
+
+    async def detect(self, db: AsyncSession, rows: Iterable) -> List[OutbreakEscalation]:
+        """
+        Score the neighbourhoods around updated alert rows (alert_service.
+        ALERT_EVENT_COLUMNS) against the stored daily totals; escalations
+        are merged per alert, keeping the highest score.
+        """
+        by_day: Dict[date, list] = {}
+        for row in rows:
+            if row.cell_row is not None:
+                by_day.setdefault(row.alert_date, []).append(row)
+        if not by_day:
+            return []
+
+        first_day = await db.scalar(select(func.min(DiseaseAlert.alert_date)))
+        merged: Dict[tuple, OutbreakEscalation] = {}
+        for day, day_rows in by_day.items():
+            history = await self._history(db, day, day_rows)
+            detector = OutbreakDetector(first_day=first_day, slots=len(history))
+            for total in sorted(history, key=lambda r: r.alert_date):
+                detector.record(*total)
+            for escalation in detector.observe_rows(day_rows):
+                key = escalation[:4]
+                if key not in merged or escalation.score > merged[key].score:
+                    merged[key] = escalation
+        return list(merged.values())
+
+    @staticmethod
+    def history_query(day: date, cells: List[SlotKey]):
+        """Daily totals over the baseline ending at `day`, in cells up to 2 away from `cells`"""
+        centres = values(
+            column("crop_name", String),
+            column("disease_id", UUID(as_uuid=True)),
+            column("cell_row", Integer),
+            column("cell_col", Integer),
+            name="centres",
+        ).data(cells)
+        return (
+            select(
+                DiseaseAlert.crop_name,
+                DiseaseAlert.disease_id,
+                DiseaseAlert.grid_location,
+                DiseaseAlert.cell_row,
+                DiseaseAlert.cell_col,
+                DiseaseAlert.alert_date,
+                DiseaseAlert.detection_count,
+            )
+            .distinct()
+            .join(centres, and_(
+                DiseaseAlert.crop_name == centres.c.crop_name,
+                DiseaseAlert.disease_id.is_not_distinct_from(cast(centres.c.disease_id, UUID(as_uuid=True))),
+                DiseaseAlert.cell_row.between(centres.c.cell_row - 2, centres.c.cell_row + 2),
+                DiseaseAlert.cell_col.between(centres.c.cell_col - 2, centres.c.cell_col + 2),
+            ))
+            .where(
+                DiseaseAlert.is_active == True,
+                DiseaseAlert.alert_date.between(day - timedelta(days=settings.OUTBREAK_BASELINE_DAYS - 1), day),
+            )
+        )
+
+    @staticmethod
+    async def _history(db: AsyncSession, day: date, rows: List) -> List:
+        cells = sorted({(r.crop_name, r.disease_id, r.cell_row, r.cell_col) for r in rows}, key=str)
+        history = set()
+        for offset in range(0, len(cells), QUERY_BATCH_SIZE):
+            result = await db.execute(OutbreakService.history_query(day, cells[offset:offset + QUERY_BATCH_SIZE]))
+            history.update(result.all())
+        return list(history)
+
+
+outbreak_service = OutbreakService()
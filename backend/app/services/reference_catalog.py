@@ -0,0 +1,253 @@
+from app.core.config import settings
+from app.db.base import AsyncSessionLocal
+from app.models.disease import Disease
+from app.models.treatment import CropStage, Treatment
+from collections import defaultdict
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import orjson
+import re
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Changes whenever any disease or treatment row does
+FINGERPRINT_QUERY = text("""
+    SELECT
+        (SELECT md5(coalesce(string_agg(d::text, '|' ORDER BY d.id), '')) FROM diseases AS d)
+        || (SELECT md5(coalesce(string_agg(t::text, '|' ORDER BY t.id), '')) FROM treatments AS t)
+""")
+
+DEFAULT_LANGUAGE = "en"
+
+
+def crop_key(crop_name: str) -> str:
+    """'Corn (maize)', 'Corn_(maize)' and 'corn' all give 'corn'"""
+    words = re.findall(r"[a-z0-9]+", crop_name.lower())
+    return words[0] if words else ""
+
+
+def name_key(name: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", name.lower()))
+
+
+def treatment_item(treatment: Treatment, language: str) -> Dict:
+    """TreatmentResponse fields, instructions only in `language` (or English)"""
+    instructions = treatment.instructions or {}
+    if language not in instructions:
+        language = DEFAULT_LANGUAGE if DEFAULT_LANGUAGE in instructions else next(iter(instructions), language)
+    return {
+        "id": str(treatment.id),
+        "type": treatment.type.value if treatment.type else None,
+        "name": treatment.name,
+        "dosage": treatment.dosage,
+        "instructions": {language: instructions[language]} if language in instructions else {},
+        "effectiveness_score": treatment.effectiveness_score,
+        "precautions": treatment.precautions,
+        "cost_estimate": treatment.cost_estimate,
+        "region": treatment.region,
+        "crop_stage": treatment.crop_stage.value if treatment.crop_stage else None,
+    }
+
+
+class CatalogSnapshot:
+    """Immutable lookup tables built from one load of the reference tables"""
+
+    def __init__(self, diseases: List[Disease], treatments: List[Treatment]):
+        self.diseases: Dict[uuid.UUID, Disease] = {d.id: d for d in diseases}
+        self.by_class_index: Dict[int, Disease] = {d.class_index: d for d in diseases}
+        self.by_name: Dict[Tuple[str, str], Disease] = {
+            (crop_key(d.crop_name), name_key(d.name)): d for d in diseases
+        }
+        # Longest names first, for model labels that extend the catalog name
+        self.by_crop: Dict[str, List[Disease]] = defaultdict(list)
+        for d in sorted(diseases, key=lambda d: -len(d.name)):
+            self.by_crop[crop_key(d.crop_name)].append(d)
+
+        self.treatments: Dict[uuid.UUID, List[Treatment]] = defaultdict(list)
+        for t in sorted(treatments, key=lambda t: -(t.effectiveness_score or 0)):
+            self.treatments[t.disease_id].append(t)
+        # Requests for anything else fall back to global / English entries,
+        # which also bounds the number of serialized variants kept below
+        self.regions = {t.region for t in treatments if t.region}
+        self.languages = {lang for t in treatments for lang in (t.instructions or {})}
+
+        self.resolved: Dict[tuple, Optional[Disease]] = {}
+        # (disease id, region, crop stage, language) -> items / JSON bytes
+        self.treatment_items: Dict[tuple, List[Dict]] = {}
+        self.treatment_json: Dict[tuple, bytes] = {}
+
+
+class ReferenceCatalog:
+    """
+    In-memory copy of the diseases and treatments tables.
+
+    Both are small and change rarely (seed scripts, admin edits), so every
+    worker keeps them in dicts indexed by id, model class index and
+    (crop, disease name) and answers lookups without touching the database.
+    A background task polls a fingerprint of both tables every
+    REFERENCE_CATALOG_REFRESH_SECONDS and reloads when it changes; the new
+    snapshot replaces the old one in a single assignment.
+    """
+
+    def __init__(self, interval: float = None):
+        self.interval = settings.REFERENCE_CATALOG_REFRESH_SECONDS if interval is None else interval
+        self._snapshot = CatalogSnapshot([], [])
+        self._fingerprint: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._fingerprint is not None
+
+    async def load(self, db: AsyncSession, fingerprint: str = None):
+        diseases = (await db.execute(select(Disease))).scalars().all()
+        treatments = (await db.execute(select(Treatment))).scalars().all()
+        self._snapshot = CatalogSnapshot(diseases, treatments)
+        self._fingerprint = fingerprint or (await db.execute(FINGERPRINT_QUERY)).scalar()
+        logger.info(f"Reference catalog loaded: {len(diseases)} diseases, {len(treatments)} treatments")
+
+    async def refresh(self) -> bool:
+        """Reload if the tables changed since the last load; True if reloaded"""
+        try:
+            async with AsyncSessionLocal() as db:
+                fingerprint = (await db.execute(FINGERPRINT_QUERY)).scalar()
+                if fingerprint == self._fingerprint:
+                    return False
+                await self.load(db, fingerprint)
+                return True
+        except Exception as e:
+            # Keep serving the previous snapshot
+            logger.warning(f"Reference catalog refresh failed: {str(e)}")
+            return False
+
+    def disease(self, disease_id: Optional[uuid.UUID]) -> Optional[Disease]:
+        return self._snapshot.diseases.get(disease_id) if disease_id else None
+
+    def disease_name(self, disease_id: Optional[uuid.UUID], default: str = "Unknown") -> str:
+        disease = self.disease(disease_id)
+        return disease.name if disease else default
+
+    def disease_by_class_index(self, class_index: int) -> Optional[Disease]:
+        return self._snapshot.by_class_index.get(class_index)
+
+    def resolve_disease(
+        self,
+        crop_name: str,
+        disease_name: str,
+        class_index: Optional[int] = None,
+    ) -> Optional[Disease]:
+        """
+        Catalog entry for a model prediction: by (crop, disease name), then
+        by a catalog name the model label starts with, then by class index
+        if that entry is for the same crop. Results are memoized per label.
+        """
+        snapshot = self._snapshot
+        key = (crop_name, disease_name, class_index)
+        if key in snapshot.resolved:
+            return snapshot.resolved[key]
+
+        crop, name = crop_key(crop_name), name_key(disease_name)
+        disease = snapshot.by_name.get((crop, name))
+        if disease is None:
+            disease = next(
+                (d for d in snapshot.by_crop.get(crop, ()) if name.startswith(name_key(d.name) + " ")),
+                None,
+            )
+        if disease is None and class_index is not None:
+            candidate = snapshot.by_class_index.get(class_index)
+            if candidate is not None and crop_key(candidate.crop_name) == crop:
+                disease = candidate
+
+        snapshot.resolved[key] = disease
+        return disease
+
+    def treatments(self, disease_id: Optional[uuid.UUID]) -> List[Treatment]:
+        """Treatments for a disease, most effective first"""
+        return self._snapshot.treatments.get(disease_id, []) if disease_id else []
+
+    def _treatment_key(
+        self,
+        snapshot: CatalogSnapshot,
+        disease_id: uuid.UUID,
+        language: str,
+        region: Optional[str],
+        crop_stage: Optional[CropStage],
+    ) -> tuple:
+        return (
+            disease_id,
+            region if region in snapshot.regions else None,
+            crop_stage if crop_stage not in (None, CropStage.ANY) else None,
+            language if language in snapshot.languages else DEFAULT_LANGUAGE,
+        )
+
+    def treatment_items(
+        self,
+        disease_id: Optional[uuid.UUID],
+        language: str = None,
+        region: Optional[str] = None,
+        crop_stage: Optional[CropStage] = None,
+    ) -> List[Dict]:
+        """
+        Treatments for a disease as response items (TreatmentResponse
+        fields), most effective first: global and `region` entries for any
+        stage or `crop_stage`, with instructions in `language` (English if
+        missing). Built once per snapshot and key.
+        """
+        if not disease_id:
+            return []
+        snapshot = self._snapshot
+        key = self._treatment_key(snapshot, disease_id, language or DEFAULT_LANGUAGE, region, crop_stage)
+        items = snapshot.treatment_items.get(key)
+        if items is None:
+            _, region, crop_stage, language = key
+            items = [
+                treatment_item(t, language)
+                for t in snapshot.treatments.get(disease_id, [])
+                if t.region in (None, region)
+                and (crop_stage is None or t.crop_stage in (None, CropStage.ANY, crop_stage))
+            ]
+            snapshot.treatment_items[key] = items
+        return items
+
+    def treatments_json(
+        self,
+        disease_id: Optional[uuid.UUID],
+        language: str = None,
+        region: Optional[str] = None,
+        crop_stage: Optional[CropStage] = None,
+    ) -> bytes:
+        """treatment_items() serialized to a JSON array, cached alongside"""
+        if not disease_id:
+            return b"[]"
+        snapshot = self._snapshot
+        key = self._treatment_key(snapshot, disease_id, language or DEFAULT_LANGUAGE, region, crop_stage)
+        body = snapshot.treatment_json.get(key)
+        if body is None:
+            body = orjson.dumps(self.treatment_items(disease_id, language, region, crop_stage))
+            snapshot.treatment_json[key] = body
+        return body
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.refresh()
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+reference_catalog = ReferenceCatalog()
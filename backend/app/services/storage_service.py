@@ -1,28 +1,65 @@
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from app.core.config import settings
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import asyncio
+import hashlib
+import hmac
+import re
+import time
 import uuid
 from pathlib import Path
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Object keys handed out for direct uploads: "uploads/<uuid>.<ext>". Stored
+# diagnoses and heatmaps live under other prefixes and are never accepted back
+UPLOAD_FOLDER = "uploads"
+OBJECT_KEY_PATTERN = re.compile(rf"^{UPLOAD_FOLDER}/[0-9a-f\-]{{36}}\.(jpg|jpeg|png)$")
+
 
 class StorageService:
     """AWS S3 storage service for images"""
 
     def __init__(self):
+        self.backend = settings.STORAGE_BACKEND
+        # A single client is shared by every request; its connection pool is
+        # sized so concurrent fetches reuse sockets instead of reconnecting.
         self.s3_client = boto3.client(
             's3',
             aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
             aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            region_name=settings.AWS_REGION
+            region_name=settings.AWS_REGION,
+            config=Config(
+                max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+                retries={"max_attempts": 3, "mode": "standard"},
+            ),
         )
         self.bucket_name = settings.S3_BUCKET_NAME
+        self.local_dir = Path(settings.LOCAL_STORAGE_DIR)
+
+    @staticmethod
+    def new_object_key(file_extension: str = "jpg", folder: str = "diagnoses") -> str:
+        """Generate a unique object key"""
+        return f"{folder}/{uuid.uuid4()}.{file_extension.lower()}"
+
+    @staticmethod
+    def is_valid_object_key(key: str) -> bool:
+        """Reject keys we did not issue for direct upload (path traversal, other prefixes)"""
+        return bool(OBJECT_KEY_PATTERN.match(key))
+
+    def object_url(self, key: str) -> str:
+        """Public URL for a stored object"""
+        if self.backend == "local":
+            return f"{settings.PUBLIC_BASE_URL}/uploads/{key}"
+        return f"https://{self.bucket_name}.s3.{settings.AWS_REGION}.amazonaws.com/{key}"
 
     async def upload_image(
-        self, 
-        file_bytes: bytes, 
+        self,
+        file_bytes: bytes,
         file_extension: str = "jpg",
         folder: str = "diagnoses"
     ) -> str:
@@ -31,7 +68,11 @@ class StorageService:
         """
         try:
             # Generate unique filename
-            filename = f"{folder}/{uuid.uuid4()}.{file_extension}"
+            filename = self.new_object_key(file_extension, folder)
+
+            if self.backend == "local":
+                await asyncio.to_thread(self._write_local_object, filename, file_bytes)
+                return self.object_url(filename)
 
             # Upload to S3 (without ACL - bucket policy handles permissions)
             self.s3_client.put_object(
@@ -43,35 +84,148 @@ class StorageService:
             )
 
             # Return public URL
-            url = f"https://{self.bucket_name}.s3.{settings.AWS_REGION}.amazonaws.com/{filename}"
+            url = self.object_url(filename)
             logger.info(f"Image uploaded to S3: {url}")
             return url
 
         except ClientError as e:
             error_code = e.response.get('Error', {}).get('Code', 'Unknown')
             error_message = e.response.get('Error', {}).get('Message', str(e))
-            
+
             if error_code == 'NoSuchBucket':
                 logger.error(f'S3 bucket "{self.bucket_name}" does not exist')
             elif error_code == 'AccessDenied':
                 logger.error(f'S3 access denied. Check bucket policy and IAM permissions')
             elif error_code == 'AccessControlListNotSupported':
                 logger.error(f'Bucket does not support ACLs. Using bucket-level permissions.')
-            
+
             logger.error(f'S3 upload error [{error_code}]: {error_message}')
             raise
 
+    async def store_object(self, key: str, file_bytes: bytes, content_type: str):
+        """Store bytes under a key from new_object_key (uploads queued for diagnosis)"""
+        if self.backend == "local":
+            await asyncio.to_thread(self._write_local_object, key, file_bytes)
+            return
+        await asyncio.to_thread(
+            self.s3_client.put_object,
+            Bucket=self.bucket_name,
+            Key=key,
+            Body=file_bytes,
+            ContentType=content_type,
+        )
+
+    def create_presigned_upload(
+        self,
+        content_type: str,
+        file_extension: str = "jpg",
+        folder: str = UPLOAD_FOLDER,
+    ) -> dict:
+        """
+        Issue a short-lived upload target so the client can send the image
+        straight to storage instead of streaming it through the API.
+
+        S3 uses a presigned POST (size-limited by policy); the local backend
+        returns an HMAC-signed PUT URL on this API as a development stand-in.
+        """
+        key = self.new_object_key(file_extension, folder)
+        expires_in = settings.PRESIGNED_UPLOAD_EXPIRE_SECONDS
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=expires_in)
+        max_bytes = settings.MAX_FILE_SIZE_MB * 1024 * 1024
+
+        if self.backend == "local":
+            expires = int(time.time()) + expires_in
+            signature = self._sign_local_upload(key, expires)
+            return {
+                "object_key": key,
+                "upload_url": (
+                    f"{settings.PUBLIC_BASE_URL}{settings.API_V1_PREFIX}/diagnosis/direct-upload/{key}"
+                    f"?expires={expires}&signature={signature}"
+                ),
+                "method": "PUT",
+                "fields": {},
+                "headers": {"Content-Type": content_type},
+                "max_bytes": max_bytes,
+                "expires_at": expires_at,
+            }
+
+        presigned = self.s3_client.generate_presigned_post(
+            Bucket=self.bucket_name,
+            Key=key,
+            Fields={"Content-Type": content_type},
+            Conditions=[
+                {"Content-Type": content_type},
+                ["content-length-range", 1, max_bytes],
+            ],
+            ExpiresIn=expires_in,
+        )
+        return {
+            "object_key": key,
+            "upload_url": presigned["url"],
+            "method": "POST",
+            "fields": presigned["fields"],
+            "headers": {},
+            "max_bytes": max_bytes,
+            "expires_at": expires_at,
+        }
+
+    def _sign_local_upload(self, key: str, expires: int) -> str:
+        message = f"{key}:{expires}".encode()
+        return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+    def verify_local_upload(self, key: str, expires: int, signature: str) -> bool:
+        """Check a signed local upload URL"""
+        if expires < time.time() or not self.is_valid_object_key(key):
+            return False
+        return hmac.compare_digest(self._sign_local_upload(key, expires), signature)
+
+    def _write_local_object(self, key: str, file_bytes: bytes):
+        path = self.local_dir / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(file_bytes)
+
+    async def save_local_object(self, key: str, file_bytes: bytes):
+        """Store bytes received by the local direct-upload endpoint"""
+        await asyncio.to_thread(self._write_local_object, key, file_bytes)
+
+    async def download_object(self, key: str, max_bytes: Optional[int] = None) -> bytes:
+        """
+        Fetch an uploaded object through the pooled client.
+        Raises FileNotFoundError if missing, ValueError if over max_bytes.
+        """
+        if self.backend == "local":
+            path = self.local_dir / key
+            if not path.is_file():
+                raise FileNotFoundError(key)
+            if max_bytes and path.stat().st_size > max_bytes:
+                raise ValueError(f"Object {key} exceeds {max_bytes} bytes")
+            return await asyncio.to_thread(path.read_bytes)
+
+        def _get() -> bytes:
+            try:
+                response = self.s3_client.get_object(Bucket=self.bucket_name, Key=key)
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') in ("NoSuchKey", "404"):
+                    raise FileNotFoundError(key)
+                raise
+            if max_bytes and response["ContentLength"] > max_bytes:
+                response["Body"].close()
+                raise ValueError(f"Object {key} exceeds {max_bytes} bytes")
+            return response["Body"].read()
+
+        return await asyncio.to_thread(_get)
+
     async def delete_image(self, image_url: str) -> bool:
         """Delete image from S3"""
         try:
             # Extract key from URL
             key = image_url.split(f"{self.bucket_name}.s3.{settings.AWS_REGION}.amazonaws.com/")[1]
-            
+
             self.s3_client.delete_object(
                 Bucket=self.bucket_name,
                 Key=key
             )
-            
+
             logger.info(f"Image deleted from S3: {key}")
             return True
 
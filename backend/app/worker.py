@@ -0,0 +1,51 @@
+"""
+Standalone diagnosis job worker.
+
+    DIAGNOSIS_JOB_BACKEND=redis python -m app.worker
+
+Runs DIAGNOSIS_JOB_WORKERS jobs at a time from the Redis queue that API
+processes fill for `Prefer: respond-async` uploads, so inference capacity
+scales separately from the API (run the API with DIAGNOSIS_JOB_WORKERS=0
+to leave all jobs to these processes).
+"""
+from app.api.v1.endpoints.diagnosis import run_diagnosis_job
+from app.services.alert_aggregator import alert_aggregator
+from app.services.diagnosis_jobs import diagnosis_jobs
+from app.services.reference_catalog import reference_catalog
+from app.services.ml.inference import inference_service
+from app.core.cache import close_redis
+import asyncio
+import signal
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    if diagnosis_jobs.backend != "redis" or diagnosis_jobs.workers <= 0:
+        raise SystemExit("Set DIAGNOSIS_JOB_BACKEND=redis and DIAGNOSIS_JOB_WORKERS > 0 to run a worker")
+
+    inference_service.load()
+    inference_service.start()
+    await reference_catalog.refresh()
+    reference_catalog.start()
+    alert_aggregator.start()
+    diagnosis_jobs.start(run_diagnosis_job)
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+    await stopping.wait()
+
+    logger.info("Diagnosis worker stopping")
+    await diagnosis_jobs.stop()
+    await alert_aggregator.stop()
+    await reference_catalog.stop()
+    await inference_service.stop()
+    await close_redis()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
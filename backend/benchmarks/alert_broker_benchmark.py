@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Alert push broker scale check
+
+Registers tens of thousands of idle subscriptions spread over a region (as
+open /alerts/stream connections would), then reports memory per
+subscription and how long publishing one alert change takes, i.e. finding
+and queueing its nearby subscribers. Runs in-process, no server or Redis:
+
+    python benchmarks/alert_broker_benchmark.py --subscribers 10000 50000
+
+Each real connection additionally costs one socket and one suspended
+coroutine; raise the file descriptor limit (ulimit -n) accordingly.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+from collections import namedtuple
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# Settings only need placeholder values here
+for name in ("DATABASE_URL", "REDIS_URL", "AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "S3_BUCKET_NAME", "SECRET_KEY"):
+    os.environ.setdefault(name, "benchmark")
+os.environ["ALERT_PUSH_MAX_SUBSCRIBERS"] = "10000000"
+os.environ["ALERT_PUSH_QUEUE_SIZE"] = "100000"  # Nobody drains the queues here
+
+import numpy as np  # noqa: E402
+
+from app.services.alert_broker import AlertBroker  # noqa: E402
+from app.services.geolocation_service import geolocation_service  # noqa: E402
+
+AlertRow = namedtuple(
+    "AlertRow",
+    "id disease_id crop_name grid_location cell_row cell_col detection_count severity_level alert_date",
+)
+
+
+def alert_row(lat: float, lon: float) -> AlertRow:
+    grid_location = geolocation_service.anonymize_location(lat, lon)
+    row, col = geolocation_service.grid_location_cell(grid_location)
+    return AlertRow(uuid.uuid4(), None, "Tomato", grid_location, row, col, 4, 2, date.today())
+
+
+async def run(subscribers: int, events: int, rng):
+    broker = AlertBroker()
+    lats = rng.uniform(8, 28, subscribers)
+    lons = rng.uniform(68, 98, subscribers)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    subs = [broker.subscribe(lat, lon, 50) for lat, lon in zip(lats.tolist(), lons.tolist())]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+
+    rows = [alert_row(lat, lon) for lat, lon in zip(rng.uniform(8, 28, events), rng.uniform(68, 98, events))]
+    start = time.perf_counter()
+    delivered = sum(broker.deliver([broker.event_from_row(row)]) for row in rows)
+    fanout = time.perf_counter() - start
+
+    print(
+        f"{len(subs):>10,} {allocated / subscribers:>12,.0f} "
+        f"{fanout / events * 1000:>12.3f} {delivered / events:>10.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'subscribers':>10} {'bytes/sub':>12} {'ms/event':>12} {'recipients':>10}")
+    for subscribers in args.subscribers:
+        asyncio.run(run(subscribers, args.events, rng))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Geodesic kernel microbenchmark
+
+Compares the scalar GeolocationService helpers called once per point in a
+Python loop (how alert filtering used to work) with the NumPy batch APIs,
+for distance, radius filtering and grid anonymization, and checks that both
+give the same answers.
+
+No database needed:
+
+    python benchmarks/geodesic_benchmark.py --points 10000 100000 1000000
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# Settings only need placeholder values here
+for name in ("DATABASE_URL", "REDIS_URL", "AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "S3_BUCKET_NAME", "SECRET_KEY"):
+    os.environ.setdefault(name, "benchmark")
+
+import numpy as np  # noqa: E402
+
+from app.services.geolocation_service import geolocation_service  # noqa: E402
+
+ORIGIN = (18.52, 73.86)
+RADIUS_KM = 50.0
+
+
+def scalar(lats, lons):
+    distances = [geolocation_service.calculate_distance(*ORIGIN, lat, lon) for lat, lon in zip(lats, lons)]
+    mask = [d <= RADIUS_KM for d in distances]
+    cells = [geolocation_service.anonymize_location(lat, lon) for lat, lon in zip(lats, lons)]
+    return np.array(distances), np.array(mask), cells
+
+
+def batch(lats, lons):
+    distances = geolocation_service.distances_from(*ORIGIN, lats, lons)
+    mask = geolocation_service.within_radius_mask(*ORIGIN, lats, lons, RADIUS_KM)
+    cells = geolocation_service.anonymize_locations(lats, lons)
+    return distances, mask, cells
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def time_kernels(lats, lons) -> list:
+    """(name, scalar seconds, batch seconds) per kernel"""
+    lat_list, lon_list = lats.tolist(), lons.tolist()
+    rows = []
+    scalar_s, _ = timed(lambda: [geolocation_service.calculate_distance(*ORIGIN, a, b) for a, b in zip(lat_list, lon_list)])
+    batch_s, _ = timed(geolocation_service.distances_from, *ORIGIN, lats, lons)
+    rows.append(("distances_from", scalar_s, batch_s))
+
+    scalar_s, _ = timed(lambda: [geolocation_service.calculate_distance(*ORIGIN, a, b) <= RADIUS_KM for a, b in zip(lat_list, lon_list)])
+    batch_s, _ = timed(geolocation_service.within_radius_mask, *ORIGIN, lats, lons, RADIUS_KM)
+    rows.append(("within_radius_mask", scalar_s, batch_s))
+
+    scalar_s, _ = timed(lambda: [geolocation_service.anonymize_location(a, b) for a, b in zip(lat_list, lon_list)])
+    batch_s, _ = timed(geolocation_service.anonymize_locations, lats, lons)
+    rows.append(("anonymize_locations", scalar_s, batch_s))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+
+    # Correctness first, on points straddling the radius plus the whole globe
+    lats = np.concatenate([ORIGIN[0] + rng.uniform(-1, 1, 20000), rng.uniform(-90, 90, 20000)])
+    lons = np.concatenate([ORIGIN[1] + rng.uniform(-1, 1, 20000), rng.uniform(-180, 180, 20000)])
+    expected, actual = scalar(lats.tolist(), lons.tolist()), batch(lats, lons)
+    max_error = float(np.max(np.abs(expected[0] - actual[0])))
+    mask_ok = bool(np.array_equal(expected[1], actual[1]))
+    cells_ok = expected[2] == actual[2]
+    print(f"max |scalar - batch| distance: {max_error:.2e} km, mask equal: {mask_ok}, cells equal: {cells_ok}")
+    if max_error > 1e-9 or not mask_ok or not cells_ok:
+        sys.exit(1)
+
+    print(f"{'points':>10} {'kernel':<20} {'scalar s':>9} {'batch s':>9} {'speedup':>8}")
+    for points in args.points:
+        lats = rng.uniform(8, 28, points)
+        lons = rng.uniform(68, 98, points)
+        for name, scalar_s, batch_s in time_kernels(lats, lons):
+            print(f"{points:>10,} {name:<20} {scalar_s:>9.3f} {batch_s:>9.3f} {scalar_s / batch_s:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
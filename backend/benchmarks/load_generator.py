@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Local load generator for admission control
+
+Sends an open-loop mix of requests (arrivals at a fixed rate, whether or not
+earlier ones have finished, as real clients do) from a pool of simulated
+devices, then reports status codes and latency per route and the server's
+load shedding metrics. Push --rate past what the server can diagnose to
+watch inference get 503s while health and history stay fast:
+
+    uvicorn app.main:app --port 8000 &
+    python benchmarks/load_generator.py --rate 50 --duration 30 \\
+        --mix upload=1,history=4,health=2,alerts=2 --devices 20
+
+Routes: upload (synchronous diagnosis), upload_async (Prefer: respond-async),
+history, alerts (stats), models, health. Uploads use --image, or a generated
+JPEG.
+
+Devices are told apart by address: each sends X-Forwarded-For with its own
+address, which the server trusts from localhost (FORWARDED_ALLOW_IPS
+defaults to 127.0.0.1).
+"""
+import argparse
+import asyncio
+import io
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+API = "/api/v1"
+
+
+def generated_image() -> bytes:
+    from PIL import Image
+
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 255, (256, 256, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def request_for(route: str, image: bytes):
+    """(method, path, kwargs) for one request of a route"""
+    upload = {
+        "files": {"image": ("leaf.jpg", image, "image/jpeg")},
+        "data": {"latitude": f"{random.uniform(18, 19):.4f}", "longitude": f"{random.uniform(73, 74):.4f}"},
+    }
+    if route == "upload":
+        return "POST", f"{API}/diagnosis/upload", upload
+    if route == "upload_async":
+        return "POST", f"{API}/diagnosis/upload", {**upload, "headers": {"Prefer": "respond-async"}}
+    if route == "history":
+        return "GET", f"{API}/history/recent", {}
+    if route == "alerts":
+        return "GET", f"{API}/alerts/stats", {}
+    if route == "models":
+        return "GET", f"{API}/models/info", {}
+    if route == "health":
+        return "GET", "/health", {}
+    raise ValueError(f"Unknown route {route}")
+
+
+def parse_mix(mix: str):
+    weights = {}
+    for part in mix.split(","):
+        route, _, weight = part.partition("=")
+        request_for(route, b"")  # Validate the name
+        weights[route] = float(weight or 1)
+    return list(weights), list(weights.values())
+
+
+async def send(client: httpx.AsyncClient, route: str, device: str, image: bytes, results, timeout: float):
+    method, path, kwargs = request_for(route, image)
+    headers = {**kwargs.pop("headers", {}), "X-Forwarded-For": device}
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, path, headers=headers, timeout=timeout, **kwargs)
+        status = str(response.status_code)
+    except httpx.TimeoutException:
+        status = "timeout"
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    results[route].append((status, time.perf_counter() - start))
+
+
+async def run(args) -> int:
+    routes, weights = parse_mix(args.mix)
+    image = Path(args.image).read_bytes() if args.image else generated_image()
+    devices = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(args.devices)]
+    results = defaultdict(list)
+
+    limits = httpx.Limits(max_connections=args.max_outstanding, max_keepalive_connections=args.max_outstanding)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits) as client:
+        tasks = set()
+        skipped = 0
+        began = time.perf_counter()
+        sent = 0
+        while time.perf_counter() - began < args.duration:
+            # Open loop: the n-th request goes out at n / rate
+            delay = began + sent / args.rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            sent += 1
+            if len(tasks) >= args.max_outstanding:
+                skipped += 1
+                continue
+            route = random.choices(routes, weights)[0]
+            task = asyncio.create_task(send(client, route, random.choice(devices), image, results, args.timeout))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - began
+
+        print(f"{sent} requests in {elapsed:.1f}s ({sent / elapsed:.1f}/s), "
+              f"{skipped} not sent (over --max-outstanding)\n")
+        print(f"{'route':<14}{'count':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  statuses")
+        for route in routes:
+            samples = results.get(route, [])
+            if not samples:
+                continue
+            latencies = np.array([latency for _, latency in samples]) * 1000
+            statuses = Counter(status for status, _ in samples)
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            print(f"{route:<14}{len(samples):>7}{p50:>9.1f}{p95:>9.1f}{p99:>9.1f}  "
+                  + ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items())))
+
+        try:
+            text = (await client.get("/metrics", timeout=args.timeout)).text
+        except httpx.HTTPError as e:
+            print(f"\nCould not read /metrics: {e}")
+            return 0
+        print("\nServer admission metrics:")
+        for line in text.splitlines():
+            if line.startswith(("load_rejected_requests_total", "load_in_flight_requests", "event_loop_lag_seconds")):
+                print(f"  {line}")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--rate", type=float, default=20.0, help="Requests per second")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds")
+    parser.add_argument("--mix", default="upload=1,history=4,health=2,alerts=2",
+                        help="route=weight list")
+    parser.add_argument("--devices", type=int, default=20, help="Distinct simulated client addresses")
+    parser.add_argument("--max-outstanding", type=int, default=500)
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per request, seconds")
+    parser.add_argument("--image", help="JPEG to upload (default: generated)")
+    args = parser.parse_args()
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
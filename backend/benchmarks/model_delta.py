@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+What a device downloads to move from one model release to the next
+
+Compares the full model file, its gzip copy and the patch between the two
+releases (app/services/ml/model_patch.py), checks that the patch rebuilds
+the new file, and reports the time taken to build it:
+
+    python benchmarks/model_delta.py models/v1.onnx models/v2.onnx
+
+Patches are small when most tensors are unchanged (a retrained
+classifier head, an added class); a model retrained end to end changes
+every weight and its patch is about as large as the gzip copy.
+"""
+import argparse
+import gzip
+import io
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.ml import model_patch  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("old", help="Model file the device has")
+    parser.add_argument("new", help="Model file it should end up with")
+    args = parser.parse_args()
+
+    old, new = Path(args.old).read_bytes(), Path(args.new).read_bytes()
+
+    start = time.perf_counter()
+    compressed = gzip.compress(new, mtime=0)
+    gzip_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    patch = io.BytesIO()
+    stats = model_patch.write_patch(old, new, patch)
+    patch_seconds = time.perf_counter() - start
+
+    rebuilt = model_patch.apply_patch(old, io.BytesIO(patch.getvalue()))
+    assert rebuilt == new, "Patch did not rebuild the new file"
+
+    print(f"{'download':<10}{'bytes':>14}{'of full':>9}{'build s':>9}")
+    for name, size, seconds in (
+        ("full", len(new), 0.0),
+        ("gzip", len(compressed), gzip_seconds),
+        ("patch", len(patch.getvalue()), patch_seconds),
+    ):
+        print(f"{name:<10}{size:>14,}{size / max(len(new), 1):>9.1%}{seconds:>9.2f}")
+    print(f"\nPatch reuses {stats['copied']:,} bytes of the old file and carries {stats['literal']:,} new ones")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
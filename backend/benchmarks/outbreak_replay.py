@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Replay outbreak detection over stored diagnoses
+
+Rebuilds the daily detection totals per grid cell, crop and disease from
+the diagnoses table (non-healthy results with a location, diseases resolved
+through the reference catalog as at upload), runs them through a
+fresh outbreak detector in date order and compares the escalations with the
+outbreak scores stored on disease_alerts. Live detection scores the same
+stored totals, so the two should agree; --apply writes the replayed escalations
+(e.g. after changing the OUTBREAK_* settings or to score older history).
+
+Usage (from backend/):
+
+    python benchmarks/outbreak_replay.py --days 90 [--apply]
+"""
+import argparse
+import asyncio
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+from typing import NamedTuple, Optional
+import uuid
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import Date, func, or_, select  # noqa: E402
+
+from app.db.base import AsyncSessionLocal  # noqa: E402
+from app.models.diagnosis import Diagnosis  # noqa: E402
+from app.models.disease_alert import DiseaseAlert  # noqa: E402
+from app.services.alert_service import alert_service  # noqa: E402
+from app.services.geolocation_service import geolocation_service  # noqa: E402
+from app.services.outbreak_detector import replay  # noqa: E402
+from app.services.reference_catalog import reference_catalog  # noqa: E402
+
+
+class DailyTotal(NamedTuple):
+    crop_name: str
+    disease_id: Optional[uuid.UUID]
+    grid_location: str
+    cell_row: int
+    cell_col: int
+    alert_date: date
+    detection_count: int
+
+
+async def daily_totals(db, since: date):
+    # UTC days, whatever the session time zone
+    day = func.date(func.timezone("UTC", Diagnosis.created_at), type_=Date).label("day")
+    result = await db.execute(
+        select(
+            day,
+            Diagnosis.grid_location,
+            Diagnosis.crop_name,
+            Diagnosis.disease_name,
+            func.count().label("detections"),
+        )
+        .where(
+            Diagnosis.grid_location.isnot(None),
+            Diagnosis.created_at >= since,
+            # Same rule as the upload endpoint: healthy results raise no alert
+            or_(Diagnosis.disease_name.is_(None), Diagnosis.disease_name.not_ilike("%healthy%")),
+        )
+        .group_by(day, Diagnosis.grid_location, Diagnosis.crop_name, Diagnosis.disease_name)
+        .order_by(day)
+    )
+    # Several labels can resolve to the same (or no) catalog disease
+    merged = {}
+    for row in result.all():
+        disease = reference_catalog.resolve_disease(row.crop_name, row.disease_name or "")
+        key = (row.day, row.grid_location, row.crop_name, disease.id if disease else None)
+        merged[key] = merged.get(key, 0) + row.detections
+
+    totals = []
+    for (day, grid_location, crop_name, disease_id), detections in merged.items():
+        cell_row, cell_col = geolocation_service.grid_location_cell(grid_location)
+        totals.append(DailyTotal(crop_name, disease_id, grid_location, cell_row, cell_col, day, detections))
+    return totals
+
+
+async def stored_scores(db, since: date):
+    result = await db.execute(
+        select(
+            DiseaseAlert.grid_location,
+            DiseaseAlert.crop_name,
+            DiseaseAlert.disease_id,
+            DiseaseAlert.alert_date,
+            DiseaseAlert.outbreak_score,
+        ).where(DiseaseAlert.alert_date >= since, DiseaseAlert.outbreak_score.isnot(None))
+    )
+    return {tuple(row[:4]): row.outbreak_score for row in result.all()}
+
+
+async def run(days: int, apply: bool):
+    since = date.today() - timedelta(days=days)
+    async with AsyncSessionLocal() as db:
+        await reference_catalog.load(db)
+        totals = await daily_totals(db, since)
+        escalations = replay(totals)
+        stored = await stored_scores(db, since)
+
+        matching = sum(1 for key, e in escalations.items() if stored.get(key) == e.score)
+        missing = [e for key, e in escalations.items() if key not in stored]
+        differing = [e for key, e in escalations.items() if key in stored and stored[key] != e.score]
+        extra = len(set(stored) - set(escalations))
+
+        print(f"Daily cell totals replayed: {len(totals)}")
+        print(f"Escalations: {len(escalations)} (matching {matching}, missing {len(missing)}, "
+              f"different score {len(differing)}, only in database {extra})")
+        for e in sorted(missing + differing, key=lambda e: -e.score)[:20]:
+            print(f"  {e.alert_date} {e.crop_name:<12} {e.grid_location:<20} "
+                  f"severity {e.severity_level} score {e.score} cases {e.cases}")
+
+        if apply and escalations:
+            changed = await alert_service.apply_escalations(db, list(escalations.values()))
+            await db.commit()
+            print(f"Updated {len(changed)} alerts")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=90, help="History to replay")
+    parser.add_argument("--apply", action="store_true", help="Write replayed escalations to disease_alerts")
+    args = parser.parse_args()
+    asyncio.run(run(args.days, args.apply))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+List endpoint serialization benchmark
+
+Compares rows/second for a history page built the old way (full Diagnosis
+entities -> HistoryItem per row -> jsonable_encoder -> JSONResponse) with the
+current path (projected rows -> ORJSONResponse), for 1k and 10k rows.
+
+Uses an in-memory SQLite database so it runs without PostgreSQL:
+
+    python benchmarks/serialization_benchmark.py --rows 1000 10000
+"""
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from sqlalchemy import desc, insert, select  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from app.api.v1.endpoints.history import HISTORY_COLUMNS  # noqa: E402
+from app.core.responses import ORJSONResponse  # noqa: E402
+from app.models.diagnosis import Diagnosis  # noqa: E402
+from app.schemas.diagnosis import HistoryItem  # noqa: E402
+
+
+async def seed(engine, rows: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(Diagnosis.__table__.create)
+        now = datetime.utcnow()
+        await conn.execute(
+            insert(Diagnosis.__table__),
+            [
+                {
+                    "id": uuid.uuid4(),
+                    "user_id": uuid.uuid4(),
+                    "crop_name": "Tomato",
+                    "disease_name": "Early blight",
+                    "confidence_score": 0.93,
+                    "image_url": f"https://bucket.s3.us-east-1.amazonaws.com/diagnoses/{uuid.uuid4()}.jpg",
+                    "image_quality_score": 87.5,
+                    "model_version": "v1.0",
+                    "extra_metadata": {
+                        "latitude": 18.5204,
+                        "longitude": 73.8567,
+                        "filename": "IMG_20260101_101010.jpg",
+                    },
+                    "grid_location": "18.5405,73.8739",
+                    "created_at": now - timedelta(seconds=i),
+                    "updated_at": now - timedelta(seconds=i),
+                }
+                for i in range(rows)
+            ],
+        )
+
+
+async def old_path(engine, rows: int) -> bytes:
+    async with AsyncSession(engine) as session:
+        result = await session.execute(
+            select(Diagnosis).order_by(desc(Diagnosis.created_at)).limit(rows)
+        )
+        diagnoses = result.scalars().all()
+    items = [
+        HistoryItem(
+            id=str(d.id),
+            crop_name=d.crop_name,
+            disease_name=d.disease_name,
+            confidence=d.confidence_score,
+            image_url=d.image_url,
+            created_at=d.created_at,
+        )
+        for d in diagnoses
+    ]
+    return JSONResponse(jsonable_encoder(items)).body
+
+
+async def new_path(engine, rows: int) -> bytes:
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            select(*HISTORY_COLUMNS).order_by(desc(Diagnosis.created_at)).limit(rows)
+        )
+        return ORJSONResponse({"items": [row._asdict() for row in result.all()]}).body
+
+
+async def measure(fn, engine, rows: int, repeat: int) -> float:
+    await fn(engine, rows)  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await fn(engine, rows)
+    return rows * repeat / (time.perf_counter() - start)
+
+
+async def run(sizes, repeat: int):
+    engine = create_async_engine(
+        "sqlite+aiosqlite://",
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+    await seed(engine, max(sizes))
+
+    print(f"{'rows':>8} {'before rows/s':>15} {'after rows/s':>15} {'speedup':>8}")
+    for rows in sizes:
+        before = await measure(old_path, engine, rows, repeat)
+        after = await measure(new_path, engine, rows, repeat)
+        print(f"{rows:>8} {before:>15,.0f} {after:>15,.0f} {after / before:>7.1f}x")
+
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Pre-fork multi-worker serving:
+
+    WEB_CONCURRENCY=4 gunicorn -c gunicorn.conf.py app.main:app
+
+The app is imported once in the master (preload_app) and the workers are
+forked from it, so the imported libraries and module-level tables (class
+labels, settings) are shared copy-on-write. ONNX Runtime sessions are
+created in each worker after the fork (their thread pools do not survive
+one); with shared weights (by default for models with an external data
+file and more than one worker) the weights they use are a read-only
+mapping of that file, shared by all workers through the page cache.
+
+Jobs, idempotency keys and alert stream events are per process unless they
+go through Redis: with several workers set DIAGNOSIS_JOB_BACKEND=redis and
+ALERT_PUSH_REDIS_ENABLED=true. Limit MODEL_INTRA_OP_THREADS to about
+cores / workers so the workers do not oversubscribe the CPU.
+"""
+import gc
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+
+def when_ready(server):
+    # Move everything imported so far out of the collector's reach: a
+    # collection in a worker would otherwise write to (and so copy) every
+    # page holding a tracked object
+    gc.freeze()
@@ -0,0 +1,78 @@
+"""
+Concurrency of the disease alert upsert
+
+Fires parallel same-cell detections, each in its own transaction together
+with a diagnosis insert (as the upload handler does), then checks that
+every cell has exactly one alert row with the exact detection count and
+matching severity. The load can be raised:
+
+    ALERT_UPSERT_DETECTIONS=2000 pytest tests/test_alert_upsert.py
+"""
+import asyncio
+import os
+import uuid
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core.config import settings
+from app.models.diagnosis import Diagnosis
+from app.models.disease_alert import DiseaseAlert
+from app.services.alert_service import alert_service, severity_for_count
+
+DETECTIONS = int(os.environ.get("ALERT_UPSERT_DETECTIONS", 300))
+CONNECTIONS = 30
+CROP = "Tomato"
+CELLS = [f"{10 + i * 0.0901:.4f},70.0000" for i in range(2)]
+
+
+async def detect(engine, grid_location: str, start: asyncio.Event):
+    await start.wait()
+    async with AsyncSession(engine) as db:
+        db.add(Diagnosis(
+            id=uuid.uuid4(),
+            crop_name=CROP,
+            disease_name="Early blight",
+            confidence_score=0.9,
+            image_url="https://example.invalid/concurrency.jpg",
+            model_version="concurrency-check",
+            grid_location=grid_location,
+        ))
+        await alert_service.record_detection(db, CROP, grid_location)
+        await db.commit()
+
+
+async def run(database_url: str):
+    engine = create_async_engine(database_url, pool_size=CONNECTIONS, max_overflow=0, pool_timeout=120)
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(text("TRUNCATE diagnoses, disease_alerts CASCADE"))
+
+        start = asyncio.Event()
+        tasks = [
+            asyncio.create_task(detect(engine, CELLS[i % len(CELLS)], start))
+            for i in range(DETECTIONS)
+        ]
+        start.set()
+        await asyncio.gather(*tasks)
+
+        async with AsyncSession(engine) as db:
+            return (await db.execute(
+                select(DiseaseAlert.grid_location, DiseaseAlert.detection_count, DiseaseAlert.severity_level)
+                .where(DiseaseAlert.crop_name == CROP)
+            )).all()
+    finally:
+        await engine.dispose()
+
+
+def test_concurrent_detections_are_counted_exactly(database_url, monkeypatch):
+    # Outbreak escalation may raise severity further; this checks the upsert alone
+    monkeypatch.setattr(settings, "OUTBREAK_DETECTION_ENABLED", False)
+    rows = asyncio.run(run(database_url))
+
+    for cell in CELLS:
+        expected = sum(1 for i in range(DETECTIONS) if CELLS[i % len(CELLS)] == cell)
+        cell_rows = [row for row in rows if row.grid_location == cell]
+        assert [(row.detection_count, row.severity_level) for row in cell_rows] == [
+            (expected, severity_for_count(expected))
+        ]
@@ -0,0 +1,48 @@
+"""In-process behaviour of TTLCache (Redis disabled)"""
+import asyncio
+
+import pytest
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+
+@pytest.fixture(autouse=True)
+def no_redis(monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_REDIS_ENABLED", False)
+
+
+def test_concurrent_misses_compute_once_and_leave_no_locks():
+    cache = TTLCache("test", ttl=60)
+    calls = []
+
+    async def compute(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return {"key": key}
+
+    async def run():
+        values = await asyncio.gather(*(
+            cache.get_or_compute(f"k{i % 50}", lambda i=i: compute(f"k{i % 50}")) for i in range(500)
+        ))
+        return values
+
+    values = asyncio.run(run())
+    assert sorted(calls) == sorted(f"k{i}" for i in range(50))
+    assert values[7] == {"key": "k7"}
+    assert cache._locks == {} and cache._generations == {}
+
+
+def test_invalidation_during_compute_is_not_cached():
+    cache = TTLCache("test", ttl=60)
+
+    async def run():
+        async def compute():
+            await cache.delete("key")
+            return "stale"
+
+        assert await cache.get_or_compute("key", compute) == "stale"
+        return await cache.get("key")
+
+    assert asyncio.run(run()) is None
+    assert cache._locks == {} and cache._generations == {}
@@ -0,0 +1,98 @@
+"""History pages, incremental syncs and the pre-pagination list shape"""
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import pool, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core.config import settings
+from app.core.pagination import decode_cursor, encode_cursor
+from app.db.base import get_db
+from app.main import app
+
+HISTORY = f"{settings.API_V1_PREFIX}/history/"
+
+INSERT_DIAGNOSIS = text("""
+INSERT INTO diagnoses (id, crop_name, disease_name, confidence_score, image_url, model_version, created_at, updated_at)
+VALUES (:id, 'Tomato', 'Early blight', 0.9, 'https://example.invalid/h.jpg', 'test', :created_at, :created_at)
+""")
+
+
+async def execute(database_url: str, statement, rows=()):
+    engine = create_async_engine(database_url, poolclass=pool.NullPool)
+    try:
+        async with engine.begin() as conn:
+            for params in rows or [{}]:
+                await conn.execute(statement, params)
+    finally:
+        await engine.dispose()
+
+
+def add_diagnoses(database_url: str, *created_at: datetime):
+    asyncio.run(execute(database_url, INSERT_DIAGNOSIS, [{"id": uuid.uuid4(), "created_at": t} for t in created_at]))
+
+
+@pytest.fixture
+def client(database_url):
+    asyncio.run(execute(database_url, text("TRUNCATE diagnoses CASCADE")))
+    # A connection per request: each TestClient request runs in its own event loop
+    engine = create_async_engine(database_url, poolclass=pool.NullPool)
+
+    async def test_db():
+        async with AsyncSession(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_db] = test_db
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+
+
+def test_plain_request_returns_bare_list(client, database_url):
+    now = datetime.now(timezone.utc)
+    add_diagnoses(database_url, *(now - timedelta(minutes=i) for i in range(3)))
+    body = client.get(HISTORY).json()
+    assert isinstance(body, list)
+    assert len(body) == 3
+    assert body[0]["created_at"] > body[-1]["created_at"]
+
+
+def test_pages_and_sync_cursor(client, database_url):
+    now = datetime.now(timezone.utc)
+    add_diagnoses(database_url, *(now - timedelta(minutes=i) for i in range(5)))
+
+    first = client.get(HISTORY, params={"paginate": "true", "limit": 2}).json()
+    assert len(first["items"]) == 2 and first["next_cursor"] and first["sync_cursor"]
+    second = client.get(HISTORY, params={"cursor": first["next_cursor"], "limit": 2}).json()
+    assert len(second["items"]) == 2
+    # Only the first backward page marks the newest row synced
+    assert second["sync_cursor"] is None
+    assert {item["id"] for item in first["items"]}.isdisjoint(item["id"] for item in second["items"])
+
+
+def test_sync_returns_late_commits(client, database_url):
+    now = datetime.now(timezone.utc)
+    add_diagnoses(database_url, now - timedelta(seconds=30), now - timedelta(seconds=20))
+    sync_cursor = client.get(HISTORY, params={"paginate": "true"}).json()["sync_cursor"]
+
+    # Committed after the sync, but stamped before its newest row
+    late = now - timedelta(seconds=25)
+    newer = now + timedelta(seconds=1)
+    add_diagnoses(database_url, late, newer)
+
+    page = client.get(HISTORY, params={"since": sync_cursor}).json()
+    times = [datetime.fromisoformat(item["created_at"]) for item in page["items"]]
+    assert late in times and newer in times
+    assert times == sorted(times)
+    assert datetime.fromisoformat(page["items"][-1]["created_at"]) == newer
+
+
+def test_cursor_from_naive_timestamps_reads_as_utc():
+    row_id = uuid.uuid4()
+    created_at, decoded_id, sync = decode_cursor(encode_cursor(datetime(2026, 1, 1, 12), row_id, sync=True))
+    assert created_at == datetime(2026, 1, 1, 12, tzinfo=timezone.utc)
+    assert (decoded_id, sync) == (row_id, True)
@@ -0,0 +1,33 @@
+"""Conditional request helpers"""
+import pytest
+
+from app.core.config import settings
+from app.core.http_cache import HTTPCacheMiddleware, etag_matches
+
+ETAG = '"0123456789abcdef0123"'
+
+
+@pytest.mark.parametrize("if_none_match, expected", [
+    (None, False),
+    ("", False),
+    (ETAG, True),
+    (f"W/{ETAG}", True),
+    (f'"stale", {ETAG}', True),
+    ("*", True),
+    # A tag containing the current one is a different tag
+    ('"0123456789abcdef0123ff"', False),
+    (f'"x{ETAG[1:]}', False),
+    (ETAG[1:-1], False),
+])
+def test_etag_matches(if_none_match, expected):
+    assert etag_matches(if_none_match, ETAG) is expected
+
+
+@pytest.mark.parametrize("path, cache_control", [
+    ("/alerts/nearby", "private, max-age=30"),
+    ("/alerts/rollup", "public, max-age=30"),
+    ("/history/", "private, no-cache"),
+])
+def test_cache_control_per_route(path, cache_control):
+    policy = HTTPCacheMiddleware(app=None)._policy(settings.API_V1_PREFIX + path)
+    assert policy.cache_control == cache_control
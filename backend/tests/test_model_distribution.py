@@ -0,0 +1,46 @@
+"""Publishing models for devices"""
+import asyncio
+
+import numpy as np
+import onnxruntime as ort
+
+from app.api.v1.endpoints import models
+from app.services.ml.model_distribution import ModelDistribution, external_data_files
+
+
+def run(path, features):
+    session = ort.InferenceSession(str(path), providers=["CPUExecutionProvider"])
+    return session.run(None, {"input": features})[0]
+
+
+def test_external_weights_are_published_inline(onnx_model, tmp_path):
+    source = onnx_model(external=True)
+    distribution = ModelDistribution(str(tmp_path / "releases"), keep=3)
+
+    release = distribution.publish(source, "v1")
+    published = distribution.file_path(release["sha256"])
+    assert external_data_files(published) == []
+    assert release["size"] == published.stat().st_size
+    features = np.ones((1, 4), dtype=np.float32)
+    np.testing.assert_array_equal(run(published, features), run(source, features))
+
+    # Workers publishing the same source reuse the copy
+    built_at = published.stat().st_mtime_ns
+    assert distribution.publish(source, "v1") == release
+    assert published.stat().st_mtime_ns == built_at
+    assert [r["sha256"] for r in distribution.releases] == [release["sha256"]]
+
+
+def test_self_contained_model_is_published_as_is(onnx_model, tmp_path):
+    source = onnx_model()
+    distribution = ModelDistribution(str(tmp_path / "releases"), keep=3)
+    release = distribution.publish(source, "v1")
+    assert distribution.file_path(release["sha256"]).read_bytes() == source.read_bytes()
+    assert "source_sha256" not in release
+
+
+def test_latest_without_a_release_is_not_an_error(monkeypatch, tmp_path):
+    monkeypatch.setattr(models, "model_distribution", ModelDistribution(str(tmp_path / "releases"), keep=3))
+    info = asyncio.run(models.get_latest_model())
+    assert info.download_url is None and info.sha256 is None
+    assert info.downloads == [] and info.patches == []
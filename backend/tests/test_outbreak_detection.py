@@ -0,0 +1,93 @@
+"""
+Outbreak detection under concurrent writes
+
+Seeds a quiet baseline around a cell, then fires parallel detections over
+its 3 x 3 neighbourhood, each in its own transaction and engine (as
+separate worker processes would). The stored outbreak scores must be the
+ones a replay of the final daily totals gives.
+"""
+import asyncio
+from datetime import date, timedelta
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core.config import settings
+from app.models.disease_alert import DiseaseAlert
+from app.services.alert_service import AlertIncrement, alert_service
+from app.services.geolocation_service import geolocation_service
+from app.services.outbreak_detector import replay
+
+CROP = "Tomato"
+WORKERS = 3
+DETECTIONS = 60
+TODAY = date.today()
+
+
+def grid_location(row: int, col: int) -> str:
+    lat, lon = geolocation_service.cell_center(row, col)
+    return geolocation_service.anonymize_location(lat, lon)
+
+
+CENTRE = (120, 850)
+CELLS = [grid_location(CENTRE[0] + dr, CENTRE[1] + dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1)]
+
+
+async def seed(engine):
+    async with engine.begin() as conn:
+        await conn.execute(text("TRUNCATE disease_alerts CASCADE"))
+    # One detection a day in the centre cell over the baseline
+    for days_ago in range(settings.OUTBREAK_BASELINE_DAYS - 1, 0, -1):
+        async with AsyncSession(engine) as db:
+            await alert_service.record_detections(db, [
+                AlertIncrement(CELLS[4], CROP, None, TODAY - timedelta(days=days_ago))
+            ])
+            await db.commit()
+
+
+async def detect(engine, cell: str):
+    async with AsyncSession(engine) as db:
+        await alert_service.record_detection(db, CROP, cell, detected_on=TODAY)
+        await db.commit()
+
+
+async def run(database_url: str):
+    engines = [create_async_engine(database_url, pool_size=10, max_overflow=0) for _ in range(WORKERS)]
+    try:
+        await seed(engines[0])
+        await asyncio.gather(*(
+            detect(engines[i % WORKERS], CELLS[i % len(CELLS)]) for i in range(DETECTIONS)
+        ))
+        async with AsyncSession(engines[0]) as db:
+            return (await db.execute(
+                select(
+                    DiseaseAlert.crop_name,
+                    DiseaseAlert.disease_id,
+                    DiseaseAlert.grid_location,
+                    DiseaseAlert.cell_row,
+                    DiseaseAlert.cell_col,
+                    DiseaseAlert.alert_date,
+                    DiseaseAlert.detection_count,
+                    DiseaseAlert.severity_level,
+                    DiseaseAlert.outbreak_score,
+                ).order_by(DiseaseAlert.alert_date)
+            )).all()
+    finally:
+        for engine in engines:
+            await engine.dispose()
+
+
+def test_concurrent_detections_score_like_a_replay(database_url):
+    rows = asyncio.run(run(database_url))
+
+    expected = replay(rows)
+    stored = {
+        (row.grid_location, row.crop_name, row.disease_id, row.alert_date): row
+        for row in rows if row.outbreak_score is not None
+    }
+    # Every cell of the neighbourhood escalates today
+    assert len(expected) == len(CELLS)
+    assert set(stored) == set(expected)
+    for key, escalation in expected.items():
+        assert stored[key].outbreak_score == escalation.score
+        assert stored[key].severity_level >= escalation.severity_level
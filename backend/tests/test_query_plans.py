@@ -0,0 +1,210 @@
+"""
+Query plans of the hot endpoint queries
+
+Seeds the scratch database (see conftest), then EXPLAINs each endpoint
+query and fails if it does not use its index or scans a table
+sequentially. Row counts can be raised to check plans at production
+scale:
+
+    QUERY_PLAN_DIAGNOSES=3000000 QUERY_PLAN_ALERTS=500000 pytest tests/test_query_plans.py
+"""
+import asyncio
+import hashlib
+import json
+import os
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.config import settings
+from app.core.pagination import encode_cursor, keyset_query
+from app.models.diagnosis import Diagnosis
+from app.models.disease_alert import DiseaseAlert
+from app.services.alert_maintenance import alert_maintenance
+from app.services.alert_service import alert_service
+from app.services.geolocation_service import CELL_LEVEL, geolocation_service
+from app.services.outbreak_detector import OutbreakService
+
+DIAGNOSES = int(os.environ.get("QUERY_PLAN_DIAGNOSES", 200_000))
+ALERTS = int(os.environ.get("QUERY_PLAN_ALERTS", 100_000))
+USERS = max(DIAGNOSES // 60, 1)
+
+CROPS = "ARRAY['Tomato','Potato','Corn (maize)','Apple','Grape','Pepper, bell']"
+
+SEED_DIAGNOSES = f"""
+INSERT INTO diagnoses (
+    id, user_id, crop_name, disease_name, confidence_score, image_url,
+    image_quality_score, model_version, grid_location, status, created_at, updated_at
+)
+SELECT
+    gen_random_uuid(),
+    md5((g % :users)::text)::uuid,
+    ({CROPS})[1 + g % 6],
+    'Early blight',
+    random(),
+    'https://example.invalid/' || g || '.jpg',
+    80,
+    'v1.0',
+    round((10 + (g % 200) * 0.0901)::numeric, 4) || ',' || round((70 + (g % 300) * 0.0901)::numeric, 4),
+    'PENDING',
+    now() - (g * interval '7 seconds'),
+    now() - (g * interval '7 seconds')
+FROM generate_series(1, :rows) AS g
+"""
+
+SEED_ALERTS = f"""
+INSERT INTO disease_alerts (
+    id, disease_id, crop_name, grid_location, cell_row, cell_col, cell_id,
+    detection_count, severity_level, alert_date, is_active, last_detected_at
+)
+SELECT
+    gen_random_uuid(),
+    NULL,
+    ({CROPS})[1 + g % 6],
+    round((10 + (g % 200) * 0.0901)::numeric, 4) || ',' || round((70 + (g / 200 % 300) * 0.0901)::numeric, 4),
+    floor((10 + (g % 200) * 0.0901) / :grid_degrees + 0.5),
+    floor((70 + (g / 200 % 300) * 0.0901) / :grid_degrees + 0.5),
+    (g * 2654435761) % (1 << (2 * :cell_level)),  -- spread over all cell ids
+    1 + g % 20,
+    1 + g % 5,
+    current_date - (g % 365),
+    (g % 365) < 30,
+    current_date - (g % 365)
+FROM generate_series(1, :rows) AS g
+"""
+
+
+def audited_queries():
+    """(name, statement, expected index) for each endpoint query"""
+    # Seeded user ids are md5(n)::uuid
+    sample_user = uuid.UUID(hashlib.md5(b"42").hexdigest())
+    # A position deep into the table: keyset pages must stay index-bound
+    position = datetime.now(timezone.utc) - timedelta(days=5)
+    deep_cursor = encode_cursor(position, uuid.UUID(int=0))
+    sync_cursor = encode_cursor(position, uuid.UUID(int=0), sync=True)
+    return [
+        (
+            "history.get_user_history",
+            keyset_query(
+                select(Diagnosis).where(Diagnosis.user_id == sample_user),
+                Diagnosis.created_at, Diagnosis.id, 20, cursor=deep_cursor,
+            ),
+            "ix_diagnoses_user_id_created_at",
+        ),
+        (
+            "history.get_all_history",
+            keyset_query(select(Diagnosis), Diagnosis.created_at, Diagnosis.id, 50, cursor=deep_cursor),
+            "ix_diagnoses_created_at",
+        ),
+        (
+            "history.get_recent_diagnoses (sync)",
+            keyset_query(select(Diagnosis), Diagnosis.created_at, Diagnosis.id, 10, since=sync_cursor),
+            "ix_diagnoses_created_at",
+        ),
+        (
+            # Conflict lookup performed by alert_service.record_detection
+            "alert_service.record_detection",
+            select(DiseaseAlert).where(
+                DiseaseAlert.grid_location == "10.0901,70.0901",
+                DiseaseAlert.crop_name == "Potato",
+                DiseaseAlert.disease_id.is_(None),
+                DiseaseAlert.alert_date == date.today(),
+            ),
+            "uq_disease_alerts_cell_crop_disease_date",
+        ),
+        (
+            "alerts.get_nearby_alerts",
+            alert_service.nearby_query(
+                *geolocation_service.grid_cell(15.0, 80.0), 50, date.today() - timedelta(days=7)
+            ),
+            "ix_disease_alerts_active_cell",
+        ),
+        (
+            # Neighbourhood history read by outbreak detection on each write
+            "outbreak_service.detect",
+            OutbreakService.history_query(
+                date.today(), [("Tomato", None, *geolocation_service.grid_cell(15.0, 80.0))]
+            ),
+            "ix_disease_alerts_active_cell",
+        ),
+        (
+            "alerts.get_alert_stats",
+            alert_service.stats_query(),
+            "ix_disease_alerts_active_alert_date",
+        ),
+        (
+            # State-scale rollup: one level-4 cell, grouped at level 8
+            "alerts.get_alert_rollup",
+            alert_service.rollup_query(8, 7, parent=geolocation_service.quadkey(200, 4)),
+            "ix_disease_alerts_cell_id_alert_date",
+        ),
+        (
+            "alert_maintenance.deactivate_batch",
+            alert_maintenance.deactivate_batch(date.today() - timedelta(days=settings.ALERT_ACTIVE_DAYS)),
+            "ix_disease_alerts_active_alert_date",
+        ),
+        (
+            "alert_maintenance.compact_batch",
+            alert_maintenance.compact_batch(date.today() - timedelta(days=settings.ALERT_COMPACT_AFTER_DAYS)),
+            "ix_disease_alerts_alert_date",
+        ),
+    ]
+
+
+def plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+async def seed(database_url: str):
+    engine = create_async_engine(database_url)
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(text("TRUNCATE diagnoses, disease_alerts CASCADE"))
+            await conn.execute(text(SEED_DIAGNOSES), {"rows": DIAGNOSES, "users": USERS})
+            await conn.execute(text(SEED_ALERTS), {
+                "rows": ALERTS,
+                "grid_degrees": geolocation_service.grid_degrees(),
+                "cell_level": CELL_LEVEL,
+            })
+        async with engine.connect() as conn:
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text("VACUUM ANALYZE diagnoses"))
+            await conn.execute(text("VACUUM ANALYZE disease_alerts"))
+    finally:
+        await engine.dispose()
+
+
+async def explain(database_url: str, statement) -> dict:
+    sql = statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    engine = create_async_engine(database_url)
+    try:
+        async with engine.connect() as conn:
+            raw = (await conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))).scalar()
+    finally:
+        await engine.dispose()
+    return (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+
+
+@pytest.fixture(scope="module")
+def seeded(database_url):
+    asyncio.run(seed(database_url))
+    return database_url
+
+
+@pytest.mark.parametrize(
+    "name, statement, expected_index",
+    [pytest.param(*query, id=query[0]) for query in audited_queries()],
+)
+def test_query_uses_index(seeded, name, statement, expected_index):
+    plan = asyncio.run(explain(seeded, statement))
+    nodes = list(plan_nodes(plan))
+    seq_scans = sorted({node["Relation Name"] for node in nodes if node["Node Type"] == "Seq Scan"})
+    indexes = sorted({node["Index Name"] for node in nodes if "Index Name" in node})
+    assert not seq_scans, f"{name} scans {seq_scans} sequentially:\n{json.dumps(plan, indent=2)}"
+    assert expected_index in indexes, f"{name} uses {indexes or 'no index'}, expected {expected_index}"
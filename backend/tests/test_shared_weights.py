@@ -0,0 +1,19 @@
+"""When inference sessions use the mapped external weights in place"""
+import pytest
+
+from app.core.config import settings
+from app.services.ml.inference import ONNXInferenceService
+
+
+@pytest.mark.parametrize("configured, workers, external, expected", [
+    (None, 1, True, False),
+    (None, 4, True, True),
+    (None, 4, False, False),
+    (True, 1, False, True),
+    (False, 4, True, False),
+])
+def test_shares_weights(onnx_model, monkeypatch, configured, workers, external, expected):
+    monkeypatch.setattr(settings, "MODEL_SHARED_WEIGHTS", configured)
+    monkeypatch.setattr(settings, "WEB_CONCURRENCY", workers)
+    path = onnx_model(external=external)
+    assert ONNXInferenceService.shares_weights(path) is expected